@@ -0,0 +1,144 @@
+import logging
+import asyncio
+from datetime import timedelta
+from inspect import isawaitable  # Функция обработки бара может быть корутиной
+
+from MarketPy.Schedule import Schedule
+from MarketPy.Dispatcher import Subscription
+from MarketPy.Readiness import FixedDelay
+from MarketPy.Metrics import Metrics
+
+
+logger = logging.getLogger('Schedule.AsyncSchedule')  # Будем вести лог
+
+
+async def sleep_until(schedule, dt_market):
+    """Ожидание даты и времени на бирже
+
+    :param Schedule schedule: Расписание торгов
+    :param datetime dt_market: Дата и время на бирже
+    """
+    deadline = schedule.msk_to_utc_datetime(dt_market, True).timestamp()  # Дата и время в timestamp UTC
+    await schedule.clock.sleep(deadline - schedule.clock.time())  # Ждем по часам расписания, не блокируя цикл событий
+
+
+async def bar_times(schedule, tf):
+    """Асинхронный генератор дат и времени открытия бар по расписанию биржи. Выдает бар, когда наступает время его запроса.
+    Если обработка бара затянется дольше интервала, то следующие бары не пропускаются, а выдаются сразу
+
+    :param Schedule schedule: Расписание торгов
+    :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+    :return: Дата и время открытия бара, дата и время запроса бара на бирже
+    """
+    dt_market = schedule.market_datetime_now  # Начинаем с текущего бара на бирже
+    while True:
+        trade_bar_open_datetime = schedule.trade_bar_open_datetime(dt_market, tf)  # Дата и время открытия бара, который будем получать
+        trade_bar_request_datetime = schedule.trade_bar_request_datetime(dt_market, tf)  # Дата и время запроса бара на бирже
+        dt_market = schedule.trade_bar_ready_datetime(dt_market, tf)  # Следующий бар открывается на закрытии этого
+        await sleep_until(schedule, trade_bar_request_datetime)  # Ждем времени запроса бара
+        yield trade_bar_open_datetime, trade_bar_request_datetime
+
+
+async def stream_bars(class_code, security_code, schedule, tf, fetch, callback=None, readiness=None, metrics=None):
+    """Получение новых бар по расписанию биржи в цикле событий. Для выхода задачу нужно отменить
+
+    :param str class_code: Код режима торгов
+    :param str security_code: Код тикера
+    :param Schedule schedule: Расписание торгов
+    :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+    :param fetch: Корутина получения бара fetch(subscription). Возвращает бар или None, если бар не получен
+    :param callback: Функция или корутина обработки полученного бара callback(subscription, bar)
+    :param FixedDelay readiness: Политика задержки и повторных запросов бара. По умолчанию постоянная задержка Schedule.delta без повторных запросов
+    :param Metrics metrics: Метрики получения бар. По умолчанию выключены
+    """
+    readiness = readiness or FixedDelay()  # Политика задержки и повторных запросов бара
+    metrics = metrics or Metrics(enabled=False)  # Метрики получения бар
+    subscription = Subscription(class_code, security_code, schedule, tf, fetch, callback)  # Подписка на новые бары
+    dt_market = schedule.market_datetime_now  # Начинаем с текущего бара на бирже
+    while True:
+        subscription.trade_bar_open_datetime = schedule.trade_bar_open_datetime(dt_market, tf)  # Дата и время открытия бара, который будем получать
+        subscription.trade_bar_close_datetime = schedule.trade_bar_close_datetime(dt_market, tf)  # Дата и время закрытия бара, который будем получать
+        subscription.trade_bar_ready_datetime = schedule.trade_bar_ready_datetime(dt_market, tf)  # Дата и время, с которого бар может быть получен
+        dt_market = subscription.trade_bar_ready_datetime  # Следующий бар открывается на закрытии этого. Если получение затянется дольше интервала, то он не будет пропущен
+        subscription.ready_timestamp = schedule.msk_to_utc_datetime(subscription.trade_bar_ready_datetime, True).timestamp()  # То же в timestamp UTC
+        subscription.trade_bar_request_datetime = subscription.trade_bar_ready_datetime + readiness.delay(subscription)  # Дата и время запроса бара на бирже
+        subscription.attempt = 0  # Первый запрос бара
+        await sleep_until(schedule, subscription.trade_bar_request_datetime)  # Ждем времени запроса бара
+        metrics.observe(subscription, 'wake_lag', schedule.clock.time() - subscription.ready_timestamp - (subscription.trade_bar_request_datetime - subscription.trade_bar_ready_datetime).total_seconds())
+        trade_bar_open_datetime = subscription.trade_bar_open_datetime
+        try:
+            while True:  # Запрашиваем бар, пока не получим, или политика не запретит повторный запрос
+                metrics.increment(subscription, 'requests')
+                started = schedule.clock.time()  # Время запроса
+                bar = await fetch(subscription)  # Получаем бар
+                now = schedule.clock.time()  # Время ответа
+                metrics.observe(subscription, 'round_trip', now - started)
+                elapsed = timedelta(seconds=now - subscription.ready_timestamp)  # Прошло времени от закрытия бара
+                if bar is not None:  # Если бар получен
+                    metrics.increment(subscription, 'bars')
+                    metrics.observe(subscription, 'bar_latency', elapsed.total_seconds())
+                    readiness.observe(subscription, elapsed)  # то учитываем задержку получения бара
+                    break
+                metrics.increment(subscription, 'empty')
+                retry = readiness.retry_delay(subscription, subscription.attempt + 1, elapsed)  # Задержка повторного запроса по политике
+                if retry is None:  # Если повторно не запрашиваем
+                    break
+                subscription.attempt += 1  # Следующий повторный запрос
+                metrics.increment(subscription, 'retries')
+                await schedule.clock.sleep(retry.total_seconds())  # Ждем повторного запроса
+            if bar is None:  # Если бар не получен
+                metrics.increment(subscription, 'missed')
+                logger.warning(f'{subscription}: бар {trade_bar_open_datetime:%d.%m.%Y %H:%M:%S} не получен')
+                continue  # Будем получать следующий бар
+            if callback:  # Если задана функция обработки
+                result = callback(subscription, bar)  # то обрабатываем бар
+                if isawaitable(result):  # Если функция обработки - корутина
+                    await result  # то дожидаемся ее выполнения
+        except asyncio.CancelledError:  # Если задачу отменили
+            raise  # то выходим
+        except Exception:  # Ошибка получения или обработки не должна останавливать поток бар
+            metrics.increment(subscription, 'errors')
+            logger.exception(f'{subscription}: ошибка получения бара {trade_bar_open_datetime:%d.%m.%Y %H:%M:%S}')
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    from datetime import datetime
+    from random import random
+    from time import perf_counter
+    from MarketPy.Schedule import MOEXStocks
+    from MarketPy.Clock import VirtualClock
+
+    class FakeProvider:
+        """Локальный провайдер для проверки: возвращает бар с задержкой по часам расписания"""
+        def __init__(self, clock):
+            self.clock = clock  # Часы расписания
+            self.requests = 0  # Кол-во запросов
+
+        async def fetch(self, subscription):
+            self.requests += 1
+            await self.clock.sleep(random() / 10)  # Задержка ответа до 100 мс
+            return {'time': subscription.trade_bar_open_datetime, 'open': 1.0, 'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1}
+
+    async def main():
+        received = 0  # Кол-во полученных бар
+
+        def on_bar(subscription, bar):
+            nonlocal received
+            received += 1
+
+        clock = VirtualClock()  # Виртуальные часы. 3 минуты расписания проходят без ожидания
+        schedule = MOEXStocks(clock=clock)  # Расписание фондового рынка Московской Биржи
+        clock.advance(schedule.msk_datetime_to_utc_timestamp(datetime(2025, 3, 12, 14, 0, 30)))  # Начинаем с торгового дня
+        provider = FakeProvider(clock)
+        started = perf_counter()
+        tasks = [asyncio.create_task(stream_bars('TQBR', f'TICKER{i}', schedule, 'M1', provider.fetch, on_bar)) for i in range(5000)]  # 5000 подписок в одном цикле событий
+        for _ in range(3):  # 3 бара
+            await clock.sleep(60)
+            print(f'{schedule.market_datetime_now:%d.%m.%Y %H:%M:%S} Запросов: {provider.requests}, получено бар: {received}')
+        for task in tasks:  # Пробегаемся по всем задачам
+            task.cancel()  # Отменяем задачу
+        await asyncio.gather(*tasks, return_exceptions=True)  # Дожидаемся отмены всех задач
+        print(f'Заняло {perf_counter() - started:.1f} с')
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%d.%m.%Y %H:%M:%S', level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,240 @@
+import logging
+from collections import deque  # Очереди страниц тикеров в порядке выдачи
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED  # Пул потоков получения страниц истории
+from datetime import datetime
+from threading import Lock
+from time import monotonic, sleep
+
+from MarketPy.Schedule import Schedule, Timeframe
+from MarketPy.History import HistoryChecker, HistoryGaps
+
+
+logger = logging.getLogger('Schedule.Backfill')  # Будем вести лог
+
+
+class BackfillPage:
+    """Страница истории тикера: один запрос к провайдеру за бары сетки расписания с первого по последний включительно"""
+    __slots__ = ('class_code', 'security_code', 'schedule', 'tf', 'number', 'first', 'last', 'end', 'bars', 'missing', 'attempt')
+
+    def __init__(self, class_code, security_code, schedule, tf, number, first, last, bars, missing):
+        """
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param Schedule schedule: Расписание торгов
+        :param Timeframe tf: Временной интервал
+        :param int number: Номер страницы тикера, начиная с 0
+        :param datetime first: Дата и время открытия первого бара страницы на бирже
+        :param datetime last: Дата и время открытия последнего бара страницы на бирже
+        :param int bars: Кол-во бар сетки расписания в странице
+        :param int missing: Кол-во пропущенных бар в странице
+        """
+        self.class_code = class_code  # Код режима торгов
+        self.security_code = security_code  # Код тикера
+        self.schedule = schedule  # Расписание торгов
+        self.tf = tf  # Временной интервал
+        self.number = number  # Номер страницы тикера
+        self.first = first  # Открытие первого бара
+        self.last = last  # Открытие последнего бара
+        self.end = schedule.trade_bar_close_datetime(last, tf)  # Закрытие последнего бара. Конец запроса истории
+        self.bars = bars  # Кол-во бар в странице
+        self.missing = missing  # Кол-во пропущенных бар
+        self.attempt = 0  # Номер повторного запроса страницы. 0 - первый запрос
+
+    @property
+    def key(self) -> tuple:
+        """(код режима торгов, код тикера, временной интервал)"""
+        return self.class_code, self.security_code, str(self.tf)
+
+    def __repr__(self):
+        return f'{self.class_code}.{self.security_code} ({self.tf}) страница {self.number}: {self.first:%d.%m.%Y %H:%M:%S} - {self.end:%d.%m.%Y %H:%M:%S} ({self.bars} бар)'
+
+
+class RateLimiter:
+    """Ограничение частоты запросов к провайдеру из нескольких потоков. Запросы идут не чаще rate в секунду, подряд не больше burst"""
+    def __init__(self, rate, burst=1):
+        """
+        :param float rate: Максимальное кол-во запросов в секунду
+        :param int burst: Кол-во запросов, которые можно сделать подряд без ожидания
+        """
+        self.rate = rate  # Запросов в секунду
+        self.burst = burst  # Запросов подряд
+        self._tokens = float(burst)  # Доступные запросы
+        self._updated = monotonic()  # Время последнего пополнения доступных запросов
+        self._lock = Lock()  # Запросы делаются из разных потоков
+
+    def acquire(self):
+        """Ожидание разрешения на запрос"""
+        while True:
+            with self._lock:
+                now = monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)  # Пополняем доступные запросы за прошедшее время
+                self._updated = now
+                if self._tokens >= 1:  # Если запрос доступен
+                    self._tokens -= 1  # то забираем его
+                    return
+                timeout = (1 - self._tokens) / self.rate  # Время до следующего доступного запроса
+            sleep(timeout)  # Ждем вне блокировки, чтобы другие потоки могли проверить доступность
+
+
+class Backfill:
+    """Загрузка пропущенной истории множества тикеров при запуске. Пропуски каждого тикера делятся на страницы по сетке бар расписания
+    с ограничением провайдера на кол-во бар в ответе. Страницы получаются в ограниченном пуле потоков через одно подключение к провайдеру
+    с ограничением частоты запросов, а выдаются по каждому тикеру в порядке дат"""
+    def __init__(self, fetch, page_limit=1000, max_workers=8, rate=None, burst=1, retries=2, max_pending=None):
+        """
+        :param fetch: Функция получения истории fetch(page) через общее подключение к провайдеру. Возвращает бары страницы. Вызывается из разных потоков
+        :param int page_limit: Максимальное кол-во бар в одном запросе истории у провайдера
+        :param int max_workers: Максимальное кол-во одновременных запросов
+        :param float rate: Максимальное кол-во запросов в секунду. None - без ограничения
+        :param int burst: Кол-во запросов, которые можно сделать подряд без ожидания
+        :param int retries: Кол-во повторных запросов страницы при ошибке
+        :param int max_pending: Максимальное кол-во полученных, но не выданных страниц вместе с запрошенными. По умолчанию, 4 * max_workers
+        """
+        self.fetch = fetch  # Функция получения истории
+        self.checker = HistoryChecker(page_limit)  # Проверка полноты истории и деление пропусков на страницы
+        self.max_workers = max_workers  # Максимальное кол-во одновременных запросов
+        self.limiter = RateLimiter(rate, burst) if rate else None  # Ограничение частоты запросов
+        self.retries = retries  # Кол-во повторных запросов при ошибке
+        self.max_pending = max_pending or 4 * max_workers  # Ограничение памяти под страницы, ожидающие выдачи
+        self._queue = deque()  # Страницы, ожидающие запроса, по тикерам: deque страниц тикера
+
+    def add(self, class_code, security_code, schedule, tf, bar_times, start=None, end=None) -> HistoryGaps:
+        """Добавление тикера. Пропуски истории по сетке бар расписания делятся на страницы
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param Schedule schedule: Расписание торгов
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param bar_times: Даты и время открытия имеющихся бар на бирже. Например, BarStore.read(...)['time']
+        :param datetime start: Начальная дата и время на бирже (включительно). По умолчанию, первый имеющийся бар
+        :param datetime end: Конечная дата и время на бирже (не включительно). По умолчанию, открытие текущего несформированного бара
+        :return: Пропуски в истории тикера
+        """
+        gaps = self.checker.check(class_code, security_code, schedule, tf, bar_times, start, end)
+        pages = deque(BackfillPage(class_code, security_code, schedule, gaps.tf, number, window.first, window.last, window.bars, window.missing)
+                      for number, window in enumerate(gaps.windows))
+        if pages:  # Если есть пропуски
+            self._queue.append(pages)
+        return gaps
+
+    @property
+    def pages(self) -> int:
+        """Кол-во страниц, ожидающих запроса"""
+        return sum(len(pages) for pages in self._queue)
+
+    def run(self):
+        """Получение всех страниц. Генератор. Страницы тикеров запрашиваются по очереди, чтобы история всех тикеров загружалась одновременно
+
+        :return: (страница, бары). Страницы одного тикера выдаются в порядке дат. Если страница не получена после всех повторных запросов, то бары None
+        """
+        queue, self._queue = self._queue, deque()  # Забираем добавленные тикеры
+        ordered = {}  # Запрошенные страницы тикеров в порядке дат: ключ тикера -> deque (страница, future)
+        pending = set()  # Выполняющиеся запросы
+        in_flight = 0  # Кол-во запрошенных, но не выданных страниц
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='backfill_fetch') as executor:
+            while queue or pending:  # Пока есть страницы, ожидающие запроса, или выполняющиеся запросы
+                while queue and in_flight < self.max_pending:  # Запрашиваем страницы, пока не достигнуто ограничение
+                    pages = queue.popleft()  # Следующий тикер по очереди
+                    page = pages.popleft()  # Его следующая страница
+                    if pages:  # Если у тикера остались страницы
+                        queue.append(pages)  # то ставим его в конец очереди
+                    future = executor.submit(self._fetch, page)
+                    ordered.setdefault(page.key, deque()).append((page, future))
+                    pending.add(future)
+                    in_flight += 1
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)  # Ждем хотя бы один ответ
+                for future in done:  # Пробегаемся по всем полученным страницам
+                    page_key = future.result()[0].key  # Тикер страницы
+                    page_futures = ordered.get(page_key)
+                    if page_futures is None:  # Если страница уже выдана вместе с предыдущей страницей тикера
+                        continue
+                    while page_futures and page_futures[0][1].done():  # Выдаем идущие подряд полученные страницы тикера
+                        page, page_future = page_futures.popleft()
+                        in_flight -= 1
+                        yield page_future.result()
+                    if not page_futures:  # Если все запрошенные страницы тикера выданы
+                        del ordered[page_key]
+
+    def _fetch(self, page) -> tuple:
+        """Получение страницы в пуле потоков с повторными запросами при ошибке
+
+        :param BackfillPage page: Страница
+        :return: (страница, бары). Бары None, если страница не получена
+        """
+        while True:
+            if self.limiter:  # Если частота запросов ограничена
+                self.limiter.acquire()  # то ждем разрешения на запрос
+            try:
+                return page, self.fetch(page)  # Получаем бары
+            except Exception:  # Ошибка запроса не должна останавливать загрузку остальных страниц
+                if page.attempt >= self.retries:  # Если повторных запросов больше не будет
+                    logger.exception(f'{page}: страница не получена')
+                    return page, None
+                page.attempt += 1  # Следующий повторный запрос
+                logger.warning(f'{page}: ошибка получения. Повторный запрос {page.attempt}')
+
+
+class FakeHistoryProvider:
+    """Провайдер истории без обращения к серверу. Возвращает бары сетки расписания с заданной задержкой ответа. Для проверки загрузки истории"""
+    def __init__(self, latency=0.05, error_every=0):
+        """
+        :param float latency: Задержка ответа в секундах
+        :param int error_every: Каждый error_every запрос завершается ошибкой. 0 - без ошибок
+        """
+        self.latency = latency  # Задержка ответа
+        self.error_every = error_every  # Частота ошибок
+        self.requests = 0  # Кол-во запросов
+        self.concurrent = 0  # Кол-во одновременных запросов
+        self.max_concurrent = 0  # Наибольшее кол-во одновременных запросов
+        self._lock = Lock()
+
+    def fetch(self, page):
+        """Получение истории
+
+        :param BackfillPage page: Страница
+        :return: Даты и время открытия бар страницы datetime64[s]
+        """
+        with self._lock:
+            self.requests += 1
+            request = self.requests  # Номер запроса
+            self.concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self.concurrent)
+        try:
+            sleep(self.latency)  # Ждем ответа сервера
+            if self.error_every and request % self.error_every == 0:  # Если запрос должен завершиться ошибкой
+                raise ConnectionError('Нет ответа сервера')
+            return page.schedule.bars_array(page.first, page.end, page.tf)
+        finally:
+            with self._lock:
+                self.concurrent -= 1
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    import numpy as np
+    from MarketPy.Schedule import MOEXStocks
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%d.%m.%Y %H:%M:%S', level=logging.ERROR)
+    schedule = MOEXStocks()  # Расписание фондового рынка Московской Биржи
+    start, end = datetime(2025, 3, 1), datetime(2025, 4, 1)  # Месяц истории
+    grid = schedule.bars_array(start, end, 'M1')  # Все бары по расписанию
+    rng = np.random.default_rng(0)
+    provider = FakeHistoryProvider(latency=0.05, error_every=50)  # Одно подключение к провайдеру. Ответ за 50 мс, каждый 50-й запрос с ошибкой
+    backfill = Backfill(provider.fetch, page_limit=1000, max_workers=16, rate=200, burst=16)  # Не больше 200 запросов в секунду
+    symbols = 300  # Кол-во тикеров
+    for i in range(symbols):  # Пробегаемся по всем тикерам
+        present = grid[:rng.integers(0, grid.size)]  # История тикера загружена до случайного бара
+        backfill.add('TQBR', f'SEC{i:03}', schedule, 'M1', present, start, end)
+    pages = backfill.pages  # Кол-во страниц
+    started = monotonic()
+    missing = sum(gaps.stats()['missing'] for gaps in backfill.checker.reports.values())  # Кол-во пропущенных бар
+    received, last_number, failed = 0, {}, 0
+    for page, bars in backfill.run():  # Пробегаемся по всем полученным страницам
+        assert page.number == last_number.get(page.key, -1) + 1  # Страницы тикера выдаются по порядку
+        last_number[page.key] = page.number
+        if bars is None:
+            failed += 1
+        else:
+            received += bars.size
+    elapsed = monotonic() - started
+    print(f'{symbols} тикеров, {pages} страниц, {received} из {missing} бар за {elapsed:.1f} с. Не получено страниц: {failed}. '
+          f'Одновременных запросов до {provider.max_concurrent}. По одному запросу заняло бы {provider.requests * provider.latency:.0f} с')
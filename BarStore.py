@@ -0,0 +1,186 @@
+import os
+from datetime import datetime
+from threading import Lock
+from typing import Union
+
+import numpy as np  # Файлы бар читаются через numpy.memmap без копирования
+
+from MarketPy.Schedule import Schedule
+
+try:  # Блокировка файла записи между процессами
+    import fcntl  # Linux/macOS
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class BarStore:
+    """Локальное хранилище бар по (код режима торгов, код тикера, временной интервал).
+    Бары дописываются в конец файла записями фиксированной длины по возрастанию даты и времени открытия.
+    Пишет в файл один процесс, читают любые процессы через numpy.memmap без копирования"""
+    dtype = np.dtype([('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'), ('volume', '<i8')])  # Запись бара. time - кол-во секунд, прошедших с 01.01.1970 00:00 по времени биржи
+
+    def __init__(self, path='Bars'):
+        """
+        :param str path: Папка файлов бар
+        """
+        self.path = path  # Папка файлов бар
+        os.makedirs(path, exist_ok=True)
+        self._writers = {}  # Открытые на запись файлы: (файл бар, файл блокировки, секунды открытия последнего бара)
+        self._readers = {}  # Отображенные в память файлы: (кол-во бар, memmap)
+        self._lock = Lock()  # Запись и чтение из разных потоков
+
+    def filename(self, class_code, security_code, tf) -> str:
+        """Имя файла бар
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Имя файла бар
+        """
+        return os.path.join(self.path, f'{class_code}.{security_code}_{tf}.bars')
+
+    def append(self, class_code, security_code, tf, dt, open_, high, low, close, volume) -> bool:
+        """Запись бара
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param datetime dt: Дата и время открытия бара на бирже
+        :param float open_: Цена открытия
+        :param float high: Максимальная цена
+        :param float low: Минимальная цена
+        :param float close: Цена закрытия
+        :param int volume: Объем в штуках
+        :return: Бар записан. False, если бар с этой или более поздней датой и временем уже есть
+        """
+        bars = np.array([(Schedule._datetime_to_seconds(dt), open_, high, low, close, volume)], dtype=self.dtype)
+        return self.append_array(class_code, security_code, tf, bars) == 1
+
+    def append_array(self, class_code, security_code, tf, bars) -> int:
+        """Запись массива бар. Записываются только бары позже последнего записанного
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param np.ndarray bars: Массив бар BarStore.dtype по возрастанию даты и времени открытия
+        :return: Кол-во записанных бар
+        """
+        bars = np.asarray(bars, dtype=self.dtype)
+        with self._lock:
+            key = (class_code, security_code, tf)
+            writer = self._writers.get(key)
+            if writer is None:  # Если файл еще не открыт на запись
+                writer = self._writers[key] = self._open_writer(self.filename(class_code, security_code, tf))  # то открываем его
+            bar_file, lock_file, last_time = writer
+            bars = bars[bars['time'] > last_time]  # Бары позже последнего записанного
+            if bars.size == 0:  # Если новых бар нет
+                return 0  # то выходим, дальше не продолжаем
+            if np.any(np.diff(bars['time']) <= 0):  # Бары в файле должны идти по возрастанию без повторов
+                raise ValueError('Бары должны идти по возрастанию даты и времени открытия')
+            bar_file.write(bars.tobytes())  # Дописываем бары целыми записями
+            bar_file.flush()  # Читающие процессы увидят бары сразу
+            self._writers[key] = (bar_file, lock_file, int(bars['time'][-1]))
+            return bars.size
+
+    def read(self, class_code, security_code, tf, start=None, end=None) -> np.ndarray:
+        """Чтение бар без копирования. Бары ищутся двоичным поиском по дате и времени открытия
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param datetime start: Дата и время открытия первого бара на бирже (включительно). По умолчанию, с первого бара
+        :param datetime end: Дата и время открытия последнего бара на бирже (не включительно). По умолчанию, до последнего бара
+        :return: Массив бар BarStore.dtype, отображенный на файл
+        """
+        bars = self._map(self.filename(class_code, security_code, tf))  # Все бары
+        times = bars['time']  # Даты и время открытия бар без копирования
+        i = 0 if start is None else int(np.searchsorted(times, Schedule._datetime_to_seconds(start), 'left'))  # Первый бар
+        j = len(bars) if end is None else int(np.searchsorted(times, Schedule._datetime_to_seconds(end), 'left'))  # Бар после последнего
+        return bars[i:j]
+
+    def last_datetime(self, class_code, security_code, tf) -> Union[datetime, None]:
+        """Дата и время открытия последнего бара на бирже
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Дата и время открытия последнего бара. None, если бар нет
+        """
+        bars = self._map(self.filename(class_code, security_code, tf))
+        return Schedule._seconds_to_datetime(int(bars['time'][-1])) if len(bars) else None
+
+    def close(self):
+        """Закрытие файлов записи со снятием блокировок"""
+        with self._lock:
+            for bar_file, lock_file, _ in self._writers.values():  # Пробегаемся по всем открытым на запись файлам
+                bar_file.close()
+                lock_file.close()  # Блокировка снимается при закрытии файла
+            self._writers.clear()
+            self._readers.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _open_writer(self, filename) -> tuple:
+        """Открытие файла бар на запись с блокировкой от записи другими процессами
+
+        :param str filename: Имя файла бар
+        :return: Файл бар, файл блокировки, секунды открытия последнего бара
+        """
+        lock_file = open(f'{filename}.lock', 'a+b')  # Файл блокировки
+        try:
+            if fcntl:  # Linux/macOS
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:  # Windows
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(f'В файл {filename} уже пишет другой процесс')
+        bar_file = open(filename, 'ab')
+        size = bar_file.seek(0, os.SEEK_END)  # Размер файла
+        if size % self.dtype.itemsize:  # Если последний бар записан не полностью (процесс завершился во время записи)
+            size -= size % self.dtype.itemsize
+            bar_file.truncate(size)  # то удаляем его
+        last_time = np.iinfo(np.int64).min  # Если бар нет, то записываем любые бары
+        if size:  # Если бары есть
+            with open(filename, 'rb') as f:
+                f.seek(size - self.dtype.itemsize)
+                last_time = int(np.frombuffer(f.read(self.dtype.itemsize), dtype=self.dtype)['time'][0])  # Секунды открытия последнего бара
+        return bar_file, lock_file, last_time
+
+    def _map(self, filename) -> np.ndarray:
+        """Отображение файла бар в память. Файл отображается заново, только если в него дописаны бары
+
+        :param str filename: Имя файла бар
+        :return: Массив бар BarStore.dtype, отображенный на файл
+        """
+        count = os.path.getsize(filename) // self.dtype.itemsize if os.path.exists(filename) else 0  # Кол-во записанных целиком бар
+        with self._lock:
+            reader = self._readers.get(filename)
+            if reader is not None and reader[0] == count:  # Если новых бар нет
+                return reader[1]  # то возвращаем отображенный файл
+            bars = np.memmap(filename, dtype=self.dtype, mode='r', shape=(count,)) if count else np.empty(0, dtype=self.dtype)  # Пустой файл отобразить нельзя
+            self._readers[filename] = (count, bars)
+            return bars
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    from tempfile import TemporaryDirectory
+    from timeit import timeit
+    from MarketPy.Schedule import MOEXStocks
+
+    schedule = MOEXStocks()  # Расписание фондового рынка Московской Биржи
+    times = schedule.bars_array(datetime(2020, 1, 1), datetime(2025, 1, 1), 'M1').astype(np.int64)  # 5 лет минутных бар по расписанию
+    bars = np.zeros(times.size, dtype=BarStore.dtype)
+    bars['time'] = times
+    bars['open'] = bars['high'] = bars['low'] = bars['close'] = 100.0
+    with TemporaryDirectory() as path, BarStore(path) as store:
+        print(f'Запись {bars.size} бар: {timeit(lambda: store.append_array("TQBR", "SBER", "M1", bars), number=1):.3f} с')
+        start, end = datetime(2024, 12, 2, 10), datetime(2024, 12, 2, 11)  # Час торгов
+        us = timeit(lambda: store.read('TQBR', 'SBER', 'M1', start, end), number=10000) * 100  # Время одного чтения в микросекундах
+        print(f'Чтение {len(store.read("TQBR", "SBER", "M1", start, end))} бар: {us:.2f} мкс')
+        print(f'Последний бар: {store.last_datetime("TQBR", "SBER", "M1")}')
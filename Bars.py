@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+from operator import itemgetter  # Поля бара по номеру в кортеже
+
+import numpy as np  # Пакетный разбор бар в массив
+
+from MarketPy.Schedule import Schedule
+from MarketPy.BarStore import BarStore
+
+
+class Bar(tuple):
+    """Бар. Неизменяемый, поэтому один объект можно передавать любому кол-ву получателей.
+    Кортеж создается быстрее объекта с атрибутами, поэтому разбор бар не тратит время на их создание"""
+    __slots__ = ()
+
+    def __new__(cls, dt, open_, high, low, close, volume):
+        """
+        :param datetime dt: Дата и время открытия бара на бирже
+        :param float open_: Цена открытия
+        :param float high: Максимальная цена
+        :param float low: Минимальная цена
+        :param float close: Цена закрытия
+        :param int volume: Объем в штуках
+        """
+        return tuple.__new__(cls, (dt, open_, high, low, close, volume))
+
+    dt = property(itemgetter(0), doc='Дата и время открытия бара на бирже')
+    open = property(itemgetter(1), doc='Цена открытия')
+    high = property(itemgetter(2), doc='Максимальная цена')
+    low = property(itemgetter(3), doc='Минимальная цена')
+    close = property(itemgetter(4), doc='Цена закрытия')
+    volume = property(itemgetter(5), doc='Объем в штуках')
+
+    def __repr__(self):
+        return f'{self.dt:%d.%m.%Y %H:%M:%S} - Open = {self.open}, High = {self.high}, Low = {self.low}, Close = {self.close}, Volume = {self.volume}'
+
+
+def bars_from_array(bars) -> list:
+    """Перевод массива бар в список бар
+
+    :param np.ndarray bars: Массив бар BarStore.dtype
+    :return: Список бар
+    """
+    epoch = Schedule.epoch  # Секунды отсчитываются с 01.01.1970 00:00 по времени биржи
+    return [Bar(epoch + timedelta(seconds=seconds), open_, high, low, close, volume) for seconds, open_, high, low, close, volume in bars.tolist()]
+
+
+def quotation_to_float(quotation) -> float:
+    """Перевод цены Tinkoff Quotation (целая часть units, дробная часть nano в миллиардных долях) в вещественное число
+
+    :param quotation: Цена Tinkoff Quotation
+    :return: Цена
+    """
+    return quotation.units + quotation.nano / 1_000_000_000
+
+
+def decimal_to_float(decimal) -> float:
+    """Перевод цены Finam Decimal (мантисса num, кол-во знаков после запятой scale) в вещественное число
+
+    :param decimal: Цена Finam Decimal
+    :return: Цена
+    """
+    return decimal.num / 10 ** decimal.scale
+
+
+def finam_candle_to_bar(candle, schedule, intraday) -> Bar:
+    """Бар Finam IntradayCandle/DayCandle из сообщения protobuf без перевода в словарь
+
+    :param candle: Бар Finam IntradayCandle (внутридневной) или DayCandle
+    :param Schedule schedule: Расписание торгов
+    :param bool intraday: Внутридневной временной интервал
+    :return: Бар
+    """
+    dt = schedule.utc_timestamp_to_msk_datetime(candle.timestamp.seconds) if intraday else datetime(candle.date.year, candle.date.month, candle.date.day)  # Дату/время переводим из UTC в МСК
+    return Bar(dt, decimal_to_float(candle.open), decimal_to_float(candle.high), decimal_to_float(candle.low), decimal_to_float(candle.close), candle.volume)
+
+
+def tinkoff_candle_to_bar(candle, schedule, intraday, lot) -> Bar:
+    """Бар Tinkoff HistoricCandle из сообщения protobuf без перевода в словарь
+
+    :param candle: Бар Tinkoff HistoricCandle
+    :param Schedule schedule: Расписание торгов
+    :param bool intraday: Внутридневной временной интервал
+    :param int lot: Кол-во штук в лоте
+    :return: Бар
+    """
+    seconds = candle.time.seconds  # Дата и время начала бара в timestamp UTC
+    dt = schedule.utc_timestamp_to_msk_datetime(seconds) if intraday else Schedule.epoch + timedelta(days=seconds // 86400)  # Дату/время переводим из UTC в МСК. Дневной бар по дате UTC
+    return Bar(dt, quotation_to_float(candle.open), quotation_to_float(candle.high), quotation_to_float(candle.low), quotation_to_float(candle.close), candle.volume * lot)
+
+
+def alor_bar_to_bar(bar, schedule, lot) -> Bar:
+    """Бар из истории Alor
+
+    :param dict bar: Бар из ответа Alor get_history
+    :param Schedule schedule: Расписание торгов
+    :param int lot: Кол-во штук в лоте
+    :return: Бар
+    """
+    return Bar(schedule.utc_timestamp_to_msk_datetime(int(bar['time'])), float(bar['open']), float(bar['high']), float(bar['low']), float(bar['close']), int(bar['volume'] * lot))
+
+
+def finam_candles_to_array(candles, schedule, intraday) -> np.ndarray:
+    """Бары Finam из сообщения protobuf в массив за один проход
+
+    :param candles: Бары Finam IntradayCandle (внутридневные) или DayCandle. Например, get_intraday_candles(...).candles
+    :param Schedule schedule: Расписание торгов
+    :param bool intraday: Внутридневной временной интервал
+    :return: Массив бар BarStore.dtype
+    """
+    epoch_ordinal = Schedule.epoch_ordinal
+    bars = np.array([(candle.timestamp.seconds if intraday else (datetime(candle.date.year, candle.date.month, candle.date.day).toordinal() - epoch_ordinal) * 86400,
+                      candle.open.num / 10 ** candle.open.scale, candle.high.num / 10 ** candle.high.scale,
+                      candle.low.num / 10 ** candle.low.scale, candle.close.num / 10 ** candle.close.scale, candle.volume) for candle in candles], dtype=BarStore.dtype)
+    if intraday:  # Для внутридневных бар
+        bars['time'] = schedule.market_converter.utc_to_local_array(bars['time'])  # переводим время из UTC в МСК
+    return bars
+
+
+def tinkoff_candles_to_array(candles, schedule, intraday, lot) -> np.ndarray:
+    """Бары Tinkoff из сообщения protobuf в массив за один проход
+
+    :param candles: Бары Tinkoff HistoricCandle. Например, GetCandles(...).candles
+    :param Schedule schedule: Расписание торгов
+    :param bool intraday: Внутридневной временной интервал
+    :param int lot: Кол-во штук в лоте
+    :return: Массив бар BarStore.dtype
+    """
+    bars = np.array([(candle.time.seconds, candle.open.units + candle.open.nano / 1_000_000_000, candle.high.units + candle.high.nano / 1_000_000_000,
+                      candle.low.units + candle.low.nano / 1_000_000_000, candle.close.units + candle.close.nano / 1_000_000_000, candle.volume) for candle in candles], dtype=BarStore.dtype)
+    bars['volume'] *= lot  # Объем в штуках
+    bars['time'] = schedule.market_converter.utc_to_local_array(bars['time']) if intraday else bars['time'] // 86400 * 86400  # Время из UTC в МСК. Дневной бар по дате UTC
+    return bars
+
+
+def alor_history_to_array(history, schedule, lot) -> np.ndarray:
+    """Бары из истории Alor в массив за один проход
+
+    :param list[dict] history: Бары из ответа Alor get_history(...)['history']
+    :param Schedule schedule: Расписание торгов
+    :param int lot: Кол-во штук в лоте
+    :return: Массив бар BarStore.dtype
+    """
+    bars = np.array([(bar['time'], bar['open'], bar['high'], bar['low'], bar['close'], bar['volume']) for bar in history], dtype=BarStore.dtype)
+    bars['volume'] *= lot  # Объем в штуках
+    bars['time'] = schedule.market_converter.utc_to_local_array(bars['time'])  # Время из UTC в МСК
+    return bars
@@ -0,0 +1,102 @@
+from datetime import datetime
+from math import isclose
+from timeit import timeit
+
+from google.protobuf import descriptor_pb2, descriptor_pool, message_factory, timestamp_pb2
+from google.protobuf.json_format import MessageToDict
+
+from MarketPy.Schedule import MOEXStocks
+from MarketPy.Bars import bars_from_array, tinkoff_candle_to_bar, finam_candle_to_bar, tinkoff_candles_to_array, finam_candles_to_array, alor_bar_to_bar, alor_history_to_array
+
+
+def build_messages():
+    """Классы сообщений protobuf с теми же полями, что и у Tinkoff GetCandlesResponse и Finam GetIntradayCandlesResult. Чтобы не зависеть от TinkoffPy и FinamPy
+
+    :return: Класс ответа Tinkoff, класс ответа Finam
+    """
+    pool = descriptor_pool.DescriptorPool()
+    pool.AddSerializedFile(timestamp_pb2.DESCRIPTOR.serialized_pb)
+    file = descriptor_pb2.FileDescriptorProto(name='bars.proto', package='bench', syntax='proto3', dependency=['google/protobuf/timestamp.proto'])
+    message_type = descriptor_pb2.FieldDescriptorProto
+    fields = {'Quotation': [('units', 1, message_type.TYPE_INT64, None, False), ('nano', 2, message_type.TYPE_INT32, None, False)],
+              'HistoricCandle': [('open', 1, message_type.TYPE_MESSAGE, '.bench.Quotation', False), ('high', 2, message_type.TYPE_MESSAGE, '.bench.Quotation', False),
+                                 ('low', 3, message_type.TYPE_MESSAGE, '.bench.Quotation', False), ('close', 4, message_type.TYPE_MESSAGE, '.bench.Quotation', False),
+                                 ('volume', 5, message_type.TYPE_INT64, None, False), ('time', 6, message_type.TYPE_MESSAGE, '.google.protobuf.Timestamp', False),
+                                 ('is_complete', 7, message_type.TYPE_BOOL, None, False)],
+              'GetCandlesResponse': [('candles', 1, message_type.TYPE_MESSAGE, '.bench.HistoricCandle', True)],
+              'Decimal': [('num', 1, message_type.TYPE_INT64, None, False), ('scale', 2, message_type.TYPE_UINT32, None, False)],
+              'IntradayCandle': [('timestamp', 1, message_type.TYPE_MESSAGE, '.google.protobuf.Timestamp', False), ('open', 2, message_type.TYPE_MESSAGE, '.bench.Decimal', False),
+                                 ('close', 3, message_type.TYPE_MESSAGE, '.bench.Decimal', False), ('high', 4, message_type.TYPE_MESSAGE, '.bench.Decimal', False),
+                                 ('low', 5, message_type.TYPE_MESSAGE, '.bench.Decimal', False), ('volume', 6, message_type.TYPE_INT64, None, False)],
+              'GetIntradayCandlesResult': [('candles', 1, message_type.TYPE_MESSAGE, '.bench.IntradayCandle', True)]}
+    for name, message_fields in fields.items():
+        message = file.message_type.add(name=name)
+        for field_name, number, field_type, type_name, repeated in message_fields:
+            field = message.field.add(name=field_name, number=number, type=field_type, label=message_type.LABEL_REPEATED if repeated else message_type.LABEL_OPTIONAL)
+            if type_name:
+                field.type_name = type_name
+    pool.Add(file)
+    return (message_factory.GetMessageClass(pool.FindMessageTypeByName('bench.GetCandlesResponse')),
+            message_factory.GetMessageClass(pool.FindMessageTypeByName('bench.GetIntradayCandlesResult')))
+
+
+def dict_quotation_to_float(quotation) -> float:
+    """Перевод цены из словаря, как в TinkoffPy"""
+    return int(quotation['units']) + int(quotation['nano']) / 10 ** 9
+
+
+def dict_decimal_to_float(decimal) -> float:
+    """Перевод цены из словаря, как в FinamPy"""
+    return int(decimal['num']) * 10 ** -int(decimal['scale'])
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    schedule = MOEXStocks()  # Расписание фондового рынка Московской Биржи
+    GetCandlesResponse, GetIntradayCandlesResult = build_messages()
+    count = 1000  # Кол-во бар в ответе
+    first = int(schedule.msk_datetime_to_utc_timestamp(datetime(2025, 3, 17, 10)))  # Первый бар в timestamp UTC
+    tinkoff = GetCandlesResponse()
+    finam = GetIntradayCandlesResult()
+    for i in range(count):  # Записываем ответы
+        candle = tinkoff.candles.add(volume=100 + i, is_complete=True)
+        candle.time.seconds = first + i * 60
+        for field, price in (('open', 300.12), ('high', 300.5), ('low', 299.9), ('close', 300.25)):
+            getattr(candle, field).units, getattr(candle, field).nano = int(price), round(price % 1 * 1e9)
+        candle = finam.candles.add(volume=100 + i)
+        candle.timestamp.seconds = first + i * 60
+        for field, price in (('open', 30012), ('high', 30050), ('low', 29990), ('close', 30025)):
+            getattr(candle, field).num, getattr(candle, field).scale = price, 2
+    tinkoff = GetCandlesResponse.FromString(tinkoff.SerializeToString())  # Записанный ответ
+    finam = GetIntradayCandlesResult.FromString(finam.SerializeToString())
+    alor = [{'time': first + i * 60, 'open': 300.12, 'high': 300.5, 'low': 299.9, 'close': 300.25, 'volume': 10 + i} for i in range(count)]
+
+    def tinkoff_dict():
+        bars = MessageToDict(tinkoff, always_print_fields_with_no_presence=True)['candles']
+        return [(schedule.utc_to_msk_datetime(datetime.fromisoformat(bar['time'][:-1])), dict_quotation_to_float(bar['open']), dict_quotation_to_float(bar['high']),
+                 dict_quotation_to_float(bar['low']), dict_quotation_to_float(bar['close']), int(bar['volume']) * 10) for bar in bars]
+
+    def finam_dict():
+        bars = MessageToDict(finam, always_print_fields_with_no_presence=True)['candles']
+        return [(schedule.utc_to_msk_datetime(datetime.fromisoformat(bar['timestamp'][:-1])), dict_decimal_to_float(bar['open']), dict_decimal_to_float(bar['high']),
+                 dict_decimal_to_float(bar['low']), dict_decimal_to_float(bar['close']), int(bar['volume'])) for bar in bars]
+
+    def alor_dict():
+        return [(schedule.utc_timestamp_to_msk_datetime(int(bar['time'])), float(bar['open']), float(bar['high']), float(bar['low']), float(bar['close']), int(bar['volume'] * 10)) for bar in alor]
+
+    number = 20  # Кол-во повторов
+    cases = (('Tinkoff', tinkoff_dict, lambda: [tinkoff_candle_to_bar(candle, schedule, True, 10) for candle in tinkoff.candles], lambda: tinkoff_candles_to_array(tinkoff.candles, schedule, True, 10)),
+             ('Finam', finam_dict, lambda: [finam_candle_to_bar(candle, schedule, True) for candle in finam.candles], lambda: finam_candles_to_array(finam.candles, schedule, True)),
+             ('Alor', alor_dict, lambda: [alor_bar_to_bar(bar, schedule, 10) for bar in alor], lambda: alor_history_to_array(alor, schedule, 10)))
+    for name, dict_path, bar_path, array_path in cases:  # Пробегаемся по всем провайдерам
+        expected = dict_path()  # Бары, разобранные через словарь
+        from_bars = [(bar.dt, bar.open, bar.high, bar.low, bar.close, bar.volume) for bar in bar_path()]
+        from_array = [(bar.dt, bar.open, bar.high, bar.low, bar.close, bar.volume) for bar in bars_from_array(array_path())]
+        for decoded in (from_bars, from_array):  # Разбор без словаря должен давать те же бары
+            assert len(decoded) == len(expected)
+            for actual_bar, expected_bar in zip(decoded, expected):
+                assert actual_bar[0] == expected_bar[0] and actual_bar[5] == expected_bar[5], (name, actual_bar, expected_bar)
+                assert all(isclose(a, e, rel_tol=1e-12) for a, e in zip(actual_bar[1:5], expected_bar[1:5])), (name, actual_bar, expected_bar)  # num * 10 ** -scale и num / 10 ** scale могут различаться в последнем знаке
+        us_dict = timeit(dict_path, number=number) / number / count * 1_000_000  # Время разбора одного бара в микросекундах
+        us_bar = timeit(bar_path, number=number) / number / count * 1_000_000
+        us_array = timeit(array_path, number=number) / number / count * 1_000_000
+        print(f'{name:<8} словарь: {us_dict:6.2f} мкс, Bar: {us_bar:6.2f} мкс ({us_dict / us_bar:5.1f} раз), массив: {us_array:6.2f} мкс ({us_dict / us_array:5.1f} раз) на бар')
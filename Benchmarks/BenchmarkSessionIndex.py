@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+from timeit import timeit
+
+from MarketPy.Schedule import Schedule, MOEXStocks, MOEXBonds, MOEXFutures
+
+
+class LinearSchedule(Schedule):
+    """Поиск торговых сессий перебором списка, как было до индекса торговых сессий. Для сравнения скорости"""
+    def __init__(self, schedule):
+        """
+        :param Schedule schedule: Расписание торгов
+        """
+        super(LinearSchedule, self).__init__(schedule.trade_sessions, schedule.delta)
+
+    def trade_session(self, dt_market):
+        if dt_market.weekday() in (5, 6):
+            return None
+        return next((session for session in self.trade_sessions if session.time_begin <= dt_market.time() <= session.time_end), None)
+
+    def last_session_time_end(self, dt_market):
+        if dt_market.weekday() in (5, 6):
+            return datetime.combine((dt_market - timedelta(days=dt_market.weekday()-4)).date(), self.market_time_end)
+        t_market = dt_market.time()
+        if dt_market.weekday() == 0 and t_market < self.market_time_begin:
+            return datetime.combine((dt_market - timedelta(days=3)).date(), self.market_time_end)
+        i = -1
+        for session in self.trade_sessions:
+            if t_market < session.time_end:
+                break
+            i += 1
+        if i == -1:
+            return datetime.combine((dt_market - timedelta(days=1)).date(), self.market_time_end)
+        return datetime.combine(dt_market.date(), self.trade_sessions[i].time_end)
+
+    def time_until_trade(self, dt_market):
+        session = self.trade_session(dt_market)
+        if session:
+            return timedelta()
+        for s in self.trade_sessions:
+            if s.time_begin > dt_market.time():
+                session = s
+                break
+        d_market = dt_market.date()
+        if not session:
+            session = self.trade_sessions[0]
+            d_market += timedelta(1)
+        w_market = d_market.weekday()
+        if w_market in (5, 6):
+            d_market += timedelta(7 - w_market)
+        dt_next_session = datetime(d_market.year, d_market.month, d_market.day, session.time_begin.hour, session.time_begin.minute, session.time_begin.second)
+        return dt_next_session - dt_market
+
+
+def benchmark(name, function, dts, number=3):
+    """Время выполнения функции по всем датам и времени в микросекундах на вызов
+
+    :param str name: Название замера
+    :param function: Функция от даты и времени на бирже
+    :param list[datetime] dts: Даты и время на бирже
+    :param int number: Кол-во повторов
+    :return: Время одного вызова в микросекундах
+    """
+    seconds = timeit(lambda: [function(dt) for dt in dts], number=number)  # Общее время выполнения
+    us = seconds / number / len(dts) * 1_000_000  # Время одного вызова в микросекундах
+    print(f'{name:<40}: {us:8.3f} мкс')
+    return us
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    dt_begin = datetime(2025, 3, 17)  # Понедельник
+    dts = [dt_begin + timedelta(seconds=seconds) for seconds in range(0, 7 * 86400, 37)]  # Неделя дат и времени на бирже с шагом 37 секунд
+    for schedule in (MOEXStocks(), MOEXBonds(), MOEXFutures()):  # Пробегаемся по всем расписаниям
+        linear = LinearSchedule(schedule)  # Перебор списка торговых сессий
+        schedule.last_session_time_end(dt_begin)  # Индекс торговых сессий строим до замеров
+        print(f'\n{type(schedule).__name__}')
+        for method in ('trade_session', 'last_session_time_end', 'time_until_trade'):  # Пробегаемся по всем функциям, использующим индекс
+            us_linear = benchmark(f'{method} (перебор)', getattr(linear, method), dts)
+            us_index = benchmark(f'{method} (индекс)', getattr(schedule, method), dts)
+            print(f'{"Ускорение":<40}: {us_linear / us_index:8.2f} раз')
+        for tf in ('M1', 'M60', 'D1'):  # Пробегаемся по временнЫм интервалам
+            us_linear = benchmark(f'trade_bar_request_datetime {tf} (перебор)', lambda dt: linear.trade_bar_request_datetime(dt, tf), dts)
+            us_index = benchmark(f'trade_bar_request_datetime {tf} (индекс)', lambda dt: schedule.trade_bar_request_datetime(dt, tf), dts)
+            print(f'{"Ускорение":<40}: {us_linear / us_index:8.2f} раз')
@@ -0,0 +1,166 @@
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime, timedelta
+from time import perf_counter, process_time
+
+import numpy as np
+
+from MarketPy.Schedule import Schedule, MOEXStocks, MOEXBonds, MOEXFutures
+
+
+TFS = ('M1', 'M5', 'M10', 'M15', 'M30', 'M60', 'H1', 'D1', 'W1', 'MN1', 'Y1')  # Все поддерживаемые временнЫе интервалы
+
+
+class FakeAlorProvider:
+    """Провайдер с ответом в формате истории Alor без обращения к серверу. Для замера затрат цикла получения бар"""
+    def get_history(self, exchange, symbol, tf, seconds_from):
+        return {'history': [{'time': seconds_from, 'open': 300.5, 'high': 301.0, 'low': 300.1, 'close': 300.7, 'volume': 1234}], 'next': None, 'prev': None}
+
+
+def measure(function, values, repeat) -> float:
+    """Время выполнения функции по всем значениям в наносекундах на вызов. Лучший из повторов
+
+    :param function: Функция от значения
+    :param list values: Значения
+    :param int repeat: Кол-во повторов
+    :return: Время одного вызова в наносекундах
+    """
+    best = float('inf')
+    for _ in range(repeat):  # Повторяем замер, чтобы убрать влияние других процессов
+        start = perf_counter()
+        for value in values:
+            function(value)
+        best = min(best, perf_counter() - start)
+    return best / len(values) * 1_000_000_000
+
+
+def stream_loop_iteration(schedule, tf, provider, market_datetime_now, si):
+    """Одна итерация цикла получения бар из примеров Examples без ожидания: расчет дат и времени бара, запрос, разбор и запись в лог
+
+    :param Schedule schedule: Расписание торгов
+    :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+    :param FakeAlorProvider provider: Провайдер
+    :param datetime market_datetime_now: Текущее время на бирже
+    :param dict si: Информация о тикере
+    :return: Сообщение о полученном баре
+    """
+    trade_bar_open_datetime = schedule.trade_bar_open_datetime(market_datetime_now, tf)  # Дата и время открытия бара, который будем получать
+    trade_bar_request_datetime = schedule.trade_bar_request_datetime(market_datetime_now, tf)  # Дата и время запроса бара на бирже
+    sleep_time_secs = (trade_bar_request_datetime - market_datetime_now).total_seconds()  # Время ожидания в секундах
+    seconds_from = schedule.msk_datetime_to_utc_timestamp(trade_bar_open_datetime)  # Дата и время бара в timestamp UTC
+    bar = provider.get_history('MOEX', 'SBER', 60, seconds_from)['history'][0]  # Первый (завершенный) бар
+    dt = schedule.utc_timestamp_to_msk_datetime(int(bar['time']))
+    volume = int(bar['volume'] * si['lotsize'])
+    return f'Получен бар: TQBR.SBER ({tf}) - {dt:%d.%m.%Y %H:%M:%S} - Open = {float(bar["open"])}, High = {float(bar["high"])}, Low = {float(bar["low"])}, Close = {float(bar["close"])}, Volume = {volume}, {sleep_time_secs}'
+
+
+def run(sample, repeat) -> dict:
+    """Замеры всех функций
+
+    :param int sample: Кол-во случайных дат и времени за год в каждом ряду. 0 - все минуты года
+    :param int repeat: Кол-во повторов замера
+    :return: Время одного вызова в наносекундах по названиям замеров
+    """
+    rng = np.random.default_rng(0)
+    year_begin = datetime(2024, 1, 1)  # Замеры за полный год
+    year_seconds = 366 * 86400  # 2024 год високосный
+    minutes = np.arange(0, year_seconds, 60) if sample == 0 else np.sort(rng.choice(year_seconds // 60, sample, replace=False)) * 60  # Ряд с точностью до минуты
+    seconds = np.arange(0, year_seconds, 60) + rng.integers(0, 60, year_seconds // 60) if sample == 0 else np.sort(rng.choice(year_seconds, sample, replace=False))  # Ряд с точностью до секунды
+    series = {'min': [year_begin + timedelta(seconds=int(s)) for s in minutes],
+              'sec': [year_begin + timedelta(seconds=int(s)) for s in seconds]}
+    results = {}
+
+    def record(name, ns):
+        results[name] = ns
+        print(f'{name:<60}: {ns:10.1f} нс')
+
+    for tf in TFS:  # Разбор временнОго интервала не зависит от расписания
+        record(f'parse_tf {tf}', measure(Schedule.parse_tf, [tf] * 1000, repeat))
+    for schedule in (MOEXStocks(), MOEXBonds(), MOEXFutures()):  # Пробегаемся по всем расписаниям
+        name = type(schedule).__name__
+        for resolution, dts in series.items():  # Пробегаемся по рядам
+            schedule.last_session_time_end(dts[0])  # Индекс торговых сессий строим до замеров
+            for method in ('trade_session', 'last_session_time_end', 'time_until_trade'):
+                record(f'{name} {method} {resolution}', measure(getattr(schedule, method), dts, repeat))
+            for tf in TFS:  # Пробегаемся по всем временнЫм интервалам
+                for method in ('trade_bar_open_datetime', 'trade_bar_close_datetime', 'trade_bar_request_datetime'):
+                    function = getattr(schedule, method)
+                    record(f'{name} {method} {tf} {resolution}', measure(lambda dt: function(dt, tf), dts, repeat))
+    schedule = MOEXStocks()  # Функции временнОй зоны одинаковы для всех расписаний
+    dts = series['sec']
+    timestamps = [int(schedule.msk_datetime_to_utc_timestamp(dt)) for dt in dts]
+    record('utc_to_msk_datetime', measure(schedule.utc_to_msk_datetime, dts, repeat))
+    record('msk_to_utc_datetime', measure(schedule.msk_to_utc_datetime, dts, repeat))
+    record('msk_datetime_to_utc_timestamp', measure(schedule.msk_datetime_to_utc_timestamp, dts, repeat))
+    record('utc_timestamp_to_msk_datetime', measure(schedule.utc_timestamp_to_msk_datetime, timestamps, repeat))
+    provider, si = FakeAlorProvider(), {'lotsize': 10}  # Провайдер без обращения к серверу
+    for tf in ('M1', 'M60', 'D1'):
+        best = float('inf')
+        for _ in range(repeat):  # Затраты процессора на итерацию цикла получения бар
+            start = process_time()
+            for dt in dts:
+                stream_loop_iteration(schedule, tf, provider, dt, si)
+            best = min(best, process_time() - start)
+        record(f'stream loop iteration {tf} (cpu)', best / len(dts) * 1_000_000_000)
+    return results
+
+
+def compare(results, baseline, threshold, floor) -> list:
+    """Сравнение замеров с базовыми. Быстрые функции в сотни наносекунд дрожат на десятки процентов от запуска к запуску,
+    поэтому замедлением считается только превышение и допустимого процента, и абсолютного порога
+
+    :param dict results: Время одного вызова в наносекундах по названиям замеров
+    :param dict baseline: Базовое время одного вызова в наносекундах по названиям замеров
+    :param float threshold: Допустимое замедление. 0.25 - на 25%
+    :param float floor: Допустимое замедление в наносекундах на вызов
+    :return: Список замедлений сверх допустимого: (название, базовое время, время)
+    """
+    return [(name, baseline[name], ns) for name, ns in results.items() if name in baseline and ns > baseline[name] * (1 + threshold) and ns - baseline[name] > floor]
+
+
+def geomean_ratio(results, baseline) -> float:
+    """Среднее геометрическое отношений замеров к базовым. Общая картина, на которую не влияют отдельные выбросы
+
+    :param dict results: Время одного вызова в наносекундах по названиям замеров
+    :param dict baseline: Базовое время одного вызова в наносекундах по названиям замеров
+    :return: Среднее геометрическое отношений. 1.1 - в среднем медленнее на 10%
+    """
+    ratios = [ns / baseline[name] for name, ns in results.items() if name in baseline and baseline[name] > 0]
+    return float(np.exp(np.mean(np.log(ratios)))) if ratios else 1.0
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    parser = argparse.ArgumentParser(description='Замеры скорости функций расписания и цикла получения бар')
+    parser.add_argument('--sample', type=int, default=5000, help='Кол-во случайных дат и времени за год в каждом ряду. 0 - все минуты года')
+    parser.add_argument('--repeat', type=int, default=7, help='Кол-во повторов замера. Берется лучший')
+    parser.add_argument('--baseline', default='BenchmarkSuite.json', help='Файл базовых замеров JSON')
+    parser.add_argument('--save', action='store_true', help='Сохранить замеры как базовые')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Допустимое замедление относительно базовых замеров. 0.25 - на 25%%')
+    parser.add_argument('--floor', type=float, default=50.0, help='Допустимое замедление в наносекундах на вызов. Меньшие замедления считаются шумом')
+    args = parser.parse_args()
+
+    results = run(args.sample, args.repeat)
+    if args.save:  # Если нужно сохранить замеры как базовые
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version, 'platform': platform.platform(), 'sample': args.sample, 'repeat': args.repeat, 'results': results}, f, indent=2)
+        print(f'\nБазовые замеры сохранены в {args.baseline}')
+        sys.exit(0)
+    try:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print(f'\nФайл базовых замеров {args.baseline} не найден. Сохраните замеры через --save')
+        sys.exit(0)
+    if baseline.get('sample') != args.sample:  # Замеры по рядам разной длины не сравниваются: другие даты и время, другие попадания в кеш
+        print(f'\nБазовые замеры сделаны на ряду {baseline.get("sample")}, а не {args.sample}. Запустите с --sample {baseline.get("sample")} или сохраните замеры заново через --save')
+        sys.exit(2)
+    baseline = baseline['results']
+    print(f'\nВ среднем (геометрическом) {geomean_ratio(results, baseline) - 1:+.1%} к базовым замерам')
+    regressions = compare(results, baseline, args.threshold, args.floor)
+    for name, base_ns, ns in regressions:  # Пробегаемся по всем замедлениям
+        print(f'Замедление {name}: {base_ns:.1f} нс -> {ns:.1f} нс ({ns / base_ns - 1:+.0%})')
+    if regressions:  # Если есть замедления сверх допустимого
+        sys.exit(1)
+    print(f'Замедлений более {args.threshold:.0%} и {args.floor:.0f} нс нет')
@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from timeit import timeit
+
+import numpy as np
+from pytz import utc
+
+from MarketPy.Schedule import MOEXStocks
+
+
+def benchmark(name, function, values, number=3):
+    """Время выполнения функции по всем значениям в микросекундах на вызов
+
+    :param str name: Название замера
+    :param function: Функция от значения
+    :param list values: Значения
+    :param int number: Кол-во повторов
+    :return: Время одного вызова в микросекундах
+    """
+    seconds = timeit(lambda: [function(value) for value in values], number=number)  # Общее время выполнения
+    us = seconds / number / len(values) * 1_000_000  # Время одного вызова в микросекундах
+    print(f'{name:<45}: {us:8.3f} мкс')
+    return us
+
+
+def benchmark_array(name, function, values, number=3):
+    """Время выполнения векторной функции в наносекундах на элемент массива
+
+    :param str name: Название замера
+    :param function: Функция от массива
+    :param np.ndarray values: Массив
+    :param int number: Кол-во повторов
+    :return: Время на элемент в наносекундах
+    """
+    seconds = timeit(lambda: function(values), number=number)  # Общее время выполнения
+    ns = seconds / number / len(values) * 1_000_000_000  # Время на элемент в наносекундах
+    print(f'{name:<45}: {ns:8.3f} нс')
+    return ns
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    schedule = MOEXStocks()  # Расписание торгов акций
+    market_timezone = schedule.market_timezone  # ВременнАя зона биржи
+    rng = np.random.default_rng(0)
+    timestamps = rng.integers(datetime(2005, 1, 1).timestamp(), datetime(2025, 1, 1).timestamp(), 100_000)  # Секунды UTC за 20 лет, включая переходы 2011 и 2014 годов
+    timestamps_list = timestamps.tolist()
+    dts = [datetime(1970, 1, 1) + timedelta(seconds=seconds) for seconds in timestamps_list]  # Даты и время
+
+    print('Скалярные функции')
+    us_pytz = benchmark('utc_to_msk_datetime (pytz)', lambda dt: utc.localize(dt).astimezone(market_timezone).replace(tzinfo=None), dts)
+    us_table = benchmark('utc_to_msk_datetime (таблица переходов)', schedule.utc_to_msk_datetime, dts)
+    print(f'{"Ускорение":<45}: {us_pytz / us_table:8.2f} раз')
+    us_pytz = benchmark('msk_to_utc_datetime (pytz)', lambda dt: market_timezone.localize(dt).astimezone(utc).replace(tzinfo=None), dts)
+    us_table = benchmark('msk_to_utc_datetime (таблица переходов)', schedule.msk_to_utc_datetime, dts)
+    print(f'{"Ускорение":<45}: {us_pytz / us_table:8.2f} раз')
+    us_pytz = benchmark('msk_datetime_to_utc_timestamp (pytz)', lambda dt: int(market_timezone.localize(dt).timestamp()), dts)
+    us_table = benchmark('msk_datetime_to_utc_timestamp (таблица)', schedule.msk_datetime_to_utc_timestamp, dts)
+    print(f'{"Ускорение":<45}: {us_pytz / us_table:8.2f} раз')
+    us_pytz = benchmark('utc_timestamp_to_msk_datetime (pytz)', lambda seconds: utc.localize(datetime.fromtimestamp(seconds, utc).replace(tzinfo=None)).astimezone(market_timezone).replace(tzinfo=None), timestamps_list)
+    us_table = benchmark('utc_timestamp_to_msk_datetime (таблица)', schedule.utc_timestamp_to_msk_datetime, timestamps_list)
+    print(f'{"Ускорение":<45}: {us_pytz / us_table:8.2f} раз')
+
+    print('\nВекторные функции')
+    us_scalar = benchmark('utc_timestamp_to_msk_datetime', schedule.utc_timestamp_to_msk_datetime, timestamps_list) * 1000
+    ns_array = benchmark_array('utc_timestamp_to_msk_datetime64', schedule.utc_timestamp_to_msk_datetime64, timestamps)
+    print(f'{"Ускорение":<45}: {us_scalar / ns_array:8.2f} раз')
+    local = schedule.utc_timestamp_to_msk_datetime64(timestamps)  # Московское время
+    us_scalar = benchmark('msk_datetime_to_utc_timestamp', schedule.msk_datetime_to_utc_timestamp, dts) * 1000
+    ns_array = benchmark_array('msk_datetime64_to_utc_timestamp', schedule.msk_datetime64_to_utc_timestamp, local)
+    print(f'{"Ускорение":<45}: {us_scalar / ns_array:8.2f} раз')
+    assert schedule.msk_datetime64_to_utc_timestamp(np.array(dts, dtype='datetime64[s]')).tolist() == [int(market_timezone.localize(dt).timestamp()) for dt in dts]  # Результат совпадает с pytz
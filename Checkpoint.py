@@ -0,0 +1,241 @@
+import logging
+import os  # Атомарная замена файла контрольной точки
+from tempfile import mkstemp  # Временный файл контрольной точки
+from datetime import datetime, timedelta
+from json import dumps, loads
+from threading import Lock
+from time import time, monotonic
+
+import numpy as np
+
+from MarketPy.Schedule import Schedule, Timeframe
+from MarketPy.Readiness import FixedDelay
+
+
+logger = logging.getLogger('Schedule.Checkpoint')  # Будем вести лог
+
+
+class Checkpoint:
+    """Контрольная точка получения бар для быстрого перезапуска. По каждой подписке хранится открытие последнего выданного бара
+    и дата и время запроса следующего бара, а также наблюдаемые задержки политики запросов. Файл записывается атомарно:
+    во временный файл рядом, который затем заменяет старый. При падении во время записи остается предыдущая контрольная точка.
+    При запуске пропущенные за время простоя бары вычисляются по сетке бар расписания, и запрашиваются только они"""
+    version = 1  # Версия формата файла
+
+    def __init__(self, filename='Checkpoint.json', readiness=None, interval=1.0):
+        """
+        :param str filename: Файл контрольной точки
+        :param FixedDelay readiness: Политика задержки запросов бара. Наблюдаемые задержки AdaptiveDelay сохраняются вместе с подписками
+        :param float interval: Наименьший период записи файла в секундах при выдаче бар. 0 - записывать после каждого бара
+        """
+        self.filename = filename  # Файл контрольной точки
+        self.readiness = readiness or FixedDelay()  # Политика задержки запросов бара
+        self.interval = interval  # Период записи файла
+        self._entries = {}  # Подписки: (код режима торгов, код тикера, временной интервал) -> [открытие последнего бара в секундах по времени биржи, запрос следующего бара в timestamp UTC]
+        self._saved = 0.0  # Монотонное время последней записи
+        self._lock = Lock()  # Бары выдаются из разных потоков
+        self._save_lock = Lock()  # Запись файла из разных потоков по одной
+
+    def update(self, class_code, security_code, schedule, tf, dt_open, delay=None):
+        """Учет выданного бара
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param Schedule schedule: Расписание торгов
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param datetime dt_open: Дата и время открытия бара на бирже
+        :param timedelta delay: Задержка запроса бара. Если не задана, то берется delta расписания
+        """
+        seconds = schedule._datetime_to_seconds(dt_open)  # Открытие бара в секундах по времени биржи
+        dt_close = schedule.trade_bar_close_datetime(dt_open, tf)  # Закрытие бара. Открытие следующего бара
+        request = schedule.msk_datetime_to_utc_timestamp(schedule.trade_bar_request_datetime(dt_close, tf, delay))  # Запрос следующего бара в timestamp UTC
+        key = (class_code, security_code, str(tf))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < seconds:  # Бары могут выдаваться не по порядку. Запоминаем последний
+                self._entries[key] = [seconds, request]
+
+    def delivered(self, subscription, bar):
+        """Учет бара, выданного подписке. Файл записывается не чаще interval. Ошибка записи файла логируется и не останавливает выдачу бар
+
+        :param Subscription subscription: Подписка
+        :param Bar bar: Бар. Если у бара нет даты и времени, то берется открытие бара подписки
+        """
+        dt_open = getattr(bar, 'dt', None) or subscription.trade_bar_open_datetime  # Дата и время открытия бара
+        self.update(subscription.class_code, subscription.security_code, subscription.schedule, subscription.tf, dt_open, self.readiness.delay(subscription))
+        try:
+            self.save(self.interval)  # Записываем файл, если с последней записи прошло достаточно времени
+        except OSError:  # Бар уже выдан. Он попадет в файл при следующей записи
+            logger.exception(f'Контрольная точка {self.filename} не записана')
+
+    def wrap(self, callback):
+        """Функция обработки бара, которая после вызова исходной функции учитывает бар в контрольной точке.
+        Бар учитывается только после обработки, поэтому при падении во время обработки он будет получен повторно
+
+        :param callback: Функция обработки полученного бара callback(subscription, bar)
+        :return: Функция обработки бара callback(subscription, bar)
+        """
+        def checkpoint_callback(subscription, bar):
+            if callback:  # Если задана исходная функция
+                callback(subscription, bar)
+            self.delivered(subscription, bar)
+        return checkpoint_callback
+
+    def save(self, interval=0.0) -> bool:
+        """Атомарная запись контрольной точки в файл. Записи из разных потоков идут по одной, каждая в свой временный файл
+
+        :param float interval: Записывать, только если с последней записи прошло не меньше interval секунд
+        :return: True, если файл записан
+        """
+        with self._save_lock:
+            if monotonic() - self._saved < interval:  # Если с последней записи прошло мало времени
+                return False
+            with self._lock:
+                subscriptions = [[*key, *entry] for key, entry in self._entries.items()]  # Компактно: списки вместо словарей
+            state = self.readiness.state() if hasattr(self.readiness, 'state') else {}  # Наблюдаемые задержки есть только у AdaptiveDelay
+            data = dumps({'version': self.version, 'saved': time(), 'subscriptions': subscriptions, 'delays': state}, separators=(',', ':'))
+            directory = os.path.dirname(os.path.abspath(self.filename))  # Временный файл создаем в той же папке, иначе замена не будет атомарной
+            fd, temp_filename = mkstemp(prefix=f'.{os.path.basename(self.filename)}.', suffix='.tmp', dir=directory)
+            try:
+                with open(fd, 'w', encoding='utf-8') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())  # Данные должны оказаться на диске до замены файла
+                os.replace(temp_filename, self.filename)  # Атомарная замена старого файла новым
+            except BaseException:  # Если файл не записан, то временный файл не оставляем
+                os.unlink(temp_filename)
+                raise
+            self._saved = monotonic()
+        logger.debug(f'Контрольная точка {self.filename}: {len(subscriptions)} подписок')
+        return True
+
+    def load(self) -> bool:
+        """Загрузка контрольной точки из файла
+
+        :return: True, если контрольная точка загружена. False, если файла нет или он в другом формате
+        """
+        try:
+            with open(self.filename, encoding='utf-8') as f:
+                data = loads(f.read())
+        except FileNotFoundError:  # Если файла нет (первый запуск)
+            return False
+        except ValueError:  # Если файл поврежден. При атомарной записи такого быть не должно
+            logger.exception(f'Контрольная точка {self.filename} повреждена')
+            return False
+        if data.get('version') != self.version:  # Если файл в другом формате
+            logger.warning(f'Контрольная точка {self.filename}: версия {data.get("version")} вместо {self.version}')
+            return False
+        with self._lock:
+            self._entries = {(class_code, security_code, tf): [seconds, request] for class_code, security_code, tf, seconds, request in data['subscriptions']}
+        if data['delays'] and hasattr(self.readiness, 'load_state'):  # Если есть наблюдаемые задержки, и политика умеет их восстанавливать
+            self.readiness.load_state(data['delays'])
+        logger.debug(f'Контрольная точка {self.filename}: {len(self._entries)} подписок, записана {datetime.fromtimestamp(data["saved"]):%d.%m.%Y %H:%M:%S}')
+        return True
+
+    def last_delivered(self, class_code, security_code, schedule, tf):
+        """Дата и время открытия последнего выданного бара
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param Schedule schedule: Расписание торгов
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Дата и время открытия бара на бирже. None, если бары по подписке не выдавались
+        """
+        entry = self._entries.get((class_code, security_code, str(tf)))
+        return None if entry is None else schedule._seconds_to_datetime(entry[0])
+
+    def missed(self, class_code, security_code, schedule, tf, now=None) -> np.ndarray:
+        """Бары, закрывшиеся после последнего выданного бара. Вычисляются по сетке бар расписания: пропущен каждый бар после последнего выданного,
+        закрытие которого уже наступило, даже если время его запроса еще не пришло
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param Schedule schedule: Расписание торгов
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param datetime now: Дата и время на бирже. По умолчанию, текущее
+        :return: Даты и время открытия пропущенных бар на бирже datetime64[s]. Пустой массив, если бары по подписке не выдавались или пропусков нет
+        """
+        entry = self._entries.get((class_code, security_code, str(tf)))
+        if entry is None:  # Если бары по подписке не выдавались
+            return np.empty(0, 'datetime64[s]')  # то восстанавливать нечего. Историю загружает Backfill
+        if now is None:  # Если дата и время не заданы
+            now = schedule.market_datetime_now  # то берем текущее время на бирже
+        start = schedule.trade_bar_close_datetime(schedule._seconds_to_datetime(entry[0]), tf)  # Закрытие последнего выданного бара
+        end = schedule.trade_bar_open_datetime(now, tf)  # Открытие текущего бара
+        if schedule.trade_bar_close_datetime(now, tf) <= now:  # Если на бирже перерыв, и последний бар уже закрылся
+            end = schedule.trade_bar_close_datetime(now, tf)  # то он тоже пропущен
+        if end <= start:  # Если после последнего выданного бара ни один бар не закрылся
+            return np.empty(0, 'datetime64[s]')
+        return schedule.bars_array(start, end, tf)
+
+    def restore(self, backfill, subscriptions, now=None) -> int:
+        """Постановка пропущенных за время простоя бар в загрузку истории
+
+        :param Backfill backfill: Загрузка истории. Пропущенные бары получаются в ней страницами
+        :param subscriptions: Подписки или кортежи (код режима торгов, код тикера, расписание, временной интервал)
+        :param datetime now: Дата и время на бирже. По умолчанию, текущее
+        :return: Кол-во пропущенных бар
+        """
+        total = 0  # Кол-во пропущенных бар
+        for subscription in subscriptions:  # Пробегаемся по всем подпискам
+            if isinstance(subscription, tuple):  # Если подписка задана кортежем
+                class_code, security_code, schedule, tf = subscription
+            else:  # Если задана подписка
+                class_code, security_code, schedule, tf = subscription.class_code, subscription.security_code, subscription.schedule, subscription.tf
+            missed = self.missed(class_code, security_code, schedule, tf, now)
+            if missed.size == 0:  # Если пропусков нет
+                continue
+            start, end = schedule._seconds_to_datetime(int(missed[0].astype(np.int64))), schedule._seconds_to_datetime(int(missed[-1].astype(np.int64)))
+            backfill.add(class_code, security_code, schedule, tf, np.empty(0, 'datetime64[s]'), start, schedule.trade_bar_close_datetime(end, tf))  # Имеющихся бар нет. Загружаем все пропущенные
+            total += missed.size
+        logger.info(f'Пропущено за время простоя {total} бар')
+        return total
+
+    def __len__(self):
+        return len(self._entries)
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    from tempfile import TemporaryDirectory
+    from types import SimpleNamespace
+    from MarketPy.Schedule import MOEXStocks
+    from MarketPy.Readiness import AdaptiveDelay
+    from MarketPy.Backfill import Backfill, FakeHistoryProvider
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%d.%m.%Y %H:%M:%S', level=logging.ERROR)
+    schedule = MOEXStocks()  # Расписание фондового рынка Московской Биржи
+    tfs = ('M1', 'M5', 'M15', 'M60')  # Временные интервалы
+    symbols = [('TQBR', f'SEC{i:03}', schedule, tfs[i % len(tfs)]) for i in range(500)]  # 500 подписок
+    stopped = datetime(2025, 3, 12, 14, 3, 30)  # Процесс упал
+    restarted = datetime(2025, 3, 12, 14, 7, 10)  # и перезапущен через 3:40
+
+    with TemporaryDirectory() as directory:
+        filename = os.path.join(directory, 'Checkpoint.json')
+        readiness = AdaptiveDelay()  # Политика запросов с наблюдаемыми задержками
+        checkpoint = Checkpoint(filename, readiness, interval=0)
+        for class_code, security_code, _, tf in symbols:  # Работа до падения
+            subscription = SimpleNamespace(class_code=class_code, security_code=security_code, schedule=schedule, tf=tf, attempt=0, trade_bar_open_datetime=None)
+            readiness.observe(subscription, timedelta(milliseconds=300 + len(checkpoint) % 400))  # Задержки получения бар
+            bar = SimpleNamespace(dt=schedule.trade_bar_open_datetime(schedule.trade_bar_open_datetime(stopped, tf) - timedelta(seconds=1), tf))  # Последний закрытый бар
+            checkpoint.delivered(subscription, bar)
+        print(f'Контрольная точка: {len(checkpoint)} подписок, {os.path.getsize(filename)} байт')
+
+        started = monotonic()  # Перезапуск
+        readiness = AdaptiveDelay()
+        checkpoint = Checkpoint(filename, readiness)
+        assert checkpoint.load()
+        loaded = monotonic() - started
+        provider = FakeHistoryProvider(latency=0.05)  # Ответ провайдера за 50 мс
+        backfill = Backfill(provider.fetch, max_workers=32)
+        missed = checkpoint.restore(backfill, symbols, restarted)  # Пропущенные бары по сетке расписания
+        restored = monotonic() - started
+        received = 0
+        for page, bars in backfill.run():  # Получаем только пропущенные бары
+            received += bars.size
+            last = bars[-1].astype(datetime)
+            checkpoint.update(page.class_code, page.security_code, page.schedule, page.tf, last, readiness.delay(SimpleNamespace(schedule=schedule, tf=str(page.tf))))
+        elapsed = monotonic() - started
+        assert received == missed
+        assert all(checkpoint.missed(class_code, security_code, schedule, tf, restarted).size == 0 for class_code, security_code, schedule, tf in symbols)  # Пропусков не осталось
+        print(f'Перезапуск: загрузка {loaded * 1000:.1f} мс, расчет пропусков {restored * 1000:.1f} мс, задержки {readiness.delays()}. '
+              f'Пропущено {missed} бар, получено {received} за {provider.requests} запросов. До работы в реальном времени {elapsed * 1000:.0f} мс')
@@ -0,0 +1,118 @@
+import asyncio
+from heapq import heappush, heappop  # Очередь асинхронных ожиданий по времени окончания
+from itertools import count  # Порядковые номера ожиданий
+from threading import Lock
+from time import time, perf_counter
+
+
+class SystemClock:
+    """Системные часы. Часы по умолчанию для расписания и циклов получения бар"""
+    def time(self) -> float:
+        """Текущее время
+
+        :return: Кол-во секунд, прошедших с 01.01.1970 00:00 UTC
+        """
+        return time()
+
+    def wait(self, event, timeout) -> bool:
+        """Ожидание события не дольше заданного времени
+
+        :param threading.Event event: Событие, например, выхода из потока
+        :param float timeout: Время ожидания в секундах
+        :return: Произошло событие
+        """
+        return event.wait(max(timeout, 0))
+
+    async def sleep(self, seconds):
+        """Асинхронное ожидание, не блокирующее цикл событий
+
+        :param float seconds: Время ожидания в секундах
+        """
+        await asyncio.sleep(max(seconds, 0))
+
+
+class VirtualClock(SystemClock):
+    """Виртуальные часы. Ожидание не занимает времени: часы сразу переводятся на его окончание.
+    Ожидание в потоке wait рассчитано на один поток, который ждет и запрашивает бары по очереди.
+    Асинхронные ожидания sleep множества задач одного цикла событий собираются в очередь. Когда у цикла событий не остается готовых задач,
+    часы переводятся на самое раннее окончание ожидания, и просыпаются все задачи с этим окончанием. Так время идет по наибольшему, а не по сумме ожиданий.
+    Готовые задачи видны только в цикле событий asyncio (asyncio.BaseEventLoop). В других циклах событий, например, uvloop, sleep выдает TypeError"""
+    def __init__(self, start=0.0):
+        """
+        :param float start: Начальное время в кол-ве секунд, прошедших с 01.01.1970 00:00 UTC
+        """
+        self._now = float(start)  # Текущее время
+        self._lock = Lock()  # Часы переводятся из разных потоков
+        self._sleepers = []  # Очередь асинхронных ожиданий: (окончание ожидания, порядковый номер, future)
+        self._numbers = count()  # Порядковые номера ожиданий, чтобы не сравнивать future с одинаковым окончанием
+        self._advancing = None  # Цикл событий, в котором запланирован перевод часов по очереди ожиданий
+
+    def time(self) -> float:
+        return self._now
+
+    def advance(self, seconds):
+        """Перевод часов вперед
+
+        :param float seconds: Кол-во секунд
+        """
+        with self._lock:
+            self._now += max(seconds, 0)
+
+    def wait(self, event, timeout) -> bool:
+        if event.is_set():  # Если событие уже произошло
+            return True  # то часы не переводим
+        self.advance(timeout)  # Время ожидания прошло
+        return event.is_set()
+
+    async def sleep(self, seconds):
+        loop = asyncio.get_running_loop()
+        if not isinstance(loop, asyncio.BaseEventLoop):  # Готовые задачи видны только в цикле событий asyncio. Например, у uvloop их не видно
+            raise TypeError(f'Виртуальные часы работают только в цикле событий asyncio, а не {type(loop).__name__}')
+        future = loop.create_future()  # Завершится, когда часы дойдут до окончания ожидания
+        heappush(self._sleepers, (self._now + max(seconds, 0), next(self._numbers), future))
+        if self._advancing is not loop:  # Если перевод часов в этом цикле событий еще не запланирован
+            self._advancing = loop
+            loop.call_soon(self._advance_when_idle, loop)
+        await future  # При отмене задачи future отменяется и пропускается при переводе часов
+
+    def _advance_when_idle(self, loop):
+        """Перевод часов на самое раннее окончание ожидания, когда у цикла событий не осталось готовых задач
+
+        :param asyncio.AbstractEventLoop loop: Цикл событий
+        """
+        if loop._ready:  # Если у цикла событий есть готовые задачи, то они могут начать новые ожидания. Очередь готовых задач asyncio.BaseEventLoop открыто не выдает
+            loop.call_soon(self._advance_when_idle, loop)  # Проверяем снова после них
+            return
+        while self._sleepers and self._sleepers[0][2].done():  # Отмененные ожидания
+            heappop(self._sleepers)  # пропускаем
+        if not self._sleepers:  # Если ожиданий нет
+            self._advancing = None  # то переводить часы не нужно
+            return
+        with self._lock:
+            self._now = max(self._now, self._sleepers[0][0])  # Переводим часы на самое раннее окончание ожидания
+        while self._sleepers and self._sleepers[0][0] <= self._now:  # Будим все задачи, ожидание которых закончилось
+            future = heappop(self._sleepers)[2]
+            if not future.done():  # Если ожидание не отменено
+                future.set_result(None)
+        loop.call_soon(self._advance_when_idle, loop)  # Остальные ожидания переводим после того, как проснувшиеся задачи отработают
+
+
+class AcceleratedClock(SystemClock):
+    """Ускоренные часы. Идут от заданного начального времени быстрее системных в заданное кол-во раз. Ожидание занимает реальное время, деленное на ускорение"""
+    def __init__(self, start, speed=60.0):
+        """
+        :param float start: Начальное время в кол-ве секунд, прошедших с 01.01.1970 00:00 UTC
+        :param float speed: Ускорение. 60 - минута за секунду
+        """
+        self.start = start  # Начальное время
+        self.speed = speed  # Ускорение
+        self._real_start = perf_counter()  # Начальное время по монотонным часам
+
+    def time(self) -> float:
+        return self.start + (perf_counter() - self._real_start) * self.speed
+
+    def wait(self, event, timeout) -> bool:
+        return event.wait(max(timeout, 0) / self.speed)
+
+    async def sleep(self, seconds):
+        await asyncio.sleep(max(seconds, 0) / self.speed)
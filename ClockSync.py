@@ -0,0 +1,134 @@
+import asyncio
+from collections import deque  # Окно последних замеров
+from datetime import timedelta
+from threading import Lock
+from time import time, monotonic
+
+from MarketPy.Clock import SystemClock
+from MarketPy.Readiness import FixedDelay
+
+
+class OffsetEstimator:
+    """Оценка разницы часов сервера брокера/биржи и локальных часов по времени в ответах сервера.
+    Из последних замеров берется замер с наименьшим временем ответа: у него меньше всего неопределенность, где внутри ответа сервер поставил время"""
+    def __init__(self, window=64, resolution=0.0):
+        """
+        :param int window: Кол-во последних замеров
+        :param float resolution: Точность времени сервера в секундах. Например, 1 для заголовка HTTP Date. Время сервера считается обрезанным до нее
+        """
+        self.resolution = resolution  # Точность времени сервера
+        self._samples = deque(maxlen=window)  # Замеры: (время ответа, разница часов)
+        self._best = None  # Замер с наименьшим временем ответа
+        self._lock = Lock()  # Замеры добавляются из разных потоков
+
+    def observe(self, sent, server_time, received) -> float:
+        """Учет замера
+
+        :param float sent: Локальное время отправки запроса в секундах
+        :param float server_time: Время сервера из ответа в секундах
+        :param float received: Локальное время получения ответа в секундах
+        :return: Разница часов по замеру в секундах: время сервера - локальное время
+        """
+        offset = server_time + self.resolution / 2 - (sent + received) / 2  # Сервер поставил время где-то внутри ответа. Считаем, что посередине
+        with self._lock:
+            self._samples.append((received - sent, offset))
+            self._best = min(self._samples)  # Наименьшее время ответа
+        return offset
+
+    @property
+    def offset(self) -> float:
+        """Разница часов в секундах: время сервера - локальное время. 0, если замеров нет"""
+        return self._best[1] if self._best else 0.0
+
+    @property
+    def error(self) -> float:
+        """Наибольшая ошибка оценки в секундах: половина времени ответа и точности времени сервера. Бесконечность, если замеров нет"""
+        return (self._best[0] + self.resolution) / 2 if self._best else float('inf')
+
+    @property
+    def samples(self) -> int:
+        """Кол-во замеров в окне"""
+        return len(self._samples)
+
+
+class BrokerClock(SystemClock):
+    """Часы сервера брокера/биржи. Идут по монотонным часам, поэтому не сдвигаются при переводе системных часов (NTP),
+    и поправляются на разницу с сервером, оцениваемую по времени в ответах. Ожидания - сроки по монотонным часам, пересчитываемые при изменении оценки"""
+    def __init__(self, estimator=None, recheck=1.0, wall=time):
+        """
+        :param OffsetEstimator estimator: Оценка разницы часов с сервером
+        :param float recheck: Период пересчета срока ожидания в секундах
+        :param wall: Системные часы. Читаются один раз при создании
+        """
+        self.estimator = estimator or OffsetEstimator()  # Оценка разницы часов с сервером
+        self.recheck = recheck  # Период пересчета срока ожидания
+        self._wall_start = wall()  # Системное время при создании
+        self._monotonic_start = monotonic()  # Монотонное время при создании
+
+    def local_time(self) -> float:
+        """Локальное время по монотонным часам
+
+        :return: Кол-во секунд, прошедших с 01.01.1970 00:00 UTC, по локальным часам
+        """
+        return self._wall_start + monotonic() - self._monotonic_start
+
+    def time(self) -> float:
+        """Время сервера
+
+        :return: Кол-во секунд, прошедших с 01.01.1970 00:00 UTC, по часам сервера
+        """
+        return self.local_time() + self.estimator.offset
+
+    def observe(self, sent, server_time, received) -> float:
+        """Учет замера времени сервера
+
+        :param float sent: Локальное время отправки запроса local_time()
+        :param float server_time: Время сервера из ответа в секундах, прошедших с 01.01.1970 00:00 UTC
+        :param float received: Локальное время получения ответа local_time()
+        :return: Разница часов по замеру в секундах
+        """
+        return self.estimator.observe(sent, server_time, received)
+
+    def measure(self, server_time):
+        """Замер времени сервера запросом
+
+        :param server_time: Функция запроса времени сервера server_time(). Например, провайдер.get_server_time или время из ответа на запрос бар
+        :return: Результат функции
+        """
+        sent = self.local_time()
+        result = server_time()
+        self.observe(sent, result, self.local_time())
+        return result
+
+    @property
+    def margin(self) -> timedelta:
+        """Запас на ошибку оценки разницы часов. Заменяет рассинхронизацию часов в Schedule.delta через MarginDelay. timedelta.max, если замеров нет"""
+        error = self.estimator.error
+        return timedelta.max if error == float('inf') else timedelta(seconds=error)
+
+    def wait(self, event, timeout) -> bool:
+        deadline = self.time() + max(timeout, 0)  # Срок ожидания по часам сервера
+        while True:
+            remaining = deadline - self.time()  # Оставшееся время. Пересчитываем, т.к. оценка разницы часов могла измениться
+            if remaining <= 0:  # Если срок наступил
+                return event.is_set()
+            if event.wait(min(remaining, self.recheck)):  # Если произошло событие
+                return True
+
+    async def sleep(self, seconds):
+        deadline = self.time() + max(seconds, 0)  # Срок ожидания по часам сервера
+        while (remaining := deadline - self.time()) > 0:  # Пока срок не наступил
+            await asyncio.sleep(min(remaining, self.recheck))
+
+
+class MarginDelay(FixedDelay):
+    """Задержка запроса бара - запас на ошибку оценки разницы часов BrokerClock вместо рассинхронизации часов Schedule.delta.
+    Очередь запросов должна идти по этим же часам. Запас не больше Schedule.delta: пока замеров нет, задержка как у FixedDelay"""
+    def __init__(self, clock):
+        """
+        :param BrokerClock clock: Часы сервера брокера/биржи
+        """
+        self.clock = clock  # Часы сервера брокера/биржи
+
+    def delay(self, subscription) -> timedelta:
+        return min(self.clock.margin, subscription.schedule.delta)
@@ -0,0 +1,215 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor  # Пул потоков получения бар
+from heapq import heappush, heappop  # Очередь с приоритетом по дате и времени запроса бара
+from itertools import count  # Порядковые номера групп подписок
+from datetime import timedelta
+from threading import Thread, Event, Lock
+
+from MarketPy.Schedule import Schedule
+from MarketPy.Clock import SystemClock
+from MarketPy.Readiness import FixedDelay
+from MarketPy.Metrics import Metrics
+
+
+logger = logging.getLogger('Schedule.Dispatcher')  # Будем вести лог
+
+
+class Subscription:
+    """Подписка на новые бары тикера по расписанию биржи"""
+    def __init__(self, class_code, security_code, schedule, tf, fetch, callback=None):
+        """
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param Schedule schedule: Расписание торгов
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param fetch: Функция получения бара fetch(subscription). Возвращает бар или None, если бар не получен
+        :param callback: Функция обработки полученного бара callback(subscription, bar)
+        """
+        self.class_code = class_code  # Код режима торгов
+        self.security_code = security_code  # Код тикера
+        self.schedule = schedule  # Расписание торгов
+        self.tf = tf  # Временной интервал
+        self.fetch = fetch  # Функция получения бара
+        self.callback = callback  # Функция обработки полученного бара
+        self.trade_bar_open_datetime = None  # Дата и время открытия бара, который будем получать
+        self.trade_bar_close_datetime = None  # Дата и время закрытия бара, который будем получать
+        self.trade_bar_ready_datetime = None  # Дата и время, с которого бар может быть получен, без задержки
+        self.trade_bar_request_datetime = None  # Дата и время запроса бара на бирже
+        self.ready_timestamp = None  # Дата и время, с которого бар может быть получен, в timestamp UTC
+        self.attempt = 0  # Номер повторного запроса бара. 0 - первый запрос
+        self.active = True  # Подписка действует
+
+    def __repr__(self):
+        return f'{self.class_code}.{self.security_code} ({self.tf})'
+
+
+class Dispatcher:
+    """Получение новых бар множества подписок по расписанию биржи в одном потоке с очередью по дате и времени запроса бара.
+    Подписки с одинаковыми датой и временем запроса собираются в группу и запускаются вместе в ограниченном пуле потоков"""
+    def __init__(self, max_workers=8, readiness=None, metrics=None, clock=None):
+        """
+        :param int max_workers: Максимальное кол-во потоков получения бар
+        :param FixedDelay readiness: Политика задержки и повторных запросов бара. По умолчанию постоянная задержка Schedule.delta без повторных запросов
+        :param Metrics metrics: Метрики получения бар. По умолчанию выключены
+        :param SystemClock clock: Часы очереди. По умолчанию системные. BrokerClock ведет очередь по часам сервера брокера
+        """
+        self.readiness = readiness or FixedDelay()  # Политика задержки и повторных запросов бара
+        self.metrics = metrics or Metrics(enabled=False)  # Метрики получения бар
+        self.clock = clock or SystemClock()  # Часы очереди
+        self._heap = []  # Очередь групп подписок: (дата и время запроса бара в timestamp UTC, номер группы, группа подписок)
+        self._groups = {}  # Группы подписок по дате и времени запроса бара в timestamp UTC
+        self._group_numbers = count()  # Номера групп, чтобы не сравнивать группы с одинаковыми датой и временем запроса
+        self._lock = Lock()  # Очередь меняется из разных потоков
+        self._wakeup = Event()  # Очередь изменилась или выход
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dispatcher_fetch')  # Пул потоков получения бар
+        self._thread = Thread(name='dispatcher', target=self._run, daemon=True)  # Поток очереди
+        self._closed = False  # Диспетчер закрыт
+
+    def subscribe(self, class_code, security_code, schedule, tf, fetch, callback=None, after=None) -> Subscription:
+        """Подписка на новые бары тикера
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param Schedule schedule: Расписание торгов
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param fetch: Функция получения бара fetch(subscription). Возвращает бар или None, если бар не получен
+        :param callback: Функция обработки полученного бара callback(subscription, bar)
+        :param datetime after: Дата и время открытия последнего полученного бара на бирже. Получение продолжится со следующего бара. По умолчанию, с текущего бара
+        :return: Подписка
+        """
+        subscription = Subscription(class_code, security_code, schedule, tf, fetch, callback)
+        if after is not None:  # Если бары по подписке уже получали
+            subscription.trade_bar_ready_datetime = schedule.trade_bar_ready_datetime(after, tf)  # то следующий бар берем по сетке расписания за последним полученным
+        with self._lock:
+            if self._closed:  # Если диспетчер закрыт
+                raise RuntimeError('Диспетчер закрыт')
+            self._schedule(subscription)  # Ставим подписку в очередь
+        self._wakeup.set()  # Первая в очереди дата и время запроса могли измениться
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Отмена подписки. Подписка удаляется из очереди при наступлении даты и времени запроса бара
+
+        :param Subscription subscription: Подписка
+        """
+        subscription.active = False
+
+    def start(self):
+        """Запуск потока очереди"""
+        self._thread.start()
+
+    def close(self, wait=True):
+        """Закрытие диспетчера: остановка потока очереди и пула потоков получения бар
+
+        :param bool wait: Ждать завершения запущенных получений бар
+        """
+        with self._lock:
+            self._closed = True
+        self._wakeup.set()  # Будим поток очереди, чтобы он вышел
+        if self._thread.is_alive():  # Если поток очереди запускался
+            self._thread.join()  # то ждем его завершения
+        self._executor.shutdown(wait=wait, cancel_futures=True)  # Отменяем ожидающие получения бар
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _schedule(self, subscription):
+        """Постановка подписки в очередь по дате и времени запроса следующего бара. Вызывается под блокировкой.
+        Следующий бар берется по сетке расписания за предыдущим, а не по текущему времени. Если получение бара затянулось дольше интервала,
+        то следующий бар запрашивается сразу, а не пропускается
+
+        :param Subscription subscription: Подписка
+        """
+        schedule = subscription.schedule  # Расписание торгов
+        if subscription.trade_bar_ready_datetime is None:  # Если бар по подписке еще не получали
+            dt_market = schedule.market_datetime_now  # то начинаем с текущего бара на бирже
+        else:  # Если предыдущий бар уже получали
+            dt_market = subscription.trade_bar_ready_datetime  # то следующий бар открывается на закрытии предыдущего. В перерывах - в начале следующей сессии
+        subscription.trade_bar_open_datetime = schedule.trade_bar_open_datetime(dt_market, subscription.tf)  # Дата и время открытия бара, который будем получать
+        subscription.trade_bar_close_datetime = schedule.trade_bar_close_datetime(dt_market, subscription.tf)  # Дата и время закрытия бара, который будем получать
+        subscription.trade_bar_ready_datetime = schedule.trade_bar_ready_datetime(dt_market, subscription.tf)  # Дата и время, с которого бар может быть получен
+        subscription.ready_timestamp = schedule.msk_to_utc_datetime(subscription.trade_bar_ready_datetime, True).timestamp()  # То же в timestamp UTC. Одинаково для всех расписаний
+        subscription.attempt = 0  # Первый запрос бара
+        delay = self.readiness.delay(subscription)  # Задержка запроса бара по политике
+        subscription.trade_bar_request_datetime = subscription.trade_bar_ready_datetime + delay  # Дата и время запроса бара на бирже
+        logger.debug(f'{subscription}: бар {subscription.trade_bar_open_datetime:%d.%m.%Y %H:%M:%S} будет запрошен {subscription.trade_bar_request_datetime:%d.%m.%Y %H:%M:%S}')
+        self._push(subscription, subscription.ready_timestamp + delay.total_seconds())
+
+    def _push(self, subscription, deadline):
+        """Постановка подписки в группу с той же датой и временем запроса. Вызывается под блокировкой
+
+        :param Subscription subscription: Подписка
+        :param float deadline: Дата и время запроса бара в timestamp UTC
+        """
+        group = self._groups.get(deadline)  # Группа подписок с той же датой и временем запроса
+        if group is None:  # Если группы нет
+            group = self._groups[deadline] = []  # то создаем ее
+            heappush(self._heap, (deadline, next(self._group_numbers), group))  # и ставим в очередь
+        group.append(subscription)
+
+    def _run(self):
+        """Поток очереди: ожидание первой даты и времени запроса по часам очереди и запуск получения бар группы подписок"""
+        while True:
+            with self._lock:
+                if self._closed:  # Если диспетчер закрыт
+                    return
+                self._wakeup.clear()
+                timeout = None  # Время ожидания в секундах
+                while self._heap:  # Пока есть подписки
+                    deadline = self._heap[0][0]  # Первая в очереди дата и время запроса бара
+                    timeout = deadline - self.clock.time()
+                    if timeout > 0:  # Если время запроса еще не наступило
+                        break
+                    _, _, group = heappop(self._heap)  # Группа подписок, для которых наступило время запроса
+                    del self._groups[deadline]
+                    wake_lag = -timeout  # Опоздание от запланированного времени запроса
+                    timeout = None
+                    for subscription in group:  # Пробегаемся по всем подпискам группы
+                        if subscription.active:  # Если подписка действует
+                            self.metrics.observe(subscription, 'wake_lag', wake_lag)
+                            self._executor.submit(self._fetch, subscription)  # то получаем бар в пуле потоков
+            self.clock.wait(self._wakeup, 3600 if timeout is None else timeout)  # Ждем времени запроса, новой подписки или выхода
+
+    def _fetch(self, subscription):
+        """Получение бара подписки в пуле потоков и постановка подписки в очередь за следующим баром
+
+        :param Subscription subscription: Подписка
+        """
+        try:
+            self.metrics.increment(subscription, 'requests')
+            started = self.clock.time()  # Время запроса
+            bar = subscription.fetch(subscription)  # Получаем бар
+            now = self.clock.time()  # Время ответа
+            self.metrics.observe(subscription, 'round_trip', now - started)
+            elapsed = timedelta(seconds=now - subscription.ready_timestamp)  # Прошло времени от закрытия бара
+            if bar is None:  # Если бар не получен
+                self.metrics.increment(subscription, 'empty')
+                retry = self.readiness.retry_delay(subscription, subscription.attempt + 1, elapsed)  # Задержка повторного запроса по политике
+                if retry is not None:  # Если бар нужно запросить повторно
+                    with self._lock:
+                        if subscription.active and not self._closed:  # Если подписка действует, и диспетчер не закрыт
+                            subscription.attempt += 1  # Следующий повторный запрос
+                            self.metrics.increment(subscription, 'retries')
+                            logger.debug(f'{subscription}: бар {subscription.trade_bar_open_datetime:%d.%m.%Y %H:%M:%S} не получен. Повторный запрос {subscription.attempt} через {retry.total_seconds()} с')
+                            self._push(subscription, self.clock.time() + retry.total_seconds())  # Ставим подписку в очередь за тем же баром
+                    self._wakeup.set()  # Первая в очереди дата и время запроса могли измениться
+                    return
+                self.metrics.increment(subscription, 'missed')
+                logger.warning(f'{subscription}: бар {subscription.trade_bar_open_datetime:%d.%m.%Y %H:%M:%S} не получен')
+            else:  # Если бар получен
+                self.metrics.increment(subscription, 'bars')
+                self.metrics.observe(subscription, 'bar_latency', elapsed.total_seconds())
+                self.readiness.observe(subscription, elapsed)  # Учитываем задержку получения бара
+                if subscription.callback:  # Если задана функция обработки
+                    subscription.callback(subscription, bar)  # то обрабатываем бар
+        except Exception:  # Ошибка получения или обработки не должна останавливать подписку
+            self.metrics.increment(subscription, 'errors')
+            logger.exception(f'{subscription}: ошибка получения бара {subscription.trade_bar_open_datetime:%d.%m.%Y %H:%M:%S}')
+        with self._lock:
+            if subscription.active and not self._closed:  # Если подписка действует, и диспетчер не закрыт
+                self._schedule(subscription)  # то ставим подписку в очередь за следующим баром
+        self._wakeup.set()  # Первая в очереди дата и время запроса могли измениться
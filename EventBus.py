@@ -0,0 +1,311 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod  # Подписчик шины бар - абстрактный класс
+from collections import deque  # Очереди бар подписчиков
+from threading import Condition, Lock
+
+from MarketPy.Schedule import Schedule
+from MarketPy.Bars import Bar
+from MarketPy.Dispatcher import Dispatcher, Subscription
+
+
+logger = logging.getLogger('Schedule.EventBus')  # Будем вести лог
+
+
+class Listener(ABC):
+    """Подписчик шины бар. Получает общий для всех подписчиков неизменяемый бар"""
+    def __init__(self, key):
+        """
+        :param tuple key: (код режима торгов, код тикера, временной интервал)
+        """
+        self.key = key  # (код режима торгов, код тикера, временной интервал)
+        self.received = 0  # Кол-во полученных бар
+        self.dropped = 0  # Кол-во отброшенных бар из-за переполнения
+
+    @abstractmethod
+    def put(self, subscription, bar):
+        """Передача бара подписчику. Вызывается шиной в потоке получения бар
+
+        :param Subscription subscription: Подписка источника
+        :param Bar bar: Бар
+        """
+
+    def close(self):
+        """Подписка отменена. Ожидающие получатели завершаются"""
+        pass
+
+    def __repr__(self):
+        return f'{type(self).__name__} {".".join(self.key[:2])} ({self.key[2]})'
+
+
+class CallbackListener(Listener):
+    """Подписчик-функция. Вызывается в потоке получения бар, поэтому должна работать быстро"""
+    def __init__(self, key, callback):
+        """
+        :param tuple key: (код режима торгов, код тикера, временной интервал)
+        :param callback: Функция обработки бара callback(subscription, bar)
+        """
+        super().__init__(key)
+        self.callback = callback  # Функция обработки бара
+
+    def put(self, subscription, bar):
+        self.received += 1
+        self.callback(subscription, bar)
+
+
+class QueueListener(Listener):
+    """Подписчик-очередь ограниченного размера для обработки бар в своем потоке. При переполнении отбрасывает самый старый бар (drop_oldest)
+    или ждет, пока подписчик заберет бар (block). Ожидание задерживает всех подписчиков тикера"""
+    policies = ('drop_oldest', 'block')  # Политики переполнения
+
+    def __init__(self, key, maxsize=1000, policy='drop_oldest'):
+        """
+        :param tuple key: (код режима торгов, код тикера, временной интервал)
+        :param int maxsize: Максимальное кол-во бар в очереди
+        :param str policy: Политика переполнения: drop_oldest - отбросить самый старый бар, block - ждать места в очереди
+        """
+        if policy not in self.policies:  # Если политика не поддерживается
+            raise ValueError(f'Политика переполнения {policy} не поддерживается. Поддерживаемые политики: {", ".join(self.policies)}')
+        super().__init__(key)
+        self.maxsize = maxsize  # Максимальное кол-во бар в очереди
+        self.policy = policy  # Политика переполнения
+        self.closed = False  # Подписка отменена
+        self._queue = deque()  # Очередь (подписка, бар)
+        self._condition = Condition()  # Появился бар, освободилось место или подписка отменена
+
+    def put(self, subscription, bar):
+        with self._condition:
+            if len(self._queue) >= self.maxsize:  # Если очередь заполнена
+                if self.policy == 'drop_oldest':  # Если отбрасываем самый старый бар
+                    self._queue.popleft()
+                    self.dropped += 1
+                else:  # Если ждем места в очереди
+                    self._condition.wait_for(lambda: len(self._queue) < self.maxsize or self.closed)
+                    if self.closed:  # Если подписка отменена, пока ждали
+                        return
+            self._queue.append((subscription, bar))
+            self.received += 1
+            self._notify()
+
+    def get(self, timeout=None):
+        """Получение бара из очереди
+
+        :param float timeout: Время ожидания в секундах. None - без ограничения
+        :return: (подписка, бар). None, если бара не дождались или подписка отменена
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._queue or self.closed, timeout) or not self._queue:  # Если бара нет
+                return None
+            item = self._queue.popleft()
+            self._condition.notify_all()  # Освободилось место в очереди
+            return item
+
+    def __iter__(self):
+        """Получение бар до отмены подписки"""
+        while True:
+            item = self.get()
+            if item is None:  # Если подписка отменена
+                return
+            yield item
+
+    def __len__(self):
+        return len(self._queue)
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+            self._notify()
+
+    def _notify(self):
+        """Оповещение о новом баре. Вызывается под блокировкой"""
+        self._condition.notify_all()
+
+
+class AsyncListener(QueueListener):
+    """Подписчик - асинхронный итератор для корутин: async for subscription, bar in listener. Бары передаются в цикл событий из потока получения бар"""
+    def __init__(self, key, loop, maxsize=1000, policy='drop_oldest'):
+        """
+        :param tuple key: (код режима торгов, код тикера, временной интервал)
+        :param asyncio.AbstractEventLoop loop: Цикл событий подписчика
+        :param int maxsize: Максимальное кол-во бар в очереди
+        :param str policy: Политика переполнения: drop_oldest - отбросить самый старый бар, block - ждать места в очереди
+        """
+        super().__init__(key, maxsize, policy)
+        self.loop = loop  # Цикл событий подписчика
+        self._event = asyncio.Event()  # Появился бар или подписка отменена
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while True:
+            with self._condition:
+                if self._queue:  # Если есть бар
+                    item = self._queue.popleft()
+                    self._condition.notify_all()  # Освободилось место в очереди
+                    return item
+                if self.closed:  # Если подписка отменена
+                    raise StopAsyncIteration
+                self._event.clear()
+            await self._event.wait()  # Ждем бара
+
+    def _notify(self):
+        super()._notify()
+        if not self.loop.is_closed():  # Если цикл событий работает
+            self.loop.call_soon_threadsafe(self._event.set)  # Будим подписчика в его цикле событий
+
+
+class BarBus:
+    """Шина бар. Бары тикера получаются от источника один раз и передаются всем подписчикам одним и тем же неизменяемым объектом.
+    Источник - диспетчер или получение из потока обновлений: объект с функциями subscribe(class_code, security_code, schedule, tf, fetch, callback) и unsubscribe(subscription).
+    Делить между подписчиками безопасно только неизменяемый Bar. Ответы провайдера (например, словари Alor) шина не копирует и не разбирает,
+    поэтому fetch должна сама переводить их в Bar (Bars.alor_bar_to_bar, finam_candle_to_bar, tinkoff_candle_to_bar)"""
+    def __init__(self, source=None):
+        """
+        :param Dispatcher source: Источник бар. None - бары публикуются вызовом publish
+        """
+        self.source = source  # Источник бар
+        self.published = 0  # Кол-во опубликованных бар
+        self._listeners = {}  # Подписчики по (код режима торгов, код тикера, временной интервал): кортеж подписчиков
+        self._subscriptions = {}  # Подписки источника по (код режима торгов, код тикера, временной интервал)
+        self._schedules = {}  # Расписания первых подписчиков по (код режима торгов, код тикера, временной интервал)
+        self._lock = Lock()  # Подписчики добавляются и удаляются из разных потоков
+
+    def subscribe(self, class_code, security_code, schedule, tf, fetch, callback=None, listener=None) -> Listener:
+        """Подписка на бары тикера. Первый подписчик тикера подписывается у источника, остальные получают те же бары
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param Schedule schedule: Расписание торгов. У всех подписчиков тикера используется расписание первого. Другое расписание пишется в лог
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param fetch: Функция получения бара fetch(subscription) для источника. У всех подписчиков тикера используется функция первого
+        :param callback: Функция обработки бара callback(subscription, bar). Если задана, то подписчик - функция
+        :param Listener listener: Подписчик. Например, QueueListener или AsyncListener. Если не задан, то подписчик - очередь
+        :return: Подписчик
+        """
+        key = (class_code, security_code, str(tf))
+        if listener is None:  # Если подписчик не задан
+            listener = CallbackListener(key, callback) if callback else QueueListener(key)
+        with self._lock:
+            known = self._schedules.setdefault(key, schedule)  # Расписание первого подписчика тикера
+            if known is not schedule:  # Если подписчик передал другое расписание, то оно не используется
+                logger.warning(f'{".".join(key[:2])} ({key[2]}): расписание {type(schedule).__name__} подписчика не используется. Бары получаются по расписанию {type(known).__name__} первого подписчика')
+            self._listeners[key] = self._listeners.get(key, ()) + (listener,)  # Публикация читает кортеж без блокировки
+            if self.source is not None and key not in self._subscriptions:  # Если тикер у источника еще не подписан
+                self._subscriptions[key] = self.source.subscribe(class_code, security_code, schedule, tf, fetch, self.publish)  # то подписываемся один раз
+        return listener
+
+    def listen(self, class_code, security_code, tf, **kwargs) -> Listener:
+        """Подписчик-очередь или асинхронный итератор для тикера. Подписку нужно передать в subscribe
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param kwargs: Параметры QueueListener, или loop и параметры AsyncListener
+        :return: Подписчик
+        """
+        key = (class_code, security_code, str(tf))
+        return AsyncListener(key, **kwargs) if 'loop' in kwargs else QueueListener(key, **kwargs)
+
+    def unsubscribe(self, listener):
+        """Отмена подписки. Последний подписчик тикера отменяет подписку у источника
+
+        :param Listener listener: Подписчик
+        """
+        with self._lock:
+            listeners = tuple(item for item in self._listeners.get(listener.key, ()) if item is not listener)
+            if listeners:  # Если у тикера остались подписчики
+                self._listeners[listener.key] = listeners
+            else:  # Если подписчиков у тикера не осталось
+                self._listeners.pop(listener.key, None)
+                self._schedules.pop(listener.key, None)
+                subscription = self._subscriptions.pop(listener.key, None)
+                if subscription is not None:  # Если тикер подписан у источника
+                    self.source.unsubscribe(subscription)  # то отменяем подписку
+        listener.close()
+
+    def publish(self, subscription, bar):
+        """Публикация бара всем подписчикам тикера. Функция обработки бара источника
+
+        :param Subscription subscription: Подписка источника
+        :param Bar bar: Бар. Передается всем подписчикам без копирования. Изменяемый объект (словарь) один подписчик может испортить всем остальным
+        """
+        self.published += 1
+        for listener in self._listeners.get((subscription.class_code, subscription.security_code, str(subscription.tf)), ()):  # Пробегаемся по всем подписчикам тикера
+            try:
+                listener.put(subscription, bar)
+            except Exception:  # Ошибка одного подписчика не должна мешать остальным
+                logger.exception(f'{listener}: ошибка обработки бара')
+
+    def subscription(self, class_code, security_code, tf) -> Subscription:
+        """Подписка тикера у источника
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Подписка источника. None, если тикер не подписан
+        """
+        return self._subscriptions.get((class_code, security_code, str(tf)))
+
+    def listeners(self, class_code, security_code, tf) -> tuple:
+        """Подписчики тикера
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Подписчики
+        """
+        return self._listeners.get((class_code, security_code, str(tf)), ())
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    from datetime import datetime
+    from threading import Event, Thread
+    from timeit import timeit
+    from MarketPy.Schedule import MOEXStocks
+    from MarketPy.Clock import AcceleratedClock
+    from MarketPy.PushBars import PushBars
+
+    clock = AcceleratedClock(MOEXStocks().msk_datetime_to_utc_timestamp(datetime(2025, 3, 17, 10, 0, 30)), speed=60)  # Минута за секунду
+    schedule = MOEXStocks(clock=clock)  # Расписание с ускоренными часами
+    strategies = 100  # Кол-во стратегий на одном тикере
+    with PushBars(clock=clock) as push_bars:  # Источник бар
+        history = {}  # Бары на сервере по дате и времени открытия
+        fetch = lambda subscription: history.get(subscription.trade_bar_open_datetime)  # Запрос бара сторожем
+        bus = BarBus(push_bars)  # Шина бар
+        received = []  # Бары, полученные функциями
+        for _ in range(strategies - 2):  # Стратегии - функции
+            bus.subscribe('TQBR', 'SBER', schedule, 'M1', fetch, lambda subscription, bar: received.append(bar))
+        queue = bus.subscribe('TQBR', 'SBER', schedule, 'M1', fetch, listener=bus.listen('TQBR', 'SBER', 'M1', maxsize=2, policy='drop_oldest'))  # Медленная стратегия - очередь
+        source = bus.subscription('TQBR', 'SBER', 'M1')  # Подписка источника
+
+        async def strategy(listener, bars):  # Стратегия - корутина
+            async for _, bar in listener:
+                bars.append(bar)
+
+        loop = asyncio.new_event_loop()
+        async_bars = []
+        async_listener = bus.subscribe('TQBR', 'SBER', schedule, 'M1', fetch, listener=bus.listen('TQBR', 'SBER', 'M1', loop=loop))
+        loop_thread = Thread(target=loop.run_until_complete, args=(strategy(async_listener, async_bars),))
+        loop_thread.start()
+        price = 100.0
+        for _ in range(5 * 60):  # 5 минут обновлений раз в секунду вместо потока обновлений провайдера
+            clock.wait(Event(), 1)
+            dt = schedule.trade_bar_open_datetime(schedule.market_datetime_now, 'M1')  # Несформированный бар
+            price = round(price + 0.01, 2)
+            history[dt] = Bar(dt, price, price, price, price, 10)
+            push_bars.on_update(source, history[dt])
+        bus.unsubscribe(async_listener)  # Асинхронный итератор завершается
+        loop_thread.join()
+        print(f'Подписок у источника: {len(bus._subscriptions)} на {strategies} стратегий. Опубликовано бар: {bus.published}. '
+              f'Функции получили {len(received)}, очередь {queue.received} (отброшено {queue.dropped}, осталось {len(queue)}), корутина {len(async_bars)}. '
+              f'Один объект бара у всех: {all(bar is async_bars[-1] for bar in received[-(strategies - 2):])}')
+
+    subscription = Subscription('TQBR', 'SBER', schedule, 'M1', None)
+    bar = Bar(datetime(2025, 3, 17, 10), 300.0, 301.0, 299.0, 300.5, 1000)
+    bus = BarBus()
+    for _ in range(strategies):
+        bus.subscribe('TQBR', 'SBER', schedule, 'M1', None, lambda subscription, bar: None)
+    us = timeit(lambda: bus.publish(subscription, bar), number=10_000) * 100  # Время публикации в микросекундах
+    print(f'Публикация бара {strategies} функциям: {us:.1f} мкс ({us / strategies * 1000:.0f} нс на стратегию)')
@@ -0,0 +1,71 @@
+import logging
+from datetime import datetime
+
+from MarketPy.Schedule import Schedule, MOEXStocks, MOEXFutures
+from MarketPy.BarStore import BarStore
+from MarketPy.Bars import alor_bar_to_bar
+from MarketPy.PushBars import PushBars
+
+from AlorPy import AlorPy  # Работа с Alor OpenAPI V2
+
+
+logger = logging.getLogger('Schedule.PushBarsAlor')  # Будем вести лог
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    board = 'TQBR'  # Акции ММВБ
+    symbol = 'SBER'  # Тикер
+    schedule = MOEXStocks()  # Расписание фондового рынка Московской Биржи
+    # board = 'RFUD'  # Фьючерсы
+    # symbol = 'SiH4'  # Формат фьючерса: <Тикер><Месяц экспирации><Последняя цифра года> Месяц экспирации: 3-H, 6-M, 9-U, 12-Z
+    # schedule = MOEXFutures()  # Расписание срочного рынка Московской Биржи
+    tf = 'M1'  # 1 минута
+    # tf = 'M5'  # 5 минут
+    # tf = 'M15'  # 15 минут
+    # tf = 'M60'  # 1 час
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',  # Формат сообщения
+                        datefmt='%d.%m.%Y %H:%M:%S',  # Формат даты
+                        level=logging.DEBUG,  # Уровень логируемых событий NOTSET/DEBUG/INFO/WARNING/ERROR/CRITICAL
+                        handlers=[logging.FileHandler('PushBarsAlor.log'), logging.StreamHandler()])  # Лог записываем в файл и выводим на консоль
+    logging.Formatter.converter = lambda *args: datetime.now(tz=Schedule.market_timezone).timetuple()  # В логе время указываем по временнОй зоне расписания (МСК)
+    logging.getLogger('urllib3').setLevel(logging.CRITICAL + 1)
+
+    ap_provider = AlorPy()  # Провайдер Alor. Одно подключение для потока обновлений и запросов сторожа
+    tf_alor, _ = ap_provider.timeframe_to_alor_timeframe(tf)  # Временной интервал Алор
+    exchange = ap_provider.get_exchange(board, symbol)  # Биржа, где торгуется тикер
+    si = ap_provider.get_symbol(exchange, symbol)  # Получаем информацию о тикере
+    bar_store = BarStore('Bars')  # Локальное хранилище бар. Один процесс пишет, любые процессы читают
+
+    def fetch(subscription):
+        """Запрос бара сторожем, если поток обновлений остановился"""
+        seconds_from = schedule.msk_datetime_to_utc_timestamp(subscription.trade_bar_open_datetime)  # Дата и время бара в timestamp UTC
+        bars = ap_provider.get_history(exchange, symbol, tf_alor, seconds_from)  # Получаем ответ на запрос истории рынка
+        if not bars or len(bars['history']) == 0:  # Если бар не получен
+            return None
+        return alor_bar_to_bar(bars['history'][0], schedule, si['lotsize'])  # Первый (завершенный) бар
+
+    def on_bar(subscription, bar):
+        """Обработка сформированного бара"""
+        logger.info(f'Получен бар: {subscription.class_code}.{subscription.security_code} ({tf}/{tf_alor}) - {bar}')
+        bar_store.append(subscription.class_code, subscription.security_code, tf, *bar)  # Сохраняем бар в локальное хранилище. PushBars выдает бары по порядку, поэтому хранилище их не отбрасывает
+
+    with PushBars() as push_bars:
+        subscription = push_bars.subscribe(board, symbol, schedule, tf, fetch, on_bar)  # Подписка на новые бары по расписанию
+        guids = {}  # Подписки по коду подписки на бары Алор
+
+        def on_new_bar(response):
+            """Обновление несформированного бара из WebSocket"""
+            if response['guid'] in guids:  # Если обновление по нашей подписке
+                push_bars.on_update(guids[response['guid']], alor_bar_to_bar(response['data'], schedule, si['lotsize']))
+
+        ap_provider.on_new_bar.subscribe(on_new_bar)  # Обновления бар передаем в получение бар
+        seconds_from = schedule.msk_datetime_to_utc_timestamp(subscription.trade_bar_open_datetime)  # Обновления с текущего бара
+        guids[ap_provider.bars_get_and_subscribe(exchange, symbol, tf_alor, seconds_from, frequency=1_000_000_000)] = subscription  # Подписываемся на обновления бар раз в секунду
+        print('\nEnter - выход')
+        input()  # Ожидаем нажатия на клавишу Ввод (Enter)
+        for guid in guids:  # Пробегаемся по всем подпискам на бары Алор
+            ap_provider.unsubscribe(guid)  # Отменяем подписку
+        ap_provider.on_new_bar.unsubscribe(on_new_bar)
+    ap_provider.close_web_socket()  # Перед выходом закрываем соединение с WebSocket
+    bar_store.close()  # Закрываем хранилище бар
@@ -3,6 +3,8 @@ from datetime import datetime
 from threading import Thread, Event
 
 from MarketPy.Schedule import Schedule, MOEXStocks, MOEXFutures
+from MarketPy.BarStore import BarStore
+from MarketPy.Bars import alor_bar_to_bar
 
 from AlorPy import AlorPy  # Работа с Alor OpenAPI V2
 
@@ -24,15 +26,15 @@ def stream_bars(class_code, security_code, schedule, tf):
     exchange = ap_provider.get_exchange(class_code, security_code)  # Биржа, где торгуется тикер
     si = ap_provider.get_symbol(exchange, security_code)  # Получаем информацию о тикере
     while True:
-        market_datetime_now = schedule.utc_to_msk_datetime(datetime.utcnow())  # Текущее время на бирже
+        market_datetime_now = schedule.utc_timestamp_to_msk_datetime(schedule.clock.time())  # Текущее время на бирже по часам расписания
         logger.debug(f'Текущая дата и время на бирже: {market_datetime_now:%d.%m.%Y %H:%M:%S}')
         trade_bar_open_datetime = schedule.trade_bar_open_datetime(market_datetime_now, tf)  # Дата и время открытия бара, который будем получать
         logger.debug(f'Нужно получить бар: {trade_bar_open_datetime:%d.%m.%Y %H:%M:%S}')
         trade_bar_request_datetime = schedule.trade_bar_request_datetime(market_datetime_now, tf)  # Дата и время запроса бара на бирже
         logger.debug(f'Время запроса бара: {trade_bar_request_datetime:%d.%m.%Y %H:%M:%S}')
-        sleep_time_secs = (trade_bar_request_datetime - market_datetime_now).total_seconds()  # Время ожидания в секундах
+        sleep_time_secs = schedule.msk_datetime_to_utc_timestamp(trade_bar_request_datetime) - schedule.clock.time()  # Время ожидания в секундах по UTC. Разница времени на бирже неверна при переходе на летнее/зимнее время
         logger.debug(f'Ожидание в секундах: {sleep_time_secs}')
-        exit_event_set = exit_event.wait(sleep_time_secs)  # Ждем нового бара или события выхода из потока
+        exit_event_set = schedule.clock.wait(exit_event, sleep_time_secs)  # Ждем нового бара или события выхода из потока по часам расписания
         if exit_event_set:  # Если произошло событие выхода из потока
             ap_provider.close_web_socket()  # Перед выходом закрываем соединение с WebSocket
             return  # Выходим из потока, дальше не продолжаем
@@ -46,14 +48,9 @@ def stream_bars(class_code, security_code, schedule, tf):
         if len(bars) == 0:  # Если бары не получены
             logger.warning('Бар не получен')
             continue  # Будем получать следующий бар
-        bar = bars[0]  # Получаем первый (завершенный) бар
-        dt = schedule.utc_timestamp_to_msk_datetime(int(bar['time']))
-        open_ = float(bar['open'])
-        high = float(bar['high'])
-        low = float(bar['low'])
-        close = float(bar['close'])
-        volume = int(bar['volume'] * si['lotsize'])
-        logger.info(f'Получен бар: {class_code}.{security_code} ({tf}/{tf_alor}) - {dt:%d.%m.%Y %H:%M:%S} - Open = {open_}, High = {high}, Low = {low}, Close = {close}, Volume = {volume}')
+        bar = alor_bar_to_bar(bars[0], schedule, si['lotsize'])  # Получаем первый (завершенный) бар
+        logger.info(f'Получен бар: {class_code}.{security_code} ({tf}/{tf_alor}) - {bar}')
+        bar_store.append(class_code, security_code, tf, *bar)  # Сохраняем бар в локальное хранилище
 
 
 if __name__ == '__main__':  # Точка входа при запуске этого скрипта
@@ -76,9 +73,12 @@ if __name__ == '__main__':  # Точка входа при запуске это
     logging.Formatter.converter = lambda *args: datetime.now(tz=Schedule.market_timezone).timetuple()  # В логе время указываем по временнОй зоне расписания (МСК)
     logging.getLogger('urllib3').setLevel(logging.CRITICAL + 1)
 
+    bar_store = BarStore('Bars')  # Локальное хранилище бар. Один процесс пишет, любые процессы читают
     print('\nEnter - выход')
     exit_event = Event()  # Определяем событие выхода из потока
     stream_bars_thread = Thread(name='schedule_bars_alor', target=stream_bars, args=(board, symbol, schedule, tf))  # Создаем поток получения новых бар
     stream_bars_thread.start()  # Запускаем поток
     input()  # Ожидаем нажатия на клавишу Ввод (Enter)
     exit_event.set()  # Устанавливаем событие выхода из потока
+    stream_bars_thread.join()  # Ждем выхода из потока
+    bar_store.close()  # Закрываем хранилище бар
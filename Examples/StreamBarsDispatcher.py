@@ -0,0 +1,99 @@
+import logging
+from datetime import datetime
+
+from MarketPy.Schedule import Schedule, MOEXStocks
+from MarketPy.Dispatcher import Dispatcher, Subscription
+from MarketPy.Readiness import AdaptiveDelay
+from MarketPy.Metrics import Metrics, serve
+from MarketPy.Checkpoint import Checkpoint
+from MarketPy.Backfill import Backfill, BackfillPage
+
+from AlorPy import AlorPy  # Работа с Alor OpenAPI V2
+
+
+logger = logging.getLogger('Schedule.StreamBarsDispatcher')  # Будем вести лог
+
+
+# noinspection PyShadowingNames
+def fetch_bar(subscription):
+    """Получение бара подписки. Вызывается диспетчером в пуле потоков
+
+    :param Subscription subscription: Подписка
+    :return: Бар или None, если бар не получен
+    """
+    exchange = ap_provider.get_exchange(subscription.class_code, subscription.security_code)  # Биржа, где торгуется тикер
+    tf_alor, _ = ap_provider.timeframe_to_alor_timeframe(subscription.tf)  # Временной интервал Алор
+    seconds_from = subscription.schedule.msk_datetime_to_utc_timestamp(subscription.trade_bar_open_datetime)  # Дата и время бара в timestamp UTC
+    bars = ap_provider.get_history(exchange, subscription.security_code, tf_alor, seconds_from)  # Получаем ответ на запрос истории рынка
+    if not bars:  # Если ничего не получили
+        logger.warning('Данные не получены')
+        return None
+    bars = bars['history']  # Последний сформированный и текущий несформированный (если имеется) бары
+    return bars[0] if len(bars) > 0 else None  # Первый (завершенный) бар
+
+
+# noinspection PyShadowingNames
+def fetch_page(page):
+    """Получение бар, пропущенных за время простоя. Вызывается загрузкой истории в пуле потоков
+
+    :param BackfillPage page: Страница
+    :return: Бары страницы
+    """
+    exchange = ap_provider.get_exchange(page.class_code, page.security_code)  # Биржа, где торгуется тикер
+    tf_alor, _ = ap_provider.timeframe_to_alor_timeframe(str(page.tf))  # Временной интервал Алор
+    seconds_from = page.schedule.msk_datetime_to_utc_timestamp(page.first)  # Открытие первого пропущенного бара в timestamp UTC
+    seconds_to = page.schedule.msk_datetime_to_utc_timestamp(page.end) - 1  # Закрытие последнего пропущенного бара в timestamp UTC. Не включительно
+    bars = ap_provider.get_history(exchange, page.security_code, tf_alor, seconds_from, seconds_to)  # Получаем ответ на запрос истории рынка
+    return bars['history'] if bars else []
+
+
+# noinspection PyShadowingNames
+def on_bar(subscription, bar):
+    """Обработка полученного бара
+
+    :param Subscription subscription: Подписка
+    :param dict bar: Бар
+    """
+    dt = subscription.schedule.utc_timestamp_to_msk_datetime(int(bar['time']))
+    logger.info(f'Получен бар: {subscription} - {dt:%d.%m.%Y %H:%M:%S} - Open = {bar["open"]}, High = {bar["high"]}, Low = {bar["low"]}, Close = {bar["close"]}, Volume = {bar["volume"]}')
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    board = 'TQBR'  # Акции ММВБ
+    symbols = ('SBER', 'GAZP', 'LKOH', 'GMKN', 'YDEX')  # Тикеры
+    schedule = MOEXStocks()  # Расписание фондового рынка Московской Биржи
+    tfs = ('M1', 'M5', 'M15', 'M60')  # Временные интервалы
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',  # Формат сообщения
+                        datefmt='%d.%m.%Y %H:%M:%S',  # Формат даты
+                        level=logging.DEBUG,  # Уровень логируемых событий NOTSET/DEBUG/INFO/WARNING/ERROR/CRITICAL
+                        handlers=[logging.FileHandler('StreamBarsDispatcher.log'), logging.StreamHandler()])  # Лог записываем в файл и выводим на консоль
+    logging.Formatter.converter = lambda *args: datetime.now(tz=Schedule.market_timezone).timetuple()  # В логе время указываем по временнОй зоне расписания (МСК)
+    logging.getLogger('urllib3').setLevel(logging.CRITICAL + 1)
+
+    ap_provider = AlorPy()  # Одно подключение к провайдеру Alor на все подписки
+    readiness = AdaptiveDelay()  # Задержка запроса по наблюдаемым задержкам получения бар Алор. Если бар не получен, то запрашиваем его повторно
+    metrics = Metrics('alor')  # Метрики получения бар Алор
+    metrics_server = serve([metrics], port=8000)  # Метрики в формате Prometheus по адресу http://127.0.0.1:8000/metrics
+    checkpoint = Checkpoint('StreamBarsDispatcher.json', readiness)  # Контрольная точка: последние выданные бары и наблюдаемые задержки
+    if checkpoint.load():  # Если это перезапуск
+        backfill = Backfill(fetch_page, max_workers=8)  # Пропущенные за время простоя бары получаем через то же подключение
+        checkpoint.restore(backfill, [(board, symbol, schedule, tf) for symbol in symbols for tf in tfs])  # Только бары, закрывшиеся после последних выданных
+        for page, bars in backfill.run():  # Пробегаемся по всем полученным страницам
+            subscription = Subscription(page.class_code, page.security_code, schedule, str(page.tf), fetch_bar)  # Подписка для обработки бар
+            for bar in bars or ():  # Пробегаемся по всем пропущенным барам
+                subscription.trade_bar_open_datetime = schedule.utc_timestamp_to_msk_datetime(int(bar['time']))  # Дата и время открытия бара
+                checkpoint.wrap(on_bar)(subscription, bar)  # Обрабатываем бар и учитываем его в контрольной точке
+    dispatcher = Dispatcher(max_workers=8, readiness=readiness, metrics=metrics)  # Один поток очереди и до 8-и потоков получения бар на все подписки
+    for symbol in symbols:  # Пробегаемся по всем тикерам
+        for tf in tfs:  # и временнЫм интервалам
+            after = checkpoint.last_delivered(board, symbol, schedule, tf)  # Последний выданный бар. Бары, закрывшиеся во время загрузки пропусков, получит диспетчер
+            dispatcher.subscribe(board, symbol, schedule, tf, fetch_bar, checkpoint.wrap(on_bar), after)  # Подписываемся на новые бары. Выданные бары учитываем в контрольной точке
+    dispatcher.start()  # Запускаем диспетчер
+
+    print('\nEnter - выход')
+    input()  # Ожидаем нажатия на клавишу Ввод (Enter)
+    dispatcher.close()  # Закрываем диспетчер. Ждем завершения запущенных получений бар
+    checkpoint.save()  # Записываем контрольную точку для следующего запуска
+    metrics_server.shutdown()  # Останавливаем сервер метрик
+    ap_provider.close_web_socket()  # Перед выходом закрываем соединение с WebSocket
@@ -3,13 +3,14 @@ from datetime import datetime
 from threading import Thread, Event
 
 from MarketPy.Schedule import Schedule, MOEXStocks, MOEXFutures
+from MarketPy.BarStore import BarStore
+from MarketPy.Bars import finam_candle_to_bar
 
 from FinamPy import FinamPy  # Работа с сервером TRANSAQ
 
 from FinamPy.proto.candles_pb2 import DayCandleInterval, IntradayCandleInterval
 from FinamPy.proto.google.type.date_pb2 import Date
 from google.protobuf.timestamp_pb2 import Timestamp
-from google.protobuf.json_format import MessageToDict
 
 
 logger = logging.getLogger('Schedule.StreamBarsFinam')  # Будем вести лог
@@ -28,15 +29,15 @@ def stream_bars(class_code, security_code, schedule, tf):
     tf_finam, intraday = fp_provider.timeframe_to_finam_timeframe(tf)  # Временной интервал Финам, внутридневной интервал
     interval = IntradayCandleInterval(count=1) if intraday else DayCandleInterval(count=1)  # Принимаем последний завершенный бар
     while True:
-        market_datetime_now = schedule.utc_to_msk_datetime(datetime.utcnow())  # Текущее время на бирже
+        market_datetime_now = schedule.utc_timestamp_to_msk_datetime(schedule.clock.time())  # Текущее время на бирже по часам расписания
         logger.debug(f'Текущая дата и время на бирже: {market_datetime_now:%d.%m.%Y %H:%M:%S}')
         trade_bar_open_datetime = schedule.trade_bar_open_datetime(market_datetime_now, tf)  # Дата и время открытия бара, который будем получать
         logger.debug(f'Нужно получить бар: {trade_bar_open_datetime:%d.%m.%Y %H:%M:%S}')
         trade_bar_request_datetime = schedule.trade_bar_request_datetime(market_datetime_now, tf)  # Дата и время запроса бара на бирже
         logger.debug(f'Время запроса бара: {trade_bar_request_datetime:%d.%m.%Y %H:%M:%S}')
-        sleep_time_secs = (trade_bar_request_datetime - market_datetime_now).total_seconds()  # Время ожидания в секундах
+        sleep_time_secs = schedule.msk_datetime_to_utc_timestamp(trade_bar_request_datetime) - schedule.clock.time()  # Время ожидания в секундах по UTC. Разница времени на бирже неверна при переходе на летнее/зимнее время
         logger.debug(f'Ожидание в секундах: {sleep_time_secs}')
-        exit_event_set = exit_event.wait(sleep_time_secs)  # Ждем нового бара или события выхода из потока
+        exit_event_set = schedule.clock.wait(exit_event, sleep_time_secs)  # Ждем нового бара или события выхода из потока по часам расписания
         if exit_event_set:  # Если произошло событие выхода из потока
             fp_provider.close_channel()  # Закрываем канал перед выходом
             return  # Выходим из потока, дальше не продолжаем
@@ -51,29 +52,17 @@ def stream_bars(class_code, security_code, schedule, tf):
             from_.year = date_from.year
             from_.month = date_from.month
             from_.day = date_from.day
-        bars = MessageToDict(fp_provider.get_intraday_candles(class_code, security_code, tf_finam, interval) if intraday else
-                             fp_provider.get_day_candles(class_code, security_code, tf_finam, interval),
-                             always_print_fields_with_no_presence=True)  # Получаем ответ на запрос истории рынка
-        if not bars:  # Если ничего не получили
+        response = fp_provider.get_intraday_candles(class_code, security_code, tf_finam, interval) if intraday else \
+            fp_provider.get_day_candles(class_code, security_code, tf_finam, interval)  # Получаем ответ на запрос истории рынка
+        if response is None:  # Если ничего не получили
             logger.warning('Данные не получены')
             continue  # Будем получать следующий бар
-        logger.debug(f'Получены данные {bars}')
-        bars = bars['candles']
-        if len(bars) == 0:  # Если бары не получены
+        if len(response.candles) == 0:  # Если бары не получены
             logger.warning('Бар не получен')
             continue  # Будем получать следующий бар
-        new_bar = bars[0]  # Получаем первый (завершенный) бар
-        # Дату/время UTC получаем в формате ISO 8601. Пример: 2023-06-16T20:01:00Z
-        # В статье https://stackoverflow.com/questions/127803/how-do-i-parse-an-iso-8601-formatted-date описывается проблема, что Z на конце нужно убирать
-        dt = fp_provider.utc_to_msk_datetime(
-            datetime.fromisoformat(new_bar['timestamp'][:-1])) if intraday else \
-            datetime(new_bar['date']['year'], new_bar['date']['month'], new_bar['date']['day'])  # Дату/время переводим из UTC в МСК
-        open_ = fp_provider.dict_decimal_to_float(new_bar['open'])
-        high = fp_provider.dict_decimal_to_float(new_bar['high'])
-        low = fp_provider.dict_decimal_to_float(new_bar['low'])
-        close = fp_provider.dict_decimal_to_float(new_bar['close'])
-        volume = new_bar['volume']  # Объем в штуках
-        logger.info(f'Получен бар: {class_code}.{security_code} ({tf}/{tf_finam}) - {dt.strftime("%d.%m.%Y %H:%M:%S")} - Open = {open_}, High = {high}, Low = {low}, Close = {close}, Volume = {volume}')
+        bar = finam_candle_to_bar(response.candles[0], schedule, intraday)  # Разбираем первый (завершенный) бар из сообщения protobuf без перевода в словарь
+        logger.info(f'Получен бар: {class_code}.{security_code} ({tf}/{tf_finam}) - {bar}')
+        bar_store.append(class_code, security_code, tf, *bar)  # Сохраняем бар в локальное хранилище
 
 
 if __name__ == '__main__':  # Точка входа при запуске этого скрипта
@@ -96,9 +85,12 @@ if __name__ == '__main__':  # Точка входа при запуске это
                         handlers=[logging.FileHandler('StreamBarsFinam.log'), logging.StreamHandler()])  # Лог записываем в файл и выводим на консоль
     logging.Formatter.converter = lambda *args: datetime.now(tz=Schedule.market_timezone).timetuple()  # В логе время указываем по временнОй зоне расписания (МСК)
 
+    bar_store = BarStore('Bars')  # Локальное хранилище бар. Один процесс пишет, любые процессы читают
     print('\nEnter - выход')
     exit_event = Event()  # Определяем событие выхода из потока
     stream_bars_thread = Thread(name='schedule_bars_finam', target=stream_bars, args=(board, code, schedule, tf))  # Создаем поток получения новых бар
     stream_bars_thread.start()  # Запускаем поток
     input()  # Ожидаем нажатия на клавиши Ввод (Enter)
     exit_event.set()  # Устанавливаем событие выхода из потока
+    stream_bars_thread.join()  # Ждем выхода из потока
+    bar_store.close()  # Закрываем хранилище бар
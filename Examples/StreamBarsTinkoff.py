@@ -3,11 +3,12 @@ from datetime import datetime, timedelta
 from threading import Thread, Event
 
 from MarketPy.Schedule import Schedule, MOEXStocks, MOEXFutures
+from MarketPy.BarStore import BarStore
+from MarketPy.Bars import tinkoff_candle_to_bar
 
 from TinkoffPy import TinkoffPy  # Работа с Tinkoff Invest API из Python
 
 from TinkoffPy.grpc.marketdata_pb2 import GetCandlesRequest
-from google.protobuf.json_format import MessageToDict
 
 
 logger = logging.getLogger('Schedule.StreamBarsTinkoff')  # Будем вести лог
@@ -26,15 +27,15 @@ def stream_bars(class_code, security_code, schedule, tf):
     tf_tinkoff, intraday = tp_provider.timeframe_to_tinkoff_timeframe(tf)  # Временной интервал Финам, внутридневной интервал
     si = tp_provider.get_symbol_info(class_code, security_code)  # Информация о тикере
     while True:
-        market_datetime_now = schedule.utc_to_msk_datetime(datetime.utcnow())  # Текущее время на бирже
+        market_datetime_now = schedule.utc_timestamp_to_msk_datetime(schedule.clock.time())  # Текущее время на бирже по часам расписания
         logger.debug(f'Текущая дата и время на бирже: {market_datetime_now:%d.%m.%Y %H:%M:%S}')
         trade_bar_open_datetime = schedule.trade_bar_open_datetime(market_datetime_now, tf)  # Дата и время открытия бара, который будем получать
         logger.debug(f'Нужно получить бар: {trade_bar_open_datetime:%d.%m.%Y %H:%M:%S}')
         trade_bar_request_datetime = schedule.trade_bar_request_datetime(market_datetime_now, tf)  # Дата и время запроса бара на бирже
         logger.debug(f'Время запроса бара: {trade_bar_request_datetime:%d.%m.%Y %H:%M:%S}')
-        sleep_time_secs = (trade_bar_request_datetime - market_datetime_now).total_seconds()  # Время ожидания в секундах
+        sleep_time_secs = schedule.msk_datetime_to_utc_timestamp(trade_bar_request_datetime) - schedule.clock.time()  # Время ожидания в секундах по UTC. Разница времени на бирже неверна при переходе на летнее/зимнее время
         logger.debug(f'Ожидание в секундах: {sleep_time_secs}')
-        exit_event_set = exit_event.wait(sleep_time_secs)  # Ждем нового бара или события выхода из потока
+        exit_event_set = schedule.clock.wait(exit_event, sleep_time_secs)  # Ждем нового бара или события выхода из потока по часам расписания
         if exit_event_set:  # Если произошло событие выхода из потока
             tp_provider.close_channel()  # Закрываем канал перед выходом
             return  # Выходим из потока, дальше не продолжаем
@@ -44,26 +45,16 @@ def stream_bars(class_code, security_code, schedule, tf):
         to_ = getattr(request, 'to')  # Аналогично будем работать с атрибутом to для единообразия
         from_.seconds = schedule.msk_datetime_to_utc_timestamp(trade_bar_open_datetime)  # Дата и время открытия бара в Google Timestamp UTC
         to_.seconds = schedule.msk_datetime_to_utc_timestamp(trade_bar_close_datetime)  # Дата и время закрытия бара в Google Timestamp UTC
-        bars = MessageToDict(tp_provider.call_function(tp_provider.stub_marketdata.GetCandles, request), always_print_fields_with_no_presence=True)  # Получаем бары, переводим в словарь/список
-        if not bars:  # Если ничего не получили
+        response = tp_provider.call_function(tp_provider.stub_marketdata.GetCandles, request)  # Получаем бары
+        if response is None:  # Если ничего не получили
             logger.warning('Данные не получены')
             continue  # Будем получать следующий бар
-        logger.debug(f'Получены данные {bars}')
-        bars = bars['candles']
-        if len(bars) == 0:  # Если новых бар нет
+        if len(response.candles) == 0:  # Если новых бар нет
             logger.warning('Бар не получен')
             continue  # Будем получать следующий бар
-        new_bar = bars[0]  # Получаем первый (завершенный) бар
-        # Дату/время UTC получаем в формате ISO 8601. Пример: 2023-06-16T20:01:00Z
-        # В статье https://stackoverflow.com/questions/127803/how-do-i-parse-an-iso-8601-formatted-date описывается проблема, что Z на конце нужно убирать
-        dt_utc = datetime.fromisoformat(new_bar['time'][:-1])  # Дата и время начала бара в UTC
-        dt = schedule.utc_to_msk_datetime(dt_utc) if intraday else datetime(dt_utc.year, dt_utc.month, dt_utc.day)  # Дату/время переводим из UTC в МСК
-        open_ = tp_provider.dict_quotation_to_float(new_bar['open'])
-        high = tp_provider.dict_quotation_to_float(new_bar['high'])
-        low = tp_provider.dict_quotation_to_float(new_bar['low'])
-        close = tp_provider.dict_quotation_to_float(new_bar['close'])
-        volume = int(new_bar['volume']) * si.lot  # Объем в штуках
-        logger.info(f'Получен бар: {class_code}.{security_code} ({tf}/{tf_tinkoff}) - {dt.strftime("%d.%m.%Y %H:%M:%S")} - Open = {open_}, High = {high}, Low = {low}, Close = {close}, Volume = {volume}')
+        bar = tinkoff_candle_to_bar(response.candles[0], schedule, intraday, si.lot)  # Разбираем первый (завершенный) бар из сообщения protobuf без перевода в словарь
+        logger.info(f'Получен бар: {class_code}.{security_code} ({tf}/{tf_tinkoff}) - {bar}')
+        bar_store.append(class_code, security_code, tf, *bar)  # Сохраняем бар в локальное хранилище
 
 
 if __name__ == '__main__':  # Точка входа при запуске этого скрипта
@@ -87,9 +78,12 @@ if __name__ == '__main__':  # Точка входа при запуске это
                         handlers=[logging.FileHandler('StreamBarsTinkoff.log'), logging.StreamHandler()])  # Лог записываем в файл и выводим на консоль
     logging.Formatter.converter = lambda *args: datetime.now(tz=Schedule.market_timezone).timetuple()  # В логе время указываем по временнОй зоне расписания (МСК)
 
+    bar_store = BarStore('Bars')  # Локальное хранилище бар. Один процесс пишет, любые процессы читают
     print('\nEnter - выход')
     exit_event = Event()  # Определяем событие выхода из потока
     stream_bars_thread = Thread(name='stream_bars', target=stream_bars, args=(class_code, security_code, schedule, tf))  # Создаем поток получения новых бар
     stream_bars_thread.start()  # Запускаем поток
     input()  # Ожидаем нажатия на клавишу Ввод (Enter)
     exit_event.set()  # Устанавливаем событие выхода из потока
+    stream_bars_thread.join()  # Ждем выхода из потока
+    bar_store.close()  # Закрываем хранилище бар
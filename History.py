@@ -0,0 +1,175 @@
+import logging
+from datetime import datetime
+
+import numpy as np  # Векторное сравнение бар с сеткой расписания
+
+from MarketPy.Schedule import Schedule, Timeframe
+
+
+logger = logging.getLogger('Schedule.History')  # Будем вести лог
+
+
+class BackfillWindow:
+    """Окно запроса истории: бары сетки расписания с первого по последний включительно"""
+    __slots__ = ('first', 'last', 'bars', 'missing')
+
+    def __init__(self, first, last, bars, missing):
+        """
+        :param datetime first: Дата и время открытия первого бара окна на бирже
+        :param datetime last: Дата и время открытия последнего бара окна на бирже
+        :param int bars: Кол-во бар сетки расписания в окне
+        :param int missing: Кол-во пропущенных бар в окне
+        """
+        self.first = first  # Открытие первого бара
+        self.last = last  # Открытие последнего бара
+        self.bars = bars  # Кол-во бар в окне
+        self.missing = missing  # Кол-во пропущенных бар
+
+    def __repr__(self):
+        return f'{self.first:%d.%m.%Y %H:%M:%S} - {self.last:%d.%m.%Y %H:%M:%S} ({self.missing} из {self.bars})'
+
+
+class HistoryGaps:
+    """Пропуски в истории тикера и окна запроса истории для их заполнения"""
+    def __init__(self, class_code, security_code, tf, expected, present, missing, unexpected, outside, windows):
+        """
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param Timeframe tf: Временной интервал
+        :param int expected: Кол-во бар по сетке расписания
+        :param int present: Кол-во имеющихся бар сетки расписания
+        :param np.ndarray missing: Даты и время открытия пропущенных бар datetime64[s] по возрастанию
+        :param int unexpected: Кол-во имеющихся бар проверяемого диапазона вне сетки расписания
+        :param int outside: Кол-во имеющихся бар вне проверяемого диапазона. Не проверяются
+        :param list[BackfillWindow] windows: Окна запроса истории
+        """
+        self.class_code = class_code  # Код режима торгов
+        self.security_code = security_code  # Код тикера
+        self.tf = tf  # Временной интервал
+        self.expected = expected  # Кол-во бар по сетке расписания
+        self.present = present  # Кол-во имеющихся бар сетки расписания
+        self.missing = missing  # Пропущенные бары
+        self.unexpected = unexpected  # Кол-во бар вне сетки расписания
+        self.outside = outside  # Кол-во бар вне проверяемого диапазона
+        self.windows = windows  # Окна запроса истории
+        self.gaps = 0  # Кол-во пропусков (идущих подряд пропущенных бар)
+        self.longest_gap = 0  # Кол-во бар в самом длинном пропуске
+
+    @property
+    def completeness(self) -> float:
+        """Доля имеющихся бар сетки расписания от 0 до 1"""
+        return self.present / self.expected if self.expected else 1.0
+
+    def stats(self) -> dict:
+        """Статистика пропусков
+
+        :return: Кол-во бар по сетке, имеющихся, пропущенных, вне сетки, вне диапазона, пропусков, бар в самом длинном пропуске, окон запроса и доля имеющихся бар
+        """
+        return {'expected': self.expected, 'present': self.present, 'missing': len(self.missing), 'unexpected': self.unexpected, 'outside': self.outside,
+                'gaps': self.gaps, 'longest_gap': self.longest_gap, 'windows': len(self.windows), 'completeness': self.completeness}
+
+    def __repr__(self):
+        return f'{self.class_code}.{self.security_code} ({self.tf}): пропущено {len(self.missing)} из {self.expected} бар, пропусков {self.gaps}, запросов {len(self.windows)}'
+
+
+class HistoryChecker:
+    """Проверка полноты истории тикеров по сетке бар расписания. Пропуски объединяются в наименьшее кол-во окон запроса истории с ограничением провайдера на кол-во бар в ответе"""
+    def __init__(self, page_limit=1000):
+        """
+        :param int page_limit: Максимальное кол-во бар в одном запросе истории у провайдера
+        """
+        self.page_limit = page_limit  # Максимальное кол-во бар в одном запросе
+        self.reports = {}  # Последние проверки по (код режима торгов, код тикера, временной интервал)
+
+    def check(self, class_code, security_code, schedule, tf, bar_times, start=None, end=None) -> HistoryGaps:
+        """Проверка полноты истории тикера. Проверяются только бары диапазона [start, end). Бары вне его учитываются в outside
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param Schedule schedule: Расписание торгов
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param bar_times: Даты и время открытия имеющихся бар на бирже: список datetime, массив datetime64 или кол-ва секунд int64, прошедших с 01.01.1970 00:00 по времени биржи
+        :param datetime start: Начальная дата и время на бирже (включительно). По умолчанию, первый имеющийся бар
+        :param datetime end: Конечная дата и время на бирже (не включительно). По умолчанию, открытие текущего несформированного бара
+        :return: Пропуски в истории тикера
+        """
+        tf = Timeframe.parse(tf)  # Разбираем временной интервал на период и размер
+        present = self.to_seconds(bar_times)  # Секунды открытия имеющихся бар по времени биржи
+        if start is None:  # Если начальная дата и время не заданы
+            if present.size == 0:  # Если бар нет, то начало истории неизвестно
+                raise ValueError('Нет бар. Задайте начальную дату и время истории')
+            start = schedule._seconds_to_datetime(int(present.min()))  # Первый имеющийся бар
+        if end is None:  # Если конечная дата и время не заданы
+            end = schedule.trade_bar_open_datetime(schedule.market_datetime_now, tf)  # Текущий бар еще не сформирован
+        expected = schedule.bars_array(start, end, tf).astype(np.int64)  # Секунды открытия бар по сетке расписания
+        present = np.unique(present)  # Имеющиеся бары без повторов по возрастанию
+        in_range = present[(present >= schedule._datetime_to_seconds(start)) & (present < schedule._datetime_to_seconds(end))]  # Имеющиеся бары в проверяемом диапазоне
+        missing = np.setdiff1d(expected, in_range, assume_unique=True)  # Пропущенные бары
+        unexpected = np.setdiff1d(in_range, expected, assume_unique=True).size  # Бары диапазона вне сетки расписания. Например, сделки в неторговое время
+        missing_index = np.searchsorted(expected, missing)  # Номера пропущенных бар в сетке
+        windows = [BackfillWindow(schedule._seconds_to_datetime(int(expected[first])), schedule._seconds_to_datetime(int(expected[last])), int(last - first + 1), int(count))
+                   for first, last, count in self.windows(missing_index, self.page_limit)]
+        gaps = HistoryGaps(class_code, security_code, tf, expected.size, expected.size - missing.size, missing.astype('datetime64[s]'), unexpected, present.size - in_range.size, windows)
+        if missing_index.size:  # Если есть пропуски
+            runs = np.split(missing_index, np.flatnonzero(np.diff(missing_index) > 1) + 1)  # Идущие подряд пропущенные бары
+            gaps.gaps = len(runs)
+            gaps.longest_gap = max(run.size for run in runs)
+            logger.warning(gaps)
+        self.reports[(class_code, security_code, str(tf))] = gaps
+        return gaps
+
+    def stats(self) -> dict:
+        """Статистика пропусков по всем проверенным тикерам
+
+        :return: Статистика пропусков по (код режима торгов, код тикера, временной интервал)
+        """
+        return {key: gaps.stats() for key, gaps in self.reports.items()}
+
+    @staticmethod
+    def windows(missing_index, page_limit) -> list:
+        """Наименьшее кол-во окон запроса, покрывающих все пропущенные бары. Окно начинается с первого непокрытого пропущенного бара
+        и захватывает все пропущенные бары, пока кол-во бар сетки в нем не превышает ограничение. Имеющиеся бары внутри окна запрашиваются повторно
+
+        :param np.ndarray missing_index: Номера пропущенных бар в сетке по возрастанию
+        :param int page_limit: Максимальное кол-во бар в одном запросе истории
+        :return: Список окон: (номер первого бара, номер последнего бара, кол-во пропущенных бар)
+        """
+        windows = []
+        i = 0  # Первый непокрытый пропущенный бар
+        while i < missing_index.size:  # Пока есть непокрытые пропущенные бары
+            j = int(np.searchsorted(missing_index, missing_index[i] + page_limit, 'left'))  # Первый пропущенный бар, не помещающийся в окно
+            windows.append((int(missing_index[i]), int(missing_index[j - 1]), j - i))
+            i = j
+        return windows
+
+    @staticmethod
+    def to_seconds(bar_times) -> np.ndarray:
+        """Перевод дат и времени открытия бар в секунды по времени биржи
+
+        :param bar_times: Список datetime, массив datetime64 или кол-ва секунд int64, прошедших с 01.01.1970 00:00 по времени биржи
+        :return: Массив кол-ва секунд int64
+        """
+        values = np.asarray(bar_times)
+        if values.dtype == object:  # Если список datetime
+            values = values.astype('datetime64[s]')
+        if values.dtype.kind == 'M':  # Если массив дат и времени
+            return values.astype('datetime64[s]').astype(np.int64)
+        return values.astype(np.int64)
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    from MarketPy.Schedule import MOEXStocks
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%d.%m.%Y %H:%M:%S', level=logging.INFO)
+    schedule = MOEXStocks()  # Расписание фондового рынка Московской Биржи
+    start, end = datetime(2024, 1, 1), datetime(2024, 7, 1)  # Полгода истории
+    bars = schedule.bars_array(start, end, 'M1')  # Все бары по расписанию
+    rng = np.random.default_rng(0)
+    keep = np.ones(bars.size, dtype=bool)
+    for gap_start in rng.integers(0, bars.size, 50):  # Делаем 50 пропусков
+        keep[gap_start:gap_start + rng.integers(1, 2000)] = False  # от 1 до 2000 бар
+    checker = HistoryChecker(page_limit=5000)  # Ограничение провайдера на кол-во бар в ответе
+    gaps = checker.check('TQBR', 'SBER', schedule, 'M1', bars[keep], start, end)
+    for window in gaps.windows:  # Пробегаемся по всем окнам запроса
+        print(window)
+    print(checker.stats())
@@ -0,0 +1,193 @@
+from bisect import bisect_left  # Поиск корзины гистограммы
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+
+class Metrics:
+    """Счетчики и гистограммы получения бар по (код режима торгов, код тикера, временной интервал) одного провайдера.
+    Выдаются снимком в виде словаря и в текстовом формате Prometheus. Выключенные метрики ничего не учитывают"""
+    counters = {'requests': 'Запросы бар',
+                'bars': 'Полученные бары',
+                'empty': 'Пустые ответы (данные или бар не получены)',
+                'retries': 'Повторные запросы бар',
+                'missed': 'Бары, не полученные до крайнего срока',
+                'errors': 'Ошибки получения или обработки бар'}  # Счетчики: название -> описание
+    histograms = {'wake_lag': 'Опоздание запроса от запланированного времени в секундах',
+                  'round_trip': 'Время ответа провайдера в секундах',
+                  'bar_latency': 'Задержка получения бара от его закрытия в секундах'}  # Гистограммы: название -> описание
+    default_buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)  # Верхние границы корзин гистограмм в секундах
+
+    def __init__(self, provider='', enabled=True, buckets=default_buckets):
+        """
+        :param str provider: Название провайдера
+        :param bool enabled: Метрики включены
+        :param tuple buckets: Верхние границы корзин гистограмм в секундах по возрастанию
+        """
+        self.provider = provider  # Название провайдера
+        self.enabled = enabled  # Метрики включены
+        self.buckets = tuple(buckets)  # Верхние границы корзин гистограмм
+        self._series = {}  # Метрики по (код режима торгов, код тикера, временной интервал): [счетчики, гистограммы [кол-во по корзинам, сумма]]
+        self._counter_index = {name: i for i, name in enumerate(self.counters)}  # Номера счетчиков
+        self._histogram_index = {name: i for i, name in enumerate(self.histograms)}  # Номера гистограмм
+        self._lock = Lock()  # Метрики учитываются из разных потоков
+
+    def increment(self, subscription, name, value=1):
+        """Увеличение счетчика
+
+        :param Subscription subscription: Подписка
+        :param str name: Название счетчика из Metrics.counters
+        :param int value: Величина увеличения
+        """
+        if not self.enabled:  # Если метрики выключены
+            return  # то ничего не учитываем
+        with self._lock:
+            self._get_series(subscription)[0][self._counter_index[name]] += value
+
+    def observe(self, subscription, name, seconds):
+        """Учет значения в гистограмме
+
+        :param Subscription subscription: Подписка
+        :param str name: Название гистограммы из Metrics.histograms
+        :param float seconds: Значение в секундах
+        """
+        if not self.enabled:  # Если метрики выключены
+            return  # то ничего не учитываем
+        bucket = bisect_left(self.buckets, seconds)  # Номер корзины. Последняя корзина для значений больше всех границ
+        with self._lock:
+            histogram = self._get_series(subscription)[1][self._histogram_index[name]]
+            histogram[0][bucket] += 1
+            histogram[1] += seconds
+
+    def snapshot(self) -> dict:
+        """Снимок метрик
+
+        :return: Метрики по (код режима торгов, код тикера, временной интервал): счетчики и гистограммы {'count', 'sum', 'buckets': [(граница, кол-во не больше границы), ...]}
+        """
+        result = {}
+        with self._lock:
+            for key, (counters, histograms) in self._series.items():  # Пробегаемся по всем тикерам
+                values = dict(zip(self.counters, counters))
+                for name, (counts, total) in zip(self.histograms, histograms):  # Пробегаемся по всем гистограммам
+                    cumulative, buckets = 0, []
+                    for bound, count in zip(self.buckets + (float('inf'),), counts):  # Кол-во значений не больше каждой границы
+                        cumulative += count
+                        buckets.append((bound, cumulative))
+                    values[name] = {'count': cumulative, 'sum': total, 'buckets': buckets}
+                result[key] = values
+        return result
+
+    def to_prometheus(self) -> str:
+        """Метрики в текстовом формате Prometheus https://prometheus.io/docs/instrumenting/exposition_formats/
+
+        :return: Текст метрик
+        """
+        return prometheus_text((self,))
+
+    def _get_series(self, subscription) -> list:
+        """Метрики тикера. Создаются при первом учете. Вызывается под блокировкой.
+        Подписки не запоминаются: копии подписок и отмененные подписки не накапливаются
+
+        :param Subscription subscription: Подписка
+        :return: [счетчики, гистограммы]
+        """
+        key = (subscription.class_code, subscription.security_code, str(subscription.tf))
+        series = self._series.get(key)
+        if series is None:  # Если метрик тикера еще нет
+            series = self._series[key] = [[0] * len(self.counters), [[[0] * (len(self.buckets) + 1), 0.0] for _ in self.histograms]]
+        return series
+
+
+def prometheus_text(metrics_list) -> str:
+    """Метрики нескольких провайдеров в текстовом формате Prometheus
+
+    :param metrics_list: Метрики провайдеров
+    :return: Текст метрик
+    """
+    snapshots = [(metrics.provider, metrics.snapshot()) for metrics in metrics_list]
+    lines = []
+    for name, description in Metrics.counters.items():  # Пробегаемся по всем счетчикам
+        lines.append(f'# HELP marketpy_{name}_total {description}')
+        lines.append(f'# TYPE marketpy_{name}_total counter')
+        for provider, snapshot in snapshots:
+            for key, values in snapshot.items():
+                lines.append(f'marketpy_{name}_total{{{_labels(provider, key)}}} {values[name]}')
+    for name, description in Metrics.histograms.items():  # Пробегаемся по всем гистограммам
+        lines.append(f'# HELP marketpy_{name}_seconds {description}')
+        lines.append(f'# TYPE marketpy_{name}_seconds histogram')
+        for provider, snapshot in snapshots:
+            for key, values in snapshot.items():
+                labels = _labels(provider, key)
+                histogram = values[name]
+                for bound, count in histogram['buckets']:
+                    lines.append(f'marketpy_{name}_seconds_bucket{{{labels},le="{"+Inf" if bound == float("inf") else bound}"}} {count}')
+                lines.append(f'marketpy_{name}_seconds_sum{{{labels}}} {histogram["sum"]}')
+                lines.append(f'marketpy_{name}_seconds_count{{{labels}}} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(provider, key) -> str:
+    """Метки метрики Prometheus
+
+    :param str provider: Название провайдера
+    :param tuple key: (код режима торгов, код тикера, временной интервал)
+    :return: Метки через запятую
+    """
+    class_code, security_code, tf = (_escape(value) for value in key)
+    return f'provider="{_escape(provider)}",class_code="{class_code}",security_code="{security_code}",tf="{tf}"'
+
+
+def _escape(value) -> str:
+    """Экранирование значения метки Prometheus: обратная косая черта, кавычка и перевод строки
+
+    :param value: Значение метки
+    :return: Экранированное значение
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def serve(metrics_list, port=8000, host='127.0.0.1') -> ThreadingHTTPServer:
+    """Запуск сервера HTTP, выдающего метрики в текстовом формате Prometheus по адресу /metrics. Сервер работает в отдельном потоке
+
+    :param metrics_list: Метрики провайдеров
+    :param int port: Порт
+    :param str host: Адрес
+    :return: Сервер. Для остановки вызовите shutdown()
+    """
+    metrics_list = list(metrics_list)
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':  # Метрики выдаем только по одному адресу
+                self.send_error(404)
+                return
+            body = prometheus_text(metrics_list).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Запросы не логируем
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    Thread(name='metrics_http', target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    from timeit import timeit
+    from urllib.request import urlopen
+    from MarketPy.Schedule import MOEXStocks
+    from MarketPy.Dispatcher import Subscription
+
+    subscription = Subscription('TQBR', 'SBER', MOEXStocks(), 'M1', None)
+    for enabled in (False, True):  # Накладные расходы выключенных и включенных метрик
+        metrics = Metrics('test', enabled=enabled)
+        ns = timeit(lambda: metrics.observe(subscription, 'round_trip', 0.12), number=100_000) * 10_000  # Время одного учета в наносекундах
+        print(f'Учет значения в гистограмме, метрики {"включены" if enabled else "выключены"}: {ns:.0f} нс')
+    metrics.increment(subscription, 'requests')
+    server = serve([metrics], port=0)  # Свободный порт
+    with urlopen(f'http://127.0.0.1:{server.server_address[1]}/metrics') as response:
+        print(response.read().decode('utf-8')[:600])
+    server.shutdown()
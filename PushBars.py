@@ -0,0 +1,317 @@
+import logging
+from collections import deque  # Очереди выдачи бар подписок
+from copy import copy  # Копия подписки для запроса сторожем
+from concurrent.futures import ThreadPoolExecutor  # Пул потоков запросов бар сторожем
+from datetime import timedelta
+from heapq import heappush, heappop  # Очередь проверок по дате и времени
+from itertools import count  # Порядковые номера проверок
+from threading import Thread, Event, Lock
+
+from MarketPy.Schedule import Schedule, Timeframe
+from MarketPy.Clock import SystemClock
+from MarketPy.Readiness import FixedDelay
+from MarketPy.Metrics import Metrics
+from MarketPy.Dispatcher import Subscription
+
+
+logger = logging.getLogger('Schedule.PushBars')  # Будем вести лог
+
+
+class PendingBar:
+    """Бар, сформированный, но еще не выданный. Бары подписки выдаются строго по порядку, поэтому бар ждет, пока не будут выданы все бары до него"""
+    __slots__ = ('request', 'bar', 'done', 'requested')
+
+    def __init__(self, request, bar=None, done=False):
+        """
+        :param Subscription request: Копия подписки с датой и временем открытия бара
+        :param Bar bar: Бар. None, если бар еще не получен сторожем или не получен вовсе
+        :param bool done: Бар сформирован обновлением или запрос сторожем завершен
+        """
+        self.request = request  # Копия подписки с датой и временем открытия бара
+        self.bar = bar  # Бар
+        self.done = done  # Бар можно выдавать
+        self.requested = False  # Бар уже запрашивается сторожем
+
+
+class PushState:
+    """Состояние подписки на обновления бар: текущий бар, его последнее обновление и очередь выдачи сформированных бар"""
+    __slots__ = ('trade_bar_open_datetime', 'close_timestamp', 'bar', 'pending', 'delivering')
+
+    def __init__(self):
+        self.trade_bar_open_datetime = None  # Дата и время открытия текущего бара
+        self.close_timestamp = None  # Дата и время закрытия текущего бара в timestamp UTC
+        self.bar = None  # Последнее обновление текущего бара. None, если обновлений не было
+        self.pending = deque()  # Очередь выдачи сформированных бар по порядку
+        self.delivering = False  # Бары выдаются одним из потоков
+
+
+class PushBars:
+    """Получение новых бар из потока обновлений провайдера (WebSocket, gRPC stream). Провайдер присылает обновления несформированного бара,
+    а расписание только решает, когда бар сформирован: при обновлении следующего бара или по закрытию бара trade_bar_close_datetime.
+    Если к закрытию обновлений бара не было (поток обновлений остановился), то сторож запрашивает бар у провайдера, как в примерах Examples.
+    Каждый бар формирует кто-то один: обновления или сторож. Поздние обновления бара, запрошенного сторожем, пропускаются.
+    Бары подписки выдаются по порядку, даже если запросы сторожа завершаются в другом порядке"""
+    def __init__(self, grace=timedelta(milliseconds=200), readiness=None, metrics=None, clock=None, max_workers=4):
+        """
+        :param timedelta grace: Ожидание опоздавших обновлений после закрытия бара
+        :param FixedDelay readiness: Политика задержки запроса бара сторожем. По умолчанию постоянная задержка Schedule.delta
+        :param Metrics metrics: Метрики получения бар. По умолчанию выключены
+        :param SystemClock clock: Часы. По умолчанию системные
+        :param int max_workers: Максимальное кол-во потоков запросов бар сторожем
+        """
+        self.grace = grace.total_seconds()  # Ожидание опоздавших обновлений в секундах
+        self.readiness = readiness or FixedDelay()  # Политика задержки запроса бара
+        self.metrics = metrics or Metrics(enabled=False)  # Метрики получения бар
+        self.clock = clock or SystemClock()  # Часы
+        self.last_update = None  # Дата и время последнего обновления в timestamp UTC
+        self._states = {}  # Состояния подписок
+        self._heap = []  # Очередь проверок: (дата и время в timestamp UTC, номер, подписка, дата и время открытия бара, бар для запроса сторожем или None)
+        self._numbers = count()  # Номера проверок, чтобы не сравнивать подписки
+        self._lock = Lock()  # Обновления приходят из потока провайдера, проверки идут в своем потоке
+        self._wakeup = Event()  # Очередь проверок изменилась или выход
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='push_poll')  # Пул потоков запросов бар сторожем
+        self._thread = Thread(name='push_bars', target=self._run, daemon=True)  # Поток проверок
+        self._closed = False  # Получение бар закрыто
+
+    def subscribe(self, class_code, security_code, schedule, tf, fetch, callback=None) -> Subscription:
+        """Подписка на новые бары тикера. Подписку на обновления у провайдера нужно оформить отдельно и передавать их в on_update
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param Schedule schedule: Расписание торгов
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param fetch: Функция запроса бара сторожем fetch(subscription). Возвращает бар или None, если бар не получен
+        :param callback: Функция обработки сформированного бара callback(subscription, bar)
+        :return: Подписка
+        """
+        subscription = Subscription(class_code, security_code, schedule, Timeframe.parse(tf), fetch, callback)
+        market_datetime_now = schedule.utc_timestamp_to_msk_datetime(self.clock.time())  # Текущее время на бирже
+        with self._lock:
+            if self._closed:  # Если получение бар закрыто
+                raise RuntimeError('Получение бар закрыто')
+            self._states[subscription] = PushState()
+            self._track(subscription, self._next_bar(subscription, schedule.trade_bar_open_datetime(market_datetime_now, subscription.tf), market_datetime_now))
+        self._wakeup.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Отмена подписки
+
+        :param Subscription subscription: Подписка
+        """
+        with self._lock:
+            subscription.active = False
+            self._states.pop(subscription, None)
+
+    def on_update(self, subscription, bar):
+        """Обновление бара из потока провайдера. Обновление следующего бара сразу формирует текущий бар
+
+        :param Subscription subscription: Подписка
+        :param Bar bar: Несформированный бар. Дата и время открытия на бирже
+        """
+        requests = []  # Запросы сторожем бар, сформированных без обновлений
+        with self._lock:
+            self.last_update = self.clock.time()
+            state = self._states.get(subscription)
+            if state is None:  # Если подписки нет
+                return
+            if bar.dt < state.trade_bar_open_datetime:  # Если обновление уже сформированного бара. Бар выдан или его запрашивает сторож
+                logger.debug(f'{subscription}: обновление сформированного бара {bar.dt:%d.%m.%Y %H:%M:%S} пропущено')
+                return
+            final = bar.dt > state.trade_bar_open_datetime  # Пришло обновление следующего бара
+            if final:  # Если текущий бар сформирован
+                requests = [pending for pending in state.pending if not pending.done and not pending.requested]  # Поток обновлений восстановился. Бары, которые ждут сторожа, запрашиваем сразу
+                pending = self._finalize(subscription, state, state.bar)
+                if not pending.done:  # Если обновлений текущего бара не было
+                    requests.append(pending)  # то запрашиваем его сразу
+                schedule = subscription.schedule
+                for trade_bar_open_datetime in schedule.iter_bars(subscription.trade_bar_close_datetime, bar.dt, subscription.tf):  # Бары между текущим и обновленным тоже прошли без обновлений
+                    request = copy(subscription)  # Запрашиваем и их
+                    request.trade_bar_open_datetime = trade_bar_open_datetime
+                    request.trade_bar_close_datetime = schedule.trade_bar_close_datetime(trade_bar_open_datetime, subscription.tf)
+                    pending = PendingBar(request)
+                    state.pending.append(pending)
+                    requests.append(pending)
+                for pending in requests:  # Сторож эти бары повторно не запросит
+                    pending.requested = True
+                self._track(subscription, bar.dt)  # Переходим на следующий бар
+            state.bar = bar  # Запоминаем последнее обновление
+        for pending in requests:  # Пробегаемся по всем барам, которые нужно запросить
+            self._executor.submit(self._poll, subscription, pending)
+        if final:  # Если бар сформирован
+            self._drain(subscription, state)
+
+    def start(self):
+        """Запуск потока проверок"""
+        self._thread.start()
+
+    def close(self, wait=True):
+        """Закрытие: остановка потока проверок и пула потоков запросов бар
+
+        :param bool wait: Ждать завершения запущенных запросов бар
+        """
+        with self._lock:
+            self._closed = True
+        self._wakeup.set()  # Будим поток проверок, чтобы он вышел
+        if self._thread.is_alive():  # Если поток проверок запускался
+            self._thread.join()  # то ждем его завершения
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _next_bar(self, subscription, trade_bar_open_datetime, dt_market):
+        """Первый бар по расписанию, закрывающийся после заданной даты и времени. В перерывах - первый бар следующей сессии
+
+        :param Subscription subscription: Подписка
+        :param datetime trade_bar_open_datetime: Дата и время открытия бара
+        :param datetime dt_market: Дата и время на бирже
+        :return: Дата и время открытия бара
+        """
+        schedule = subscription.schedule
+        if schedule.trade_bar_close_datetime(trade_bar_open_datetime, subscription.tf) > dt_market:  # Если бар еще не закрылся
+            return trade_bar_open_datetime  # то будем получать его
+        dt_close = schedule.trade_bar_close_datetime(trade_bar_open_datetime, subscription.tf)  # Закрытие бара
+        return next(schedule.iter_bars(dt_close, dt_close + timedelta(days=31), subscription.tf))  # Первый бар после закрытия. Месяц покрывает любые праздники
+
+    def _track(self, subscription, trade_bar_open_datetime):
+        """Переход подписки на бар и постановка проверки его закрытия в очередь. Вызывается под блокировкой
+
+        :param Subscription subscription: Подписка
+        :param datetime trade_bar_open_datetime: Дата и время открытия бара
+        """
+        state = self._states[subscription]
+        schedule = subscription.schedule
+        state.trade_bar_open_datetime = trade_bar_open_datetime
+        state.bar = None
+        subscription.trade_bar_open_datetime = trade_bar_open_datetime  # Дата и время открытия бара
+        subscription.trade_bar_close_datetime = schedule.trade_bar_close_datetime(trade_bar_open_datetime, subscription.tf)  # Дата и время закрытия бара. Бар сформирован
+        subscription.trade_bar_ready_datetime = subscription.trade_bar_close_datetime
+        subscription.ready_timestamp = state.close_timestamp = schedule.msk_datetime_to_utc_timestamp(subscription.trade_bar_close_datetime)
+        subscription.attempt = 0
+        heappush(self._heap, (state.close_timestamp + self.grace, next(self._numbers), subscription, trade_bar_open_datetime, None))
+        self._wakeup.set()
+
+    def _finalize(self, subscription, state, bar) -> PendingBar:
+        """Текущий бар сформирован. Постановка его в очередь выдачи. Вызывается под блокировкой до перехода на следующий бар
+
+        :param Subscription subscription: Подписка
+        :param PushState state: Состояние подписки
+        :param Bar bar: Бар. None, если бар запрашивает сторож
+        :return: Бар в очереди выдачи
+        """
+        pending = PendingBar(copy(subscription), bar, bar is not None)  # Копия подписки запоминает бар
+        state.pending.append(pending)
+        return pending
+
+    def _run(self):
+        """Поток проверок: формирование бар по закрытию и запуск запросов сторожем"""
+        while True:
+            with self._lock:
+                if self._closed:  # Если получение бар закрыто
+                    return
+                self._wakeup.clear()
+                requests, finals, timeout = [], {}, None  # Запросы сторожем. Подписки со сформированными барами. Время до следующей проверки
+                now = self.clock.time()
+                while self._heap:  # Пока есть проверки
+                    if self._heap[0][0] > now:  # Если время проверки еще не наступило
+                        timeout = self._heap[0][0] - now
+                        break
+                    _, _, subscription, trade_bar_open_datetime, pending = heappop(self._heap)
+                    state = self._states.get(subscription)
+                    if state is None:  # Если подписка отменена
+                        continue
+                    if pending is not None:  # Если наступило время запроса сторожем
+                        if not pending.requested:  # и бар еще не запрошен при восстановлении потока обновлений
+                            pending.requested = True
+                            requests.append((subscription, pending))
+                        continue
+                    if state.trade_bar_open_datetime != trade_bar_open_datetime:  # Если бар уже сформирован обновлением следующего бара
+                        continue
+                    delay = self.readiness.delay(subscription).total_seconds()  # Задержка запроса бара
+                    stalled = self.last_update is None or now - self.last_update > delay  # Обновления не приходят ни по одной подписке
+                    next_bar = self._next_bar(subscription, trade_bar_open_datetime, subscription.trade_bar_close_datetime)  # Следующий бар
+                    if state.bar is not None and not stalled:  # Если обновления бара были, и поток обновлений работает
+                        self._finalize(subscription, state, state.bar)  # то бар сформирован по закрытию
+                        finals[subscription] = state
+                    else:  # Обновлений не было, или бар мог сформироваться без них. Бар формирует сторож
+                        pending = self._finalize(subscription, state, None)
+                        heappush(self._heap, (state.close_timestamp + delay, next(self._numbers), subscription, trade_bar_open_datetime, pending))
+                        if stalled:  # Если поток обновлений остановлен
+                            logger.warning(f'{subscription}: поток обновлений остановлен. Бар {trade_bar_open_datetime:%d.%m.%Y %H:%M:%S} будет запрошен')
+                        else:
+                            logger.debug(f'{subscription}: обновлений бара {trade_bar_open_datetime:%d.%m.%Y %H:%M:%S} нет. Бар будет запрошен')
+                    self._track(subscription, next_bar)  # Поздние обновления бара пропускаются
+            for subscription, pending in requests:  # Пробегаемся по всем наступившим запросам
+                self._executor.submit(self._poll, subscription, pending)
+            for subscription, state in finals.items():  # Пробегаемся по всем подпискам со сформированными барами
+                self._drain(subscription, state)
+            self.clock.wait(self._wakeup, 3600 if timeout is None else timeout)  # Ждем следующей проверки, изменения очереди или выхода
+
+    def _poll(self, subscription, pending):
+        """Запрос бара сторожем в пуле потоков
+
+        :param Subscription subscription: Подписка
+        :param PendingBar pending: Бар в очереди выдачи
+        """
+        trade_bar_open_datetime = pending.request.trade_bar_open_datetime  # Запрашиваемый бар
+        bar = None
+        try:
+            self.metrics.increment(subscription, 'requests')
+            started = self.clock.time()
+            bar = subscription.fetch(pending.request)  # Запрашиваем бар
+            self.metrics.observe(subscription, 'round_trip', self.clock.time() - started)
+        except Exception:  # Ошибка запроса не должна останавливать подписку
+            self.metrics.increment(subscription, 'errors')
+            logger.exception(f'{subscription}: ошибка запроса бара {trade_bar_open_datetime:%d.%m.%Y %H:%M:%S}')
+        if bar is None:  # Если бар не получен
+            self.metrics.increment(subscription, 'missed')
+            logger.warning(f'{subscription}: бар {trade_bar_open_datetime:%d.%m.%Y %H:%M:%S} не получен')
+        with self._lock:
+            pending.bar, pending.done = bar, True  # Бар можно выдавать
+            state = self._states.get(subscription)
+        if state is not None:  # Если подписка не отменена
+            self._drain(subscription, state)
+
+    def _drain(self, subscription, state):
+        """Выдача сформированных бар подписки по порядку. Бары выдает один поток, остальные только ставят их в очередь
+
+        :param Subscription subscription: Подписка
+        :param PushState state: Состояние подписки
+        """
+        with self._lock:
+            if state.delivering:  # Если бары уже выдает другой поток
+                return  # то он выдаст и наши
+            state.delivering = True
+        while True:
+            with self._lock:
+                bars = []  # Бары, готовые к выдаче
+                while state.pending and state.pending[0].done:  # Пока первый бар в очереди готов
+                    bar = state.pending.popleft().bar
+                    if bar is not None:  # Бар, не полученный сторожем, пропускаем
+                        bars.append(bar)
+                if not bars:  # Если выдавать нечего
+                    state.delivering = False
+                    return
+            for bar in bars:  # Пробегаемся по всем готовым барам
+                self._deliver(subscription, bar)
+
+    def _deliver(self, subscription, bar):
+        """Выдача сформированного бара
+
+        :param Subscription subscription: Подписка
+        :param Bar bar: Сформированный бар
+        """
+        closed = subscription.schedule.msk_datetime_to_utc_timestamp(subscription.schedule.trade_bar_close_datetime(bar.dt, subscription.tf))  # Закрытие бара в timestamp UTC
+        self.metrics.increment(subscription, 'bars')
+        self.metrics.observe(subscription, 'bar_latency', self.clock.time() - closed)
+        if subscription.callback:  # Если задана функция обработки
+            try:
+                subscription.callback(subscription, bar)
+            except Exception:  # Ошибка обработки не должна останавливать подписку
+                self.metrics.increment(subscription, 'errors')
+                logger.exception(f'{subscription}: ошибка обработки бара {bar.dt:%d.%m.%Y %H:%M:%S}')
@@ -0,0 +1,120 @@
+from typing import Union  # Объединение типов
+from collections import deque  # Окно последних задержек получения бар
+from datetime import timedelta
+from threading import Lock
+
+
+class FixedDelay:
+    """Постоянная задержка запроса бара Schedule.delta без повторных запросов. Политика по умолчанию"""
+    def delay(self, subscription) -> timedelta:
+        """Задержка первого запроса бара после его закрытия
+
+        :param Subscription subscription: Подписка
+        :return: Задержка запроса
+        """
+        return subscription.schedule.delta  # Допустимая разница рассинхронизации часов из расписания
+
+    def retry_delay(self, subscription, attempt, elapsed) -> Union[timedelta, None]:
+        """Задержка повторного запроса бара, если бар не получен
+
+        :param Subscription subscription: Подписка
+        :param int attempt: Номер повторного запроса, начиная с 1
+        :param timedelta elapsed: Прошло времени от закрытия бара
+        :return: Задержка от предыдущего запроса. None, если больше не запрашиваем
+        """
+        return None  # Повторно не запрашиваем, бар пропускаем
+
+    def observe(self, subscription, latency):
+        """Учет задержки получения бара
+
+        :param Subscription subscription: Подписка
+        :param timedelta latency: Задержка от закрытия бара до его получения
+        """
+        pass
+
+
+class AdaptiveDelay(FixedDelay):
+    """Задержка запроса бара по квантилю наблюдаемых задержек получения бар для каждого временнОго интервала.
+    Если бар не получен, то он запрашивается повторно с увеличивающейся задержкой до крайнего срока.
+    Задержки у разных провайдеров разные, поэтому на каждого провайдера заводится своя политика"""
+    def __init__(self, quantile=0.9, window=100, min_delay=timedelta(milliseconds=200), max_delay=timedelta(seconds=10),
+                 retry_first=timedelta(milliseconds=250), retry_backoff=2.0, retry_max=timedelta(seconds=5), deadline=timedelta(seconds=60), probe=0.9):
+        """
+        :param float quantile: Квантиль задержек получения бар, после которого делается первый запрос
+        :param int window: Кол-во последних задержек, по которым считается квантиль
+        :param timedelta min_delay: Минимальная задержка первого запроса
+        :param timedelta max_delay: Максимальная задержка первого запроса
+        :param timedelta retry_first: Задержка первого повторного запроса
+        :param float retry_backoff: Множитель задержки каждого следующего повторного запроса
+        :param timedelta retry_max: Максимальная задержка повторного запроса
+        :param timedelta deadline: Крайний срок получения бара от его закрытия. После него бар больше не запрашиваем
+        :param float probe: Множитель задержки, если бар получен с первого запроса. Задержка постепенно уменьшается, пока бары не перестанут приходить с первого запроса
+        """
+        self.quantile = quantile
+        self.window = window
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.retry_first = retry_first
+        self.retry_backoff = retry_backoff
+        self.retry_max = retry_max
+        self.deadline = deadline
+        self.probe = probe
+        self._latencies = {}  # Последние задержки получения бар в секундах по временнЫм интервалам
+        self._delays = {}  # Рассчитанные задержки первого запроса по временнЫм интервалам
+        self._lock = Lock()  # Задержки учитываются из разных потоков
+
+    def delay(self, subscription) -> timedelta:
+        delay = self._delays.get(str(subscription.tf))  # Рассчитанная задержка первого запроса. Временной интервал строкой, т.к. в подписках он бывает и строкой, и Timeframe
+        return subscription.schedule.delta if delay is None else delay  # Пока задержек нет, используем задержку из расписания
+
+    def retry_delay(self, subscription, attempt, elapsed) -> Union[timedelta, None]:
+        retry = min(self.retry_first * self.retry_backoff ** (attempt - 1), self.retry_max)  # Задержка повторного запроса с увеличением
+        return retry if elapsed + retry <= self.deadline else None  # Запрашиваем повторно, пока не наступил крайний срок
+
+    def observe(self, subscription, latency):
+        if subscription.attempt == 0:  # Если бар получен с первого запроса, то он мог быть готов и раньше
+            latency *= self.probe  # Пробуем запрашивать раньше
+        tf = str(subscription.tf)  # Временной интервал строкой
+        with self._lock:
+            latencies = self._latencies.get(tf)
+            if latencies is None:  # Если задержек по временнОму интервалу еще нет
+                latencies = self._latencies[tf] = deque(maxlen=self.window)
+            latencies.append(latency.total_seconds())
+            self._update_delay(tf, latencies)
+
+    def delays(self) -> dict:
+        """Рассчитанные задержки первого запроса
+
+        :return: Задержки первого запроса по временнЫм интервалам
+        """
+        return dict(self._delays)
+
+    def state(self) -> dict:
+        """Наблюдаемые задержки для сохранения между запусками
+
+        :return: Последние задержки получения бар в секундах по временнЫм интервалам
+        """
+        with self._lock:
+            return {tf: list(latencies) for tf, latencies in self._latencies.items()}
+
+    def load_state(self, state):
+        """Восстановление наблюдаемых задержек, сохраненных state()
+
+        :param dict state: Последние задержки получения бар в секундах по временнЫм интервалам
+        """
+        with self._lock:
+            for tf, latencies in state.items():  # Пробегаемся по всем временнЫм интервалам
+                tf = str(tf)  # Временной интервал строкой
+                self._latencies[tf] = deque(latencies, maxlen=self.window)
+                if latencies:  # Если задержки есть
+                    self._update_delay(tf, self._latencies[tf])  # то рассчитываем задержку первого запроса
+
+    def _update_delay(self, tf, latencies):
+        """Расчет задержки первого запроса по квантилю задержек. Вызывается под блокировкой
+
+        :param str|Timeframe tf: Временной интервал
+        :param deque latencies: Последние задержки получения бар в секундах
+        """
+        values = sorted(latencies)  # Задержки по возрастанию
+        delay = timedelta(seconds=values[int(self.quantile * (len(values) - 1))])  # Квантиль задержек
+        self._delays[str(tf)] = min(max(delay, self.min_delay), self.max_delay)
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+from threading import Event
+from time import perf_counter
+
+from MarketPy.Schedule import Schedule
+from MarketPy.Clock import SystemClock, VirtualClock, AcceleratedClock
+
+
+class ReplayRequest:
+    """Запрос бара при воспроизведении расписания"""
+    __slots__ = ('trade_bar_open_datetime', 'planned', 'actual', 'lag', 'bar')
+
+    def __init__(self, trade_bar_open_datetime, planned, actual, bar):
+        """
+        :param datetime trade_bar_open_datetime: Дата и время открытия запрошенного бара на бирже
+        :param datetime planned: Запланированные дата и время запроса на бирже
+        :param datetime actual: Дата и время запроса на бирже по часам расписания после ожидания
+        :param bar: Полученный бар. None, если бар не получен
+        """
+        self.trade_bar_open_datetime = trade_bar_open_datetime  # Дата и время открытия бара
+        self.planned = planned  # Запланированные дата и время запроса
+        self.actual = actual  # Дата и время запроса после ожидания
+        self.lag = actual - planned  # Опоздание запроса
+        self.bar = bar  # Полученный бар
+
+    def __repr__(self):
+        return f'{self.trade_bar_open_datetime:%d.%m.%Y %H:%M:%S} запрос {self.planned:%d.%m.%Y %H:%M:%S} опоздание {self.lag.total_seconds():.3f} с'
+
+
+class ReplayReport:
+    """Результат воспроизведения расписания: все запросы бар, их опоздания и скорость воспроизведения"""
+    def __init__(self, tf, requests, wall_seconds):
+        """
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param list[ReplayRequest] requests: Запросы бар
+        :param float wall_seconds: Реальное время воспроизведения в секундах
+        """
+        self.tf = tf  # Временной интервал
+        self.requests = requests  # Запросы бар
+        self.wall_seconds = wall_seconds  # Реальное время воспроизведения
+
+    @property
+    def max_lag(self) -> timedelta:
+        """Наибольшее опоздание запроса"""
+        return max((request.lag for request in self.requests), default=timedelta())
+
+    @property
+    def mean_lag(self) -> timedelta:
+        """Среднее опоздание запроса"""
+        return sum((request.lag for request in self.requests), timedelta()) / len(self.requests) if self.requests else timedelta()
+
+    @property
+    def throughput(self) -> float:
+        """Кол-во запросов в секунду реального времени"""
+        return len(self.requests) / self.wall_seconds if self.wall_seconds else float('inf')
+
+    def missed(self, schedule, start, end) -> list:
+        """Бары расписания, которые не были запрошены
+
+        :param Schedule schedule: Расписание торгов
+        :param datetime start: Начальная дата и время на бирже
+        :param datetime end: Конечная дата и время на бирже
+        :return: Даты и время открытия не запрошенных бар
+        """
+        requested = {request.trade_bar_open_datetime for request in self.requests}
+        return [dt for dt in schedule.iter_bars(start, end, self.tf) if dt not in requested]
+
+    def __repr__(self):
+        return (f'{self.tf}: {len(self.requests)} запросов за {self.wall_seconds:.3f} с ({self.throughput:.0f} в секунду), '
+                f'опоздание среднее {self.mean_lag.total_seconds():.3f} с, наибольшее {self.max_lag.total_seconds():.3f} с')
+
+
+def replay(schedule, tf, end, fetch=None) -> ReplayReport:
+    """Воспроизведение цикла получения бар из примеров Examples по часам расписания до конечной даты и времени.
+    С виртуальными часами месяц расписания воспроизводится за доли секунды, с ускоренными - в реальном времени, деленном на ускорение
+
+    :param Schedule schedule: Расписание торгов с виртуальными или ускоренными часами
+    :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+    :param datetime end: Конечная дата и время на бирже. Бары, открывающиеся с нее, не запрашиваются
+    :param fetch: Функция получения бара fetch(trade_bar_open_datetime) от провайдера. Возвращает бар или None, если бар не получен
+    :return: Результат воспроизведения
+    """
+    exit_event = Event()  # Событие выхода. При воспроизведении не наступает
+    requests = []  # Запросы бар
+    start = perf_counter()
+    while True:
+        market_datetime_now = schedule.utc_timestamp_to_msk_datetime(schedule.clock.time())  # Текущее время на бирже по часам расписания
+        trade_bar_open_datetime = schedule.trade_bar_open_datetime(market_datetime_now, tf)  # Дата и время открытия бара, который будем получать
+        trade_bar_request_datetime = schedule.trade_bar_request_datetime(market_datetime_now, tf)  # Дата и время запроса бара на бирже
+        if trade_bar_open_datetime >= end:  # Если бар открывается после конечной даты и времени
+            break  # то воспроизведение закончено
+        sleep_time_secs = schedule.msk_datetime_to_utc_timestamp(trade_bar_request_datetime) - schedule.clock.time()  # Время ожидания в секундах по UTC. Разница времени на бирже неверна при переходе на летнее/зимнее время
+        schedule.clock.wait(exit_event, sleep_time_secs)  # Ждем по часам расписания
+        actual = schedule.utc_timestamp_to_msk_datetime(schedule.clock.time())  # Время запроса после ожидания
+        bar = fetch(trade_bar_open_datetime) if fetch else None  # Получаем бар
+        requests.append(ReplayRequest(trade_bar_open_datetime, trade_bar_request_datetime, actual, bar))
+    return ReplayReport(tf, requests, perf_counter() - start)
+
+
+class FakeProvider:
+    """Провайдер без обращения к серверу. Возвращает бар с заданной задержкой ответа по часам расписания"""
+    def __init__(self, clock, latency=0.0):
+        """
+        :param SystemClock clock: Часы расписания
+        :param float latency: Задержка ответа в секундах. Для виртуальных часов часы переводятся вперед
+        """
+        self.clock = clock  # Часы расписания
+        self.latency = latency  # Задержка ответа
+        self.requests = 0  # Кол-во запросов
+
+    def fetch(self, trade_bar_open_datetime) -> dict:
+        """Получение бара
+
+        :param datetime trade_bar_open_datetime: Дата и время открытия бара на бирже
+        :return: Бар
+        """
+        self.requests += 1
+        if isinstance(self.clock, VirtualClock):  # Если часы виртуальные
+            self.clock.advance(self.latency)  # то задержка ответа переводит их вперед
+        return {'time': trade_bar_open_datetime, 'open': 100.0, 'high': 101.0, 'low': 99.0, 'close': 100.5, 'volume': 1000}
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    from datetime import date
+    from MarketPy.Schedule import MOEXStocks, Calendar
+
+    calendar = Calendar(holidays=[date(2011, 3, 7), date(2011, 3, 8)])  # Праздничные дни марта 2011 года. 27.03.2011 переход на летнее время
+    start, end = datetime(2011, 3, 1), datetime(2011, 4, 1)  # Месяц расписания
+    for tf in ('M1', 'M15', 'H1', 'D1'):  # Пробегаемся по временнЫм интервалам
+        clock = VirtualClock()  # Виртуальные часы
+        schedule = MOEXStocks(calendar, clock)  # Расписание с виртуальными часами
+        clock.advance(schedule.msk_datetime_to_utc_timestamp(start))  # Начинаем воспроизведение с начальной даты и времени
+        provider = FakeProvider(clock, latency=0.05)  # Провайдер с задержкой ответа 50 мс
+        report = replay(schedule, tf, end, provider.fetch)
+        print(report, f'не запрошено бар: {len(report.missed(schedule, start, end))}')
+
+    start = datetime(2025, 3, 17, 10)  # Понедельник
+    schedule = MOEXStocks(clock=AcceleratedClock(schedule.msk_datetime_to_utc_timestamp(start), speed=600))  # Час за 6 секунд
+    report = replay(schedule, 'M1', start + timedelta(hours=1))
+    print(f'Ускоренные часы: {report}')
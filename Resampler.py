@@ -0,0 +1,173 @@
+from datetime import datetime
+
+import numpy as np  # Векторная группировка минутных бар
+
+from MarketPy.Schedule import Schedule, Timeframe
+from MarketPy.BarStore import BarStore
+
+
+def last_bar_flags(schedule, seconds, tf):
+    """Бары старшего временнОго интервала, в которые попадают минутные бары, и признак последнего минутного бара в баре старшего интервала.
+    Минутный бар последний, если следующий по расписанию минутный бар попадает в другой бар старшего интервала
+
+    :param Schedule schedule: Расписание торгов
+    :param np.ndarray seconds: Секунды открытия минутных бар int64 по возрастанию, прошедшие с 01.01.1970 00:00 по времени биржи
+    :param str|Timeframe tf: Старший временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+    :return: Секунды открытия бар старшего интервала int64, признаки последнего минутного бара
+    """
+    keys = schedule.trade_bar_open_datetime_array(seconds, tf)  # Бары старшего интервала по правилам расписания
+    if seconds.size == 0:  # Если бар нет
+        return keys, np.zeros(0, dtype=bool)
+    first, last = int(seconds[0]), int(seconds[-1])  # Первый и последний минутные бары
+    next_after_last = Schedule._datetime_to_seconds(schedule.trade_bar_ready_datetime(Schedule._seconds_to_datetime(last), 'M1'))  # Следующий по расписанию минутный бар после последнего
+    grid = np.append(schedule.bars_array(Schedule._seconds_to_datetime(first), Schedule._seconds_to_datetime(last + 1), 'M1').astype(np.int64), next_after_last)  # Минутные бары по расписанию
+    next_seconds = grid[np.searchsorted(grid, seconds, 'right')]  # Следующие по расписанию минутные бары
+    return keys, keys != schedule.trade_bar_open_datetime_array(next_seconds, tf)
+
+
+def resample(schedule, bars, tf, include_partial=False) -> np.ndarray:
+    """Пакетное построение бар старшего временнОго интервала из минутных бар
+
+    :param Schedule schedule: Расписание торгов
+    :param np.ndarray bars: Минутные бары BarStore.dtype по возрастанию даты и времени открытия
+    :param str|Timeframe tf: Старший временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+    :param bool include_partial: Добавлять последний бар, если в нем получены не все минутные бары
+    :return: Бары старшего временнОго интервала BarStore.dtype
+    """
+    bars = np.asarray(bars, dtype=BarStore.dtype)
+    keys, is_last = last_bar_flags(schedule, bars['time'], tf)  # Бары старшего интервала и признаки последнего минутного бара
+    if bars.size == 0:  # Если минутных бар нет
+        return np.empty(0, dtype=BarStore.dtype)
+    starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])  # Первые минутные бары каждого бара старшего интервала
+    ends = np.r_[starts[1:], bars.size] - 1  # Последние минутные бары
+    result = np.empty(starts.size, dtype=BarStore.dtype)
+    result['time'] = keys[starts]
+    result['open'] = bars['open'][starts]
+    result['high'] = np.maximum.reduceat(bars['high'], starts)
+    result['low'] = np.minimum.reduceat(bars['low'], starts)
+    result['close'] = bars['close'][ends]
+    result['volume'] = np.add.reduceat(bars['volume'], starts)
+    if not include_partial and not is_last[-1]:  # Если в последнем баре получены не все минутные бары
+        result = result[:-1]  # то он еще не сформирован
+    return result
+
+
+class Resampler:
+    """Построение бар старших временнЫх интервалов из минутных бар по мере их получения. Каждый минутный бар обрабатывается за постоянное время.
+    Бар старшего интервала выдается сразу после получения его последнего по расписанию минутного бара или первого минутного бара следующего бара.
+    Результат совпадает с пакетным построением resample"""
+    def __init__(self, schedule, tfs):
+        """
+        :param Schedule schedule: Расписание торгов
+        :param tfs: Старшие временнЫе интервалы https://ru.wikipedia.org/wiki/Таймфрейм
+        """
+        self.schedule = schedule  # Расписание торгов
+        self.tfs = [Timeframe.parse(tf) for tf in tfs]  # Старшие временнЫе интервалы
+        self._bars = [None] * len(self.tfs)  # Формируемые бары: [секунды открытия, open, high, low, close, volume]
+        self._last_seconds = None  # Секунды открытия последнего минутного бара
+        self._day = None  # День таблицы минутных бар
+        self._table = {}  # Минутные бары дня по расписанию: секунды открытия -> бары старших интервалов и признаки последнего минутного бара
+
+    def add(self, dt, open_, high, low, close, volume) -> list:
+        """Добавление минутного бара
+
+        :param datetime dt: Дата и время открытия минутного бара на бирже
+        :param float open_: Цена открытия
+        :param float high: Максимальная цена
+        :param float low: Минимальная цена
+        :param float close: Цена закрытия
+        :param int volume: Объем в штуках
+        :return: Сформированные бары: список (временной интервал, (дата и время открытия, open, high, low, close, volume))
+        """
+        seconds = Schedule._datetime_to_seconds(dt)  # Секунды открытия минутного бара
+        if self._last_seconds is not None and seconds <= self._last_seconds:  # Если минутный бар уже был
+            return []  # то пропускаем его
+        self._last_seconds = seconds
+        flags = self._flags(seconds)  # Бары старших интервалов и признаки последнего минутного бара
+        completed = []  # Сформированные бары
+        for i, tf in enumerate(self.tfs):  # Пробегаемся по всем старшим интервалам
+            key, is_last = flags[i]
+            bar = self._bars[i]  # Формируемый бар
+            if bar is not None and bar[0] != key:  # Если минутный бар попал в следующий бар, а в формируемом баре получены не все минутные бары
+                completed.append((str(tf), self._to_bar(bar)))  # то формируемый бар уже не изменится
+                bar = None
+            if bar is None:  # Если бар начинается
+                bar = [key, open_, high, low, close, volume]
+            else:  # Если бар продолжается
+                bar[2] = max(bar[2], high)
+                bar[3] = min(bar[3], low)
+                bar[4] = close
+                bar[5] += volume
+            if is_last:  # Если это последний минутный бар
+                completed.append((str(tf), self._to_bar(bar)))  # то бар сформирован
+                bar = None
+            self._bars[i] = bar
+        return completed
+
+    def flush(self) -> list:
+        """Выдача формируемых бар, в которых получены не все минутные бары
+
+        :return: Несформированные бары: список (временной интервал, (дата и время открытия, open, high, low, close, volume))
+        """
+        partial = [(str(tf), self._to_bar(bar)) for tf, bar in zip(self.tfs, self._bars) if bar is not None]
+        self._bars = [None] * len(self.tfs)
+        return partial
+
+    def _flags(self, seconds) -> list:
+        """Бары старших интервалов и признаки последнего минутного бара из таблицы дня. Таблица строится один раз на день
+
+        :param int seconds: Секунды открытия минутного бара
+        :return: Список (секунды открытия бара старшего интервала, признак последнего минутного бара) по старшим интервалам
+        """
+        day = seconds // 86400  # День минутного бара
+        if day != self._day:  # Если начался новый день
+            self._day = day
+            grid = self.schedule.bars_array(Schedule._seconds_to_datetime(day * 86400), Schedule._seconds_to_datetime(day * 86400 + 86400), 'M1').astype(np.int64)  # Минутные бары дня по расписанию
+            columns = [last_bar_flags(self.schedule, grid, tf) for tf in self.tfs]
+            self._table = {int(grid_seconds): [(int(keys[j]), bool(is_last[j])) for keys, is_last in columns] for j, grid_seconds in enumerate(grid)}
+        flags = self._table.get(seconds)
+        if flags is None:  # Если минутного бара нет в расписании. Например, сделка в неторговое время
+            one = np.array([seconds], dtype=np.int64)
+            flags = [(int(keys[0]), bool(is_last[0])) for keys, is_last in (last_bar_flags(self.schedule, one, tf) for tf in self.tfs)]
+        return flags
+
+    @staticmethod
+    def _to_bar(bar) -> tuple:
+        """Формируемый бар в бар с датой и временем открытия
+
+        :param list bar: [секунды открытия, open, high, low, close, volume]
+        :return: (дата и время открытия, open, high, low, close, volume)
+        """
+        return (Schedule._seconds_to_datetime(bar[0]), *bar[1:])
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    from timeit import default_timer
+    from MarketPy.Schedule import MOEXStocks
+
+    schedule = MOEXStocks()  # Расписание фондового рынка Московской Биржи
+    tfs = ('M5', 'M15', 'M60', 'D1', 'W1')  # Старшие временнЫе интервалы
+    times = schedule.bars_array(datetime(2024, 1, 1), datetime(2024, 4, 1), 'M1').astype(np.int64)  # Квартал минутных бар по расписанию
+    times = times[np.random.default_rng(0).random(times.size) > 0.01]  # 1% минутных бар не получены
+    rng = np.random.default_rng(1)
+    bars = np.zeros(times.size, dtype=BarStore.dtype)
+    bars['time'] = times
+    bars['close'] = 100 + np.cumsum(rng.normal(0, 0.1, times.size))
+    bars['open'] = np.r_[100, bars['close'][:-1]]
+    bars['high'] = np.maximum(bars['open'], bars['close']) + 0.05
+    bars['low'] = np.minimum(bars['open'], bars['close']) - 0.05
+    bars['volume'] = rng.integers(1, 1000, times.size)
+
+    start = default_timer()
+    batch = {tf: resample(schedule, bars, tf) for tf in tfs}  # Пакетное построение
+    print(f'Пакетное построение {len(tfs)} интервалов из {bars.size} минутных бар: {default_timer() - start:.3f} с')
+    resampler = Resampler(schedule, tfs)
+    incremental = {tf: [] for tf in tfs}
+    start = default_timer()
+    for bar in bars.tolist():  # Минутные бары по одному
+        for tf, completed in resampler.add(Schedule._seconds_to_datetime(bar[0]), *bar[1:]):
+            incremental[tf].append(completed)
+    print(f'Построение по мере получения: {(default_timer() - start) / bars.size * 1_000_000:.2f} мкс на минутный бар')
+    for tf in tfs:  # Сравниваем результаты
+        same = np.array([(Schedule._datetime_to_seconds(dt), *values) for dt, *values in incremental[tf]], dtype=BarStore.dtype)
+        print(f'{tf}: {len(batch[tf])} бар, совпадают: {np.array_equal(batch[tf], same)}')
@@ -1,8 +1,16 @@
 from typing import Tuple, Union  # Кортеж, объединение типов
-from datetime import datetime, timedelta, time
+import json  # Загрузка календаря торгов из файла
+from bisect import bisect_right  # Двоичный поиск в индексе торговых сессий
+from functools import lru_cache  # Кэш сетки бар с ограничением размера
+from datetime import datetime, date, timedelta, time
+from math import floor
 
+import numpy as np  # Векторные вычисления над массивами дат и времени
 from pytz import timezone, utc  # Работаем с временнОй зоной и UTC
 
+from MarketPy.Timezone import TimezoneConverter  # Быстрый перевод времени по таблице переходов временнОй зоны
+from MarketPy.Clock import SystemClock  # Часы по умолчанию. Заменяются виртуальными для воспроизведения расписания
+
 
 class Session:
     """Торговая сессия"""
@@ -15,20 +23,271 @@ class Session:
         self.time_end = time_end  # Время окончания сессии
 
 
+class Timeframe:
+    """Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм. Разбирается из строки один раз"""
+    __slots__ = ('timeframe', 'compression', 'intraday', 'minutes')
+    _parsed = {}  # Разобранные временнЫе интервалы по строкам
+
+    def __init__(self, timeframe, compression):
+        """
+        :param str timeframe: Период: M - минуты, H - часы, D - дни, W - недели, MN - месяцы, Y - годы
+        :param int compression: Размер
+        """
+        self.timeframe = timeframe  # Период
+        self.compression = compression  # Размер
+        self.intraday = timeframe in ('M', 'H')  # Минутный и часовой интервалы внутридневные. Остальные - нет
+        self.minutes = compression * 60 if timeframe == 'H' else compression if timeframe == 'M' else None  # Размер внутридневного интервала в минутах. H1 = M60
+
+    @classmethod
+    def parse(cls, tf):
+        """Разбор временнОго интервала из строки. Разобранные интервалы берутся из кэша
+
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Временной интервал
+        :rtype: Timeframe
+        """
+        if isinstance(tf, Timeframe):  # Если временной интервал уже разобран
+            return tf  # то возвращаем его
+        timeframe = cls._parsed.get(tf)  # Разобранный временной интервал
+        if timeframe is None:  # Если временной интервал еще не разбирали
+            if tf.startswith('MN'):  # Сначала разбираем месяц, т.к. если начать с минут M, то месяц MN также разберется как минуты
+                timeframe = cls(tf[0:2], int(tf[2:]))  # В периоде будет 2 символа. Интервал переводим в целое
+            else:  # В остальных случаях в периоде будет 1 символ
+                timeframe = cls(tf[0], int(tf[1:]))
+            cls._parsed[tf] = timeframe
+        return timeframe
+
+    def __eq__(self, other):
+        return isinstance(other, Timeframe) and self.timeframe == other.timeframe and self.compression == other.compression
+
+    def __hash__(self):
+        return hash((self.timeframe, self.compression))
+
+    def __str__(self):
+        return f'{self.timeframe}{self.compression}'
+
+    def __repr__(self):
+        return f"Timeframe('{self}')"
+
+
+class Calendar:
+    """Календарь торгов биржи: праздничные дни, рабочие выходные дни и торговые сессии отдельных дней (сокращенные дни)"""
+    def __init__(self, holidays=(), workdays=(), day_sessions=None):
+        """
+        :param holidays: Праздничные дни без торгов
+        :param workdays: Рабочие выходные дни (суббота или воскресенье), в которые идут торги
+        :param dict[date, list[Session]] day_sessions: Торговые сессии отдельных дней вместо торговых сессий расписания
+        """
+        self.holidays = set(holidays)  # Праздничные дни без торгов
+        self.workdays = set(workdays)  # Рабочие выходные дни
+        self._day_sessions = {d.toordinal(): sorted(sessions, key=lambda session: session.time_begin) for d, sessions in (day_sessions or {}).items()}  # Торговые сессии отдельных дней по номеру дня
+        self._years = {}  # Битовые карты торговых дней по годам: год -> (номер дня 1 января, битовая карта)
+
+    def is_trading_day(self, d) -> bool:
+        """Торговый ли день
+
+        :param date d: Дата (или дата и время) на бирже
+        :return: True, если в этот день идут торги
+        """
+        year = self._years.get(d.year)  # Битовая карта торговых дней года
+        if year is None:  # Если битовой карты еще нет
+            year = self._build_year(d.year)  # то строим ее
+        day = d.toordinal() - year[0]  # Номер дня в году
+        return year[1][day >> 3] >> (day & 7) & 1 == 1  # Бит дня в битовой карте
+
+    def day_sessions(self, d) -> Union[list, None]:
+        """Торговые сессии отдельного дня
+
+        :param date d: Дата (или дата и время) на бирже
+        :return: Список торговых сессий дня. None, если для дня действуют торговые сессии расписания
+        """
+        return self._day_sessions.get(d.toordinal())
+
+    def _build_year(self, year) -> tuple:
+        """Битовая карта торговых дней года. Торговые дни: с понедельника по пятницу без праздничных дней, рабочие выходные дни, дни с заданными торговыми сессиями
+
+        :param int year: Год
+        :return: Номер дня 1 января, битовая карта по 1 биту на день
+        """
+        first_day = date(year, 1, 1).toordinal()  # Номер дня 1 января
+        days_count = date(year + 1, 1, 1).toordinal() - first_day  # Кол-во дней в году
+        bits = bytearray((days_count + 7) // 8)  # Битовая карта. Изначально торгов нет
+        for day in range(days_count):  # Пробегаемся по всем дням года
+            d = date.fromordinal(first_day + day)  # Дата
+            sessions = self._day_sessions.get(first_day + day)  # Торговые сессии дня
+            trading = bool(sessions) if sessions is not None else d in self.workdays or d.weekday() < 5 and d not in self.holidays  # Идут ли торги в этот день
+            if trading:  # Если торги идут
+                bits[day >> 3] |= 1 << (day & 7)  # то устанавливаем бит дня
+        self._years[year] = (first_day, bits)
+        return self._years[year]
+
+    @classmethod
+    def load(cls, filename):
+        """Загрузка календаря торгов из файла JSON вида
+        {"holidays": ["2025-01-01", ...], "workdays": ["2025-11-01", ...], "sessions": {"2025-12-31": [["07:00:00", "09:49:59"], ["09:50:00", "13:59:59"]], ...}}
+
+        :param str filename: Имя файла календаря
+        :return: Календарь торгов
+        :rtype: Calendar
+        """
+        with open(filename, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(
+            (date.fromisoformat(d) for d in data.get('holidays', [])),
+            (date.fromisoformat(d) for d in data.get('workdays', [])),
+            {date.fromisoformat(d): [Session(time.fromisoformat(time_begin), time.fromisoformat(time_end)) for time_begin, time_end in sessions]
+             for d, sessions in data.get('sessions', {}).items()})
+
+
+class SessionIndex:
+    """Индекс торговых сессий в диапазоне дат. Секунды отсчитываются с 01.01.1970 00:00 по времени биржи"""
+    __slots__ = ('seconds_min', 'seconds_max', 'opens', 'closes', 'numbers', 'opens_datetime', 'closes_datetime', 'opens_array', 'closes_array', 'numbers_array')
+
+    def __init__(self, seconds_min, seconds_max, opens, closes, numbers, opens_datetime, closes_datetime, opens_array, closes_array, numbers_array):
+        """
+        :param int seconds_min: Минимальное кол-во секунд, для которого индекс можно использовать
+        :param int seconds_max: Максимальное кол-во секунд, для которого индекс можно использовать
+        :param list[int] opens: Секунды начала сессий по возрастанию
+        :param list[int] closes: Секунды окончания сессий по возрастанию
+        :param list[int] numbers: Номера сессий в дне
+        :param list[datetime] opens_datetime: Дата и время начала сессий
+        :param list[datetime] closes_datetime: Дата и время окончания сессий
+        :param np.ndarray opens_array: Секунды начала сессий для векторных расчетов
+        :param np.ndarray closes_array: Секунды окончания сессий для векторных расчетов
+        :param np.ndarray numbers_array: Номера сессий в дне
+        """
+        self.seconds_min = seconds_min
+        self.seconds_max = seconds_max
+        self.opens = opens
+        self.closes = closes
+        self.numbers = numbers
+        self.opens_datetime = opens_datetime
+        self.closes_datetime = closes_datetime
+        self.opens_array = opens_array
+        self.closes_array = closes_array
+        self.numbers_array = numbers_array
+
+
 class Schedule:
     """Расписание торгов биржи"""
     market_timezone = timezone('Europe/Moscow')  # ВременнАя зона работы биржи
     dt_format = '%d.%m.%Y %H:%M:%S'  # Российский формат отображения даты и времени
+    epoch = datetime(1970, 1, 1)  # Начало отсчета секунд по времени биржи
+    epoch_ordinal = epoch.toordinal()  # Номер дня начала отсчета
+    index_margin_days = 31  # Запас индекса торговых сессий в днях до и после запрашиваемых дат
+    bar_grid_cache_size = 4096  # Максимальное кол-во сеток бар (дата, временной интервал) в кэше
 
-    def __init__(self, trade_sessions, delta=timedelta(seconds=3)):
+    def __init__(self, trade_sessions, delta=timedelta(seconds=3), index_date_from=None, index_date_to=None, calendar=None, clock=None):
         """
         :param list[Session] trade_sessions: Список торговых сессий
         :param timedelta delta: Допустимая разница рассинхронизации локальных и брокерских/биржевых часов в секундах
+        :param Calendar calendar: Календарь торгов. Если не задан, то торги идут с понедельника по пятницу
+        :param SystemClock clock: Часы. Если не заданы, то системные. Виртуальные часы позволяют проверить расписание без ожидания
+        :param date index_date_from: Дата начала индекса торговых сессий. Если не задана, то индекс строится при первом запросе
+        :param date index_date_to: Дата окончания индекса торговых сессий. Индекс расширяется автоматически при запросе дат вне диапазона
         """
         self.trade_sessions = sorted(trade_sessions, key=lambda session: session.time_begin)  # Список торговых сессий сортируем по возрастанию времени начала сессии
         self.market_time_begin = self.trade_sessions[0].time_begin  # Время открытия биржи = время начала первой торговой сессии
         self.market_time_end = self.trade_sessions[-1].time_end  # Время закрытия биржи = время окончания последней торговой сессии
         self.delta = delta  # Допустимая разница рассинхронизации локальных и брокерских/биржевых часов в секундах
+        self._compile_day_tables()  # Таблица номеров торговых сессий по секундам дня
+        self._index = None  # Индекс торговых сессий
+        self._calendar = calendar  # Календарь торгов
+        self.clock = clock or SystemClock()  # Часы
+        self._bar_grid = lru_cache(maxsize=self.bar_grid_cache_size)(self._compile_bar_grid)  # Сетки бар по дням и временнЫм интервалам с вытеснением давно не используемых
+        if index_date_from and index_date_to:  # Если задан диапазон дат индекса
+            self.compile_index(index_date_from, index_date_to)  # то строим его сразу
+
+    @property
+    def calendar(self) -> Union[Calendar, None]:
+        """Календарь торгов"""
+        return self._calendar
+
+    @calendar.setter
+    def calendar(self, calendar):
+        self._calendar = calendar
+        self._index = None  # Индекс торговых сессий перестроим при следующем запросе с новым календарем
+        self._bar_grid.cache_clear()  # Сетки бар тоже
+
+    def _compile_day_tables(self):
+        """Таблица номеров торговых сессий по секундам дня"""
+        self._day_session = np.full(86400, -1, dtype=np.int16)  # Номер торговой сессии для каждой секунды дня. -1, если торги не идут
+        for i in range(len(self.trade_sessions) - 1, -1, -1):  # Пробегаемся по сессиям с конца, чтобы при пересечении осталась первая сессия, как в trade_session
+            self._day_session[self.seconds_of_day(self.trade_sessions[i].time_begin):self.seconds_of_day(self.trade_sessions[i].time_end) + 1] = i
+        self._day_session_list = self._day_session.tolist()  # Для скалярных расчетов список быстрее массива
+
+    def compile_index(self, date_from, date_to):
+        """Индекс торговых сессий: отсортированные секунды начала и окончания всех сессий в диапазоне дат
+
+        :param date date_from: Дата начала диапазона
+        :param date date_to: Дата окончания диапазона
+        """
+        day_from = date_from.toordinal() - self.epoch_ordinal  # Кол-во дней, прошедших с 01.01.1970
+        day_to = date_to.toordinal() - self.epoch_ordinal
+        opens, closes, numbers = [], [], []  # Секунды начала и окончания сессий, номера сессий в дне
+        for day in range(day_from, day_to + 1):  # Пробегаемся по всем дням диапазона
+            for number, session in enumerate(self.day_sessions(date.fromordinal(day + self.epoch_ordinal))):  # Пробегаемся по всем торговым сессиям дня
+                opens.append(day * 86400 + self.seconds_of_day(session.time_begin))
+                closes.append(day * 86400 + self.seconds_of_day(session.time_end))
+                numbers.append(number)
+        margin = self.index_margin_days * 86400  # Запас индекса в секундах
+        self._index = SessionIndex(
+            day_from * 86400 + margin, (day_to + 1) * 86400 - margin,  # Секунды, для которых индекс можно использовать без расширения
+            opens, closes, numbers, [self._seconds_to_datetime(seconds) for seconds in opens], [self._seconds_to_datetime(seconds) for seconds in closes],
+            np.array(opens, dtype=np.int64), np.array(closes, dtype=np.int64), np.array(numbers, dtype=np.int16))  # Индекс меняем целиком, чтобы его можно было читать из других потоков
+
+    def _session_index(self, seconds_min, seconds_max=None):
+        """Индекс торговых сессий, покрывающий заданные секунды с запасом. При необходимости индекс расширяется
+
+        :param int seconds_min: Минимальное кол-во секунд, прошедших с 01.01.1970 00:00 по времени биржи
+        :param int seconds_max: Максимальное кол-во секунд. Если не задано, то равно минимальному
+        :return: Индекс торговых сессий
+        :rtype: SessionIndex
+        """
+        if seconds_max is None:  # Если максимальное кол-во секунд не задано
+            seconds_max = seconds_min  # то оно равно минимальному
+        index = self._index
+        if index is None or seconds_min < index.seconds_min or seconds_max > index.seconds_max:  # Если индекса нет, или он не покрывает заданные секунды
+            day_min = seconds_min // 86400 - self.index_margin_days  # Первый день с запасом
+            day_max = seconds_max // 86400 + self.index_margin_days  # Последний день с запасом
+            if index is not None:  # Если индекс был, то расширяем его
+                day_min = min(day_min, (index.seconds_min // 86400) - self.index_margin_days)
+                day_max = max(day_max, (index.seconds_max // 86400) + self.index_margin_days - 1)
+            self.compile_index(date.fromordinal(day_min - 366 + self.epoch_ordinal), date.fromordinal(day_max + 366 + self.epoch_ordinal))  # Расширяем с запасом в год в обе стороны
+            index = self._index
+        return index
+
+    def day_sessions(self, d_market) -> list:
+        """Торговые сессии на дату
+
+        :param date d_market: Дата на бирже
+        :return: Список торговых сессий. Пустой список, если торгов нет
+        """
+        if self._calendar is None:  # Если календарь торгов не задан
+            return [] if d_market.weekday() in (5, 6) else self.trade_sessions  # то в выходные дни (субботу и воскресенье) торгов нет
+        sessions = self._calendar.day_sessions(d_market)  # Торговые сессии отдельного дня
+        if sessions is not None:  # Если они заданы
+            return sessions  # то возвращаем их
+        return self.trade_sessions if self._calendar.is_trading_day(d_market) else []  # В праздничные и выходные дни торгов нет
+
+    def _compile_bar_grid(self, day, tf) -> tuple:
+        """Сетка бар внутридневного временнОго интервала на день. Для каждой торговой сессии дня:
+        секунды дня начала интервалов от начала сессии (для поиска) и секунды дня открытия бар
+
+        :param int day: Кол-во дней, прошедших с 01.01.1970
+        :param Timeframe tf: Внутридневной временной интервал
+        :return: Кортеж сеток по торговым сессиям дня: (начала интервалов, открытия бар)
+        """
+        tf_seconds = tf.minutes * 60  # Временной интервал в секундах
+        grid = []  # Сетки по торговым сессиям
+        for session in self.day_sessions(date.fromordinal(day + self.epoch_ordinal)):  # Пробегаемся по всем торговым сессиям дня
+            session_begin = self.seconds_of_day(session.time_begin)  # Секунды дня начала торговой сессии
+            session_end = self.seconds_of_day(session.time_end)  # Секунды дня окончания торговой сессии
+            bars_begin = session_begin - session_begin // 60 % 60 * 60 if tf.minutes > 5 else session_begin  # Некоторые сессии начинаются в hh:05 Для интервалов более 5-и минут считаем, что сессия начинается в hh:00
+            starts = tuple(range(bars_begin + (session_begin - bars_begin) // tf_seconds * tf_seconds, session_end + 1, tf_seconds))  # Начала интервалов, в которые попадает время сессии
+            opens = tuple(start - start // 60 % 60 * 60 if tf.minutes > start // 60 % 60 else start for start in starts)  # Если временной интервал больше, чем минуты начала бара. Например, часовой бар с сессией с 19:05, то считаем его с начала часа
+            grid.append((starts, opens))
+        return tuple(grid)
 
     def trade_session(self, dt_market) -> Union[Session, None]:
         """Торговая сессия по дате и времени на бирже. None, если торги не идут
@@ -36,9 +295,21 @@ class Schedule:
         :param datetime dt_market: Дата и время на бирже
         :return: Торговая сессия на бирже. None, если торги не идут
         """
-        if dt_market.weekday() in (5, 6):  # Если задан выходной день (суббота или воскресенье)
-            return None  # То торги не идут, торговой сессии нет
-        return next((session for session in self.trade_sessions if session.time_begin <= dt_market.time() <= session.time_end), None)  # Возвращаем торговую сессию, если время внутри сессии
+        if self._calendar is None:  # Если календарь торгов не задан
+            if dt_market.weekday() in (5, 6):  # Если задан выходной день (суббота или воскресенье)
+                return None  # То торги не идут, торговой сессии нет
+        else:  # Если календарь торгов задан
+            sessions = self._calendar.day_sessions(dt_market)  # Торговые сессии отдельного дня
+            if sessions is not None:  # Если они заданы (сокращенный день)
+                t_market = dt_market.time()  # Время на бирже
+                return next((session for session in sessions if session.time_begin <= t_market <= session.time_end), None)  # Возвращаем торговую сессию дня, если время внутри сессии
+            if not self._calendar.is_trading_day(dt_market):  # Если праздничный или выходной день
+                return None  # То торги не идут, торговой сессии нет
+        seconds = dt_market.hour * 3600 + dt_market.minute * 60 + dt_market.second  # Секунда дня
+        i = self._day_session_list[seconds]  # Номер торговой сессии по секунде дня
+        if i == -1 or dt_market.microsecond and seconds == self.seconds_of_day(self.trade_sessions[i].time_end):  # Если время вне сессии или позже последней секунды сессии. Например, 18:39:59.5
+            return None  # То торги не идут
+        return self.trade_sessions[i]  # Возвращаем торговую сессию, если время внутри сессии
 
     def last_session_time_end(self, dt_market) -> datetime:
         """Дата и время окончания предыдущей торговой сессии по дате и времени на бирже
@@ -46,19 +317,9 @@ class Schedule:
         :param datetime dt_market: Дата и время на бирже
         :return: Дата и время окончания предыдущей торговой сессии
         """
-        if dt_market.weekday() in (5, 6):  # Если выходной день (суббота или воскресенье)
-            return datetime.combine((dt_market - timedelta(days=dt_market.weekday()-4)).date(), self.market_time_end)  # то окончание последней сессии пятницы
-        t_market = dt_market.time()  # Время на бирже
-        if dt_market.weekday() == 0 and t_market < self.market_time_begin:  # Если утро понедельника до начала торгов
-            return datetime.combine((dt_market - timedelta(days=3)).date(), self.market_time_end)  # то окончание последней сессии пятницы
-        i = -1  # Номер сессии, до которой не дошло время на бирже
-        for session in self.trade_sessions:  # Пробегаемся по всем торговым сессиям
-            if t_market < session.time_end:  # Если время на бирже не дошло до времени окончания сессии
-                break  # то сессия найдена, выходим, больше не ищем
-            i += 1  # До этой сессии время на бирже дошло, переходим к следующей сессии
-        if i == -1:  # Если последняя торговая сессия была вчера
-            return datetime.combine((dt_market - timedelta(days=1)).date(), self.market_time_end)  # то окончание последней сессии вчера
-        return datetime.combine(dt_market.date(), self.trade_sessions[i].time_end)  # Окончание последней сессии сегодня
+        seconds = self._datetime_to_seconds(dt_market)  # Секунды по времени биржи
+        index = self._session_index(seconds)  # Индекс торговых сессий
+        return index.closes_datetime[bisect_right(index.closes, seconds) - 1]  # Последнее окончание сессии не позже даты и времени на бирже
 
     def time_until_trade(self, dt_market) -> timedelta:
         """Время, через которое можно будет торговать
@@ -66,109 +327,340 @@ class Schedule:
         :param datetime dt_market: Дата и время на бирже
         :return: Время, через которое можжно будет торговать. 0 секунд, если торговать можно прямо сейчас
         """
-        session = self.trade_session(dt_market)  # Пробуем получить торговую сессию
-        if session:  # Если нашли торговую сессию
+        if self.trade_session(dt_market):  # Если нашли торговую сессию
             return timedelta()  # То ждать не нужно, торговать можно прямо сейчас
-        for s in self.trade_sessions:  # Пробегаемся по всем торговым сессиям
-            if s.time_begin > dt_market.time():  # Если сессия начинается позже текущего времени на бирже
-                session = s  # То это искомая сессия
-                break  # Сессию нашли, дальше поиск вести не нужно
-        d_market = dt_market.date()  # Дата на бирже
-        if not session:  # Сессия не найдена, если время позже окончания последней сессии
-            session = self.trade_sessions[0]  # Будет первая торговая сессия
-            d_market += timedelta(1)  # Следующего дня
-        w_market = d_market.weekday()  # День недели даты на бирже
-        if w_market in (5, 6):  # Если задан выходной день
-            d_market += timedelta(7 - w_market)  # то будем ждать первой торговой сессии понедельника
-        dt_next_session = datetime(d_market.year, d_market.month, d_market.day, session.time_begin.hour, session.time_begin.minute, session.time_begin.second)
-        return dt_next_session - dt_market
+        seconds = self._datetime_to_seconds(dt_market)  # Секунды по времени биржи
+        index = self._session_index(seconds)  # Индекс торговых сессий
+        return index.opens_datetime[bisect_right(index.opens, seconds)] - dt_market  # Первое начало сессии после даты и времени на бирже
 
     def trade_bar_open_datetime(self, dt_market, tf) -> datetime:
         """Дата и время открытия последнего закрытого или открытого бара по дате и времени на бирже с временнЫм интервалом
 
         :param datetime dt_market: Дата и время на бирже
-        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
         :return: Дата и время открытия последнего закрытого или открытого бара
         """
-        tf_timeframe, tf_compression, _ = self.parse_tf(tf)  # Разбираем временной интервал на период и размер
-        if tf_timeframe == 'Y':  # Годовой временной интервал
+        tf = Timeframe.parse(tf)  # Разбираем временной интервал на период и размер
+        if tf.timeframe == 'Y':  # Годовой временной интервал
             return datetime(dt_market.year, 1, 1)  # 1 января
-        if tf_timeframe == 'MN':  # Месячный временной интервал
+        if tf.timeframe == 'MN':  # Месячный временной интервал
             return datetime(dt_market.year, dt_market.month, 1)  # 1 число месяца
-        if tf_timeframe == 'W':  # Недельный временной интервал
+        if tf.timeframe == 'W':  # Недельный временной интервал
             market_date = datetime.combine(dt_market.date(), datetime.min.time())  # Дата на бирже без времени
             return market_date - timedelta(days=market_date.weekday())  # Вычитаем кол-во дней, прошедших с пн. Крайний понедельник
-        session = self.trade_session(dt_market)  # Пробуем получить торговую сессию
-        if not session:  # Если на заданные дату и время на бирже перерыв
-            dt_market = self.last_session_time_end(dt_market)  # то смещаем их на дату и время окончания последней торговой сессии
-        if tf_timeframe == 'D':  # Дневной временной интервал
-            market_date = datetime.combine(dt_market.date(), datetime.min.time())  # Сегодняшняя или вчерашняя дата
-        elif tf_timeframe == 'M':  # Минутный временной интервал
-            session = self.trade_session(dt_market)  # Получаем текущую или прошлую торговую сессию
-            dt_session_begin = datetime.combine(dt_market.date(), session.time_begin)  # Дата и время начала торговой сессии
-            if tf_compression > 5:  # Некоторые сессии начинаются в hh:05 Для интервалов более 5-и минут считаем, что сессия начинается в hh:00
-                dt_session_begin = dt_session_begin.replace(minute=0)
-            session_seconds = (dt_market - dt_session_begin).total_seconds()  # Время от начала сессии в секундах
-            bars_count = session_seconds // (tf_compression * 60)  # Кол-во баров с заданным интервалом от начала сессии
-            market_date = dt_session_begin + timedelta(minutes=tf_compression * bars_count)  # Смещаем на начало последнего бара
-            if tf_compression > market_date.minute:  # Если временной интервал больше, чем минуты начала сессии. Например, часовой бар с сессией с 19:05
-                market_date = market_date.replace(minute=0)  # То считаем его с начала часа
-        else:  # С часовым графиком H не работаем. Заменяем минутным. Пример: H1 = M60
+        seconds = self._datetime_to_seconds(dt_market)  # Секунды по времени биржи
+        index = self._session_index(seconds)  # Индекс торговых сессий
+        i = bisect_right(index.opens, seconds) - 1  # Последняя начавшаяся торговая сессия
+        if seconds > index.closes[i]:  # Если на заданные дату и время на бирже перерыв
+            i = bisect_right(index.closes, seconds) - 1  # то берем последнюю завершенную торговую сессию
+            seconds = index.closes[i]  # и смещаем дату и время на ее окончание
+        day = seconds // 86400  # Кол-во дней, прошедших с 01.01.1970
+        if tf.timeframe == 'D':  # Дневной временной интервал
+            return self._seconds_to_datetime(day * 86400)  # Сегодняшняя или вчерашняя дата
+        if tf.timeframe not in ('M', 'H'):  # Неизвестный временной интервал
             raise NotImplementedError
-        w_market = market_date.weekday()  # День недели даты на бирже
-        if w_market in (5, 6):  # Если задан выходной день
-            market_date += timedelta(w_market - 4)  # то смещаемся на предыдущую пятницу
-        return market_date
+        starts, opens = self._bar_grid(day, tf)[index.numbers[i]]  # Сетка бар текущей или прошлой торговой сессии
+        return self._seconds_to_datetime(day * 86400 + opens[bisect_right(starts, seconds - day * 86400) - 1])  # Открытие бара, в интервал которого попадает время
 
     def trade_bar_close_datetime(self, dt_market, tf) -> datetime:
         """Дата и время закрытия последнего закрытого или открытого бара по дате и времени на бирже с временнЫм интервалом
 
         :param datetime dt_market: Дата и время на бирже
-        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
         :return: Дата и время открытия последнего закрытого или открытого бара
         """
-        tf_timeframe, tf_compression, _ = self.parse_tf(tf)  # Разбираем временной интервал на период и размер
-        if tf_timeframe == 'Y':  # Годовой временной интервал
+        tf = Timeframe.parse(tf)  # Разбираем временной интервал на период и размер
+        if tf.timeframe == 'Y':  # Годовой временной интервал
             return datetime(dt_market.year + 1, 1, 1)  # 1 января следующего года
-        if tf_timeframe == 'MN':  # Месячный временной интервал
+        if tf.timeframe == 'MN':  # Месячный временной интервал
             year = dt_market.year + dt_market.month // 12  # Год
             month = dt_market.month % 12 + 1  # Месяц
             return datetime(year, month, 1)  # 1 число следующего месяца
-        if tf_timeframe == 'W':  # Недельный временной интервал
+        if tf.timeframe == 'W':  # Недельный временной интервал
             market_date = datetime.combine(dt_market.date(), datetime.min.time())  # Дата на бирже без времени
             return market_date + timedelta(weeks=1, days=-market_date.weekday())  # Добавляем неделю. Вычитаем кол-во дней, прошедших с пн. Следующий понедельник
         dt_open = self.trade_bar_open_datetime(dt_market, tf)  # Дата и время открытия бара
-        if tf_timeframe == 'D':  # Дневной временной интервал
+        if tf.timeframe == 'D':  # Дневной временной интервал
             return dt_open + timedelta(days=1)  # Завтрашняя дата
-        if tf_timeframe == 'M':  # Минутный временной интервал
-            return dt_open + timedelta(minutes=tf_compression)  # Через минуты интервала
-        raise NotImplementedError  # С часовым графиком H не работаем. Заменяем минутным. Пример: H1 = M60
+        return dt_open + timedelta(minutes=tf.minutes)  # Через минуты интервала. H1 = M60
+
+    def trade_bar_ready_datetime(self, dt_market, tf) -> datetime:
+        """Дата и время, с которого бар может быть получен, без задержки. Если идет торговая сессия, то закрытие бара. В перерывах - начало следующей сессии
 
-    def trade_bar_request_datetime(self, dt_market, tf) -> datetime:
+        :param datetime dt_market: Дата и время на бирже
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Дата и время, с которого бар может быть получен
+        """
+        dt_close = self.trade_bar_close_datetime(dt_market, tf)  # Получаем дату и время закрытия бара на бирже
+        return dt_close + timedelta(seconds=self.time_until_trade(dt_close).total_seconds())  # Если дата и время закрытия попадает в перерыв, то добавляем время до начала следующей сессии
+
+    def trade_bar_request_datetime(self, dt_market, tf, delta=None) -> datetime:
         """Дата и время запроса бара на бирже. Если идет торговая сессия, то на открытии следующего бара. В перерывах - в начале следующей сессии
 
         :param datetime dt_market: Дата и время на бирже
-        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param timedelta delta: Задержка запроса. Если не задана, то берется delta расписания
         :return: Дата и время запроса бара на бирже
         """
-        dt_close = self.trade_bar_close_datetime(dt_market, tf)  # Получаем дату и время закрытия бара на бирже
-        return dt_close + timedelta(seconds=self.time_until_trade(dt_close).total_seconds()) + self.delta  # Если дата и время закрытия попадает в перерыв, то добавляем время до начала следующей сессии. Добавляем задержку
+        return self.trade_bar_ready_datetime(dt_market, tf) + (self.delta if delta is None else delta)  # Добавляем задержку
+
+    def iter_bars(self, start, end, tf):
+        """Даты и время открытия всех бар по расписанию, открывающихся с начальной (включительно) до конечной (не включительно) даты и времени.
+        Бары вычисляются по одному дню, поэтому перебор любого диапазона занимает постоянную память
+
+        :param datetime start: Начальная дата и время на бирже
+        :param datetime end: Конечная дата и время на бирже
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Генератор дат и времени открытия бар на бирже
+        """
+        for seconds in self._iter_bar_seconds(*self._range_to_seconds(start, end), Timeframe.parse(tf)):  # Пробегаемся по всем секундам открытия бар
+            yield self._seconds_to_datetime(seconds)
+
+    def bars_array(self, start, end, tf) -> np.ndarray:
+        """Даты и время открытия всех бар по расписанию, открывающихся с начальной (включительно) до конечной (не включительно) даты и времени. Векторный аналог iter_bars
+
+        :param datetime start: Начальная дата и время на бирже
+        :param datetime end: Конечная дата и время на бирже
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Массив дат и времени открытия бар datetime64[s] по возрастанию
+        """
+        tf = Timeframe.parse(tf)  # Разбираем временной интервал на период и размер
+        seconds_from, seconds_to = self._range_to_seconds(start, end)  # Диапазон в секундах по времени биржи
+        if seconds_from >= seconds_to:  # Если диапазон пустой
+            return np.array([], dtype='datetime64[s]')
+        day_from, day_to = seconds_from // 86400, (seconds_to - 1) // 86400  # Первый и последний дни диапазона
+        if tf.timeframe in ('Y', 'MN'):  # Годовой и месячный временнЫе интервалы
+            unit = 'datetime64[Y]' if tf.timeframe == 'Y' else 'datetime64[M]'  # Единица измерения numpy
+            first, last = np.array([seconds_from, seconds_to - 1]).astype('datetime64[s]').astype(unit)  # Год (месяц) первого и последнего дней диапазона
+            seconds = np.arange(first, last + 1).astype('datetime64[s]').astype(np.int64)  # 1 января (1 число) каждого года (месяца)
+        elif tf.timeframe == 'W':  # Недельный временной интервал
+            seconds = np.arange(day_from - self._weekday(day_from), day_to + 1, 7, dtype=np.int64) * 86400  # Понедельники каждой недели
+        else:  # Дневной и внутридневные временнЫе интервалы
+            if tf.timeframe != 'D' and not tf.intraday:  # Неизвестный временной интервал
+                raise NotImplementedError
+            groups = {}  # Дни по спискам торговых сессий: (секунды дня открытия бар, дни)
+            for day in range(day_from, day_to + 1):  # Пробегаемся по всем дням диапазона
+                sessions = self.day_sessions(date.fromordinal(day + self.epoch_ordinal))  # Торговые сессии дня
+                if not sessions:  # Если торгов нет
+                    continue  # то переходим к следующему дню
+                group = groups.get(id(sessions))  # Дни с тем же списком торговых сессий
+                if group is None:  # Если такого списка еще не было, то строим сетку бар дня
+                    bar_seconds = np.array([0]) if tf.timeframe == 'D' else np.unique([bar for _, opens in self._compile_bar_grid(day, tf) for bar in opens])  # Секунды дня открытия бар без повторов
+                    group = groups[id(sessions)] = (bar_seconds, [])
+                group[1].append(day)
+            seconds = np.concatenate([(np.array(days, dtype=np.int64)[:, None] * 86400 + bar_seconds[None, :]).ravel() for bar_seconds, days in groups.values()]) if groups else np.array([], dtype=np.int64)
+            seconds.sort()  # Дни разных групп перемешаны
+        seconds = seconds[(seconds >= seconds_from) & (seconds < seconds_to)]  # Оставляем бары из диапазона
+        return seconds.astype('datetime64[s]')
+
+    def _iter_bar_seconds(self, seconds_from, seconds_to, tf):
+        """Секунды открытия всех бар по расписанию в диапазоне
+
+        :param int seconds_from: Начало диапазона в секундах по времени биржи (включительно)
+        :param int seconds_to: Окончание диапазона в секундах по времени биржи (не включительно)
+        :param Timeframe tf: Временной интервал
+        :return: Генератор кол-ва секунд открытия бар, прошедших с 01.01.1970 00:00 по времени биржи
+        """
+        if seconds_from >= seconds_to:  # Если диапазон пустой
+            return
+        if tf.timeframe in ('Y', 'MN', 'W'):  # Годовой, месячный и недельный временнЫе интервалы не зависят от торговых сессий
+            dt = self.trade_bar_open_datetime(self._seconds_to_datetime(seconds_from), tf)  # Бар, в который попадает начало диапазона
+            seconds = self._datetime_to_seconds(dt)
+            while seconds < seconds_to:  # Пока бар открывается в диапазоне
+                if seconds >= seconds_from:  # Бар, в который попадает начало диапазона, может открываться раньше
+                    yield seconds
+                dt = self.trade_bar_close_datetime(dt, tf)  # Следующий бар
+                seconds = self._datetime_to_seconds(dt)
+            return
+        if tf.timeframe != 'D' and not tf.intraday:  # Неизвестный временной интервал
+            raise NotImplementedError
+        last_seconds = None  # Секунды открытия последнего бара. Бары соседних сессий могут открываться в одно время
+        for day in range(seconds_from // 86400, (seconds_to - 1) // 86400 + 1):  # Пробегаемся по всем дням диапазона
+            if not self.day_sessions(date.fromordinal(day + self.epoch_ordinal)):  # Если торгов нет
+                continue  # то переходим к следующему дню
+            day_bars = (0,) if tf.timeframe == 'D' else (bar for _, opens in self._compile_bar_grid(day, tf) for bar in opens)  # Секунды дня открытия бар. Сетку бар не кэшируем, чтобы не вытеснять из кэша текущие дни
+            for bar in day_bars:  # Пробегаемся по всем барам дня
+                seconds = day * 86400 + bar  # Секунды открытия бара
+                if last_seconds is not None and seconds <= last_seconds:  # Если бар с этим временем открытия уже был
+                    continue  # то пропускаем его
+                last_seconds = seconds
+                if seconds_from <= seconds < seconds_to:  # Если бар открывается в диапазоне
+                    yield seconds
+
+    @classmethod
+    def _range_to_seconds(cls, start, end) -> Tuple[int, int]:
+        """Перевод диапазона дат и времени на бирже в секунды. Доли секунды учитываются так, чтобы в диапазон попадали те же целые секунды
+
+        :param datetime start: Начальная дата и время на бирже (включительно)
+        :param datetime end: Конечная дата и время на бирже (не включительно)
+        :return: Начало (включительно) и окончание (не включительно) диапазона в секундах по времени биржи
+        """
+        return cls._datetime_to_seconds(start) + (1 if start.microsecond else 0), cls._datetime_to_seconds(end) + (1 if end.microsecond else 0)
+
+    def trade_session_array(self, dt_market) -> np.ndarray:
+        """Номера торговых сессий по массиву дат и времени на бирже. Векторный аналог trade_session
+
+        :param np.ndarray dt_market: Массив дат и времени на бирже datetime64 или кол-ва секунд int64, прошедших с 01.01.1970 00:00 по времени биржи
+        :return: Массив номеров торговых сессий в списке сессий своего дня day_sessions: в trade_sessions, а для дней с торговыми сессиями календаря - в Calendar.day_sessions. -1, если торги не идут
+        """
+        seconds, _ = self._to_seconds(dt_market)  # Секунды по времени биржи
+        index = self._session_index(int(seconds.min()), int(seconds.max())) if seconds.size else self._session_index(0)  # Индекс торговых сессий
+        opens, closes, numbers = index.opens_array, index.closes_array, index.numbers_array  # Секунды начала и окончания сессий, номера сессий в дне
+        sessions = np.searchsorted(opens, seconds, 'right') - 1  # Номера последних начавшихся сессий в индексе
+        sessions = np.where(seconds <= closes[sessions], numbers[sessions], -1)  # Номера сессий в дне, если время внутри сессии
+        return sessions
+
+    def trade_bar_open_datetime_array(self, dt_market, tf) -> np.ndarray:
+        """Даты и время открытия баров по массиву дат и времени на бирже. Векторный аналог trade_bar_open_datetime
+
+        :param np.ndarray dt_market: Массив дат и времени на бирже datetime64 или кол-ва секунд int64, прошедших с 01.01.1970 00:00 по времени биржи
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Массив дат и времени открытия баров того же типа, что и dt_market (datetime64[s] или int64)
+        """
+        seconds, is_datetime64 = self._to_seconds(dt_market)  # Секунды по времени биржи
+        return self._from_seconds(self._trade_bar_open_seconds(seconds, tf), is_datetime64)
+
+    def trade_bar_close_datetime_array(self, dt_market, tf) -> np.ndarray:
+        """Даты и время закрытия баров по массиву дат и времени на бирже. Векторный аналог trade_bar_close_datetime
+
+        :param np.ndarray dt_market: Массив дат и времени на бирже datetime64 или кол-ва секунд int64, прошедших с 01.01.1970 00:00 по времени биржи
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Массив дат и времени закрытия баров того же типа, что и dt_market (datetime64[s] или int64)
+        """
+        seconds, is_datetime64 = self._to_seconds(dt_market)  # Секунды по времени биржи
+        tf = Timeframe.parse(tf)  # Разбираем временной интервал на период и размер
+        if tf.timeframe == 'Y':  # Годовой временной интервал
+            close = (seconds.astype('datetime64[s]').astype('datetime64[Y]') + 1).astype('datetime64[s]').astype(np.int64)  # 1 января следующего года
+        elif tf.timeframe == 'MN':  # Месячный временной интервал
+            close = (seconds.astype('datetime64[s]').astype('datetime64[M]') + 1).astype('datetime64[s]').astype(np.int64)  # 1 число следующего месяца
+        elif tf.timeframe == 'W':  # Недельный временной интервал
+            days = seconds // 86400  # Дни
+            close = (days - self._weekday(days) + 7) * 86400  # Следующий понедельник
+        elif tf.timeframe == 'D':  # Дневной временной интервал
+            close = self._trade_bar_open_seconds(seconds, tf) + 86400  # Завтрашняя дата
+        elif tf.intraday:  # Минутный и часовой временнЫе интервалы
+            close = self._trade_bar_open_seconds(seconds, tf) + tf.minutes * 60  # Через минуты интервала. H1 = M60
+        else:  # Неизвестный временной интервал
+            raise NotImplementedError
+        return self._from_seconds(close, is_datetime64)
+
+    def _trade_bar_open_seconds(self, seconds, tf) -> np.ndarray:
+        """Секунды открытия баров по секундам на бирже с временнЫм интервалом
+
+        :param np.ndarray seconds: Кол-во секунд int64, прошедших с 01.01.1970 00:00 по времени биржи
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Кол-во секунд int64 открытия баров, прошедших с 01.01.1970 00:00 по времени биржи
+        """
+        tf = Timeframe.parse(tf)  # Разбираем временной интервал на период и размер
+        if tf.timeframe == 'Y':  # Годовой временной интервал
+            return seconds.astype('datetime64[s]').astype('datetime64[Y]').astype('datetime64[s]').astype(np.int64)  # 1 января
+        if tf.timeframe == 'MN':  # Месячный временной интервал
+            return seconds.astype('datetime64[s]').astype('datetime64[M]').astype('datetime64[s]').astype(np.int64)  # 1 число месяца
+        days = seconds // 86400  # Дни
+        if tf.timeframe == 'W':  # Недельный временной интервал
+            return (days - self._weekday(days)) * 86400  # Крайний понедельник
+        index = self._session_index(int(seconds.min()), int(seconds.max())) if seconds.size else self._session_index(0)  # Индекс торговых сессий
+        opens, closes = index.opens_array, index.closes_array  # Секунды начала и окончания сессий
+        sessions = np.searchsorted(opens, seconds, 'right') - 1  # Номера последних начавшихся сессий в индексе
+        in_session = seconds <= closes[sessions]  # Идет торговая сессия
+        last_sessions = np.searchsorted(closes, seconds, 'right') - 1  # Номера последних завершенных сессий в индексе
+        sessions = np.where(in_session, sessions, last_sessions)  # Если на заданные дату и время на бирже перерыв, то берем последнюю завершенную сессию
+        seconds = np.where(in_session, seconds, closes[last_sessions])  # и смещаем дату и время на ее окончание
+        days, day_seconds = np.divmod(seconds, 86400)  # Дни и секунды дня
+        if tf.timeframe == 'D':  # Дневной временной интервал
+            bar_days = days  # Дата текущей или прошлой торговой сессии
+            bar_seconds = np.zeros_like(day_seconds)
+        elif tf.intraday:  # Минутный и часовой временнЫе интервалы. H1 = M60
+            session_begin = opens[sessions] - days * 86400  # Секунды дня начала текущей или прошлой торговой сессии
+            if tf.minutes > 5:  # Некоторые сессии начинаются в hh:05 Для интервалов более 5-и минут считаем, что сессия начинается в hh:00
+                session_begin = session_begin - session_begin // 60 % 60 * 60
+            tf_seconds = tf.minutes * 60  # Временной интервал в секундах
+            bar_seconds = session_begin + (day_seconds - session_begin) // tf_seconds * tf_seconds  # Смещаем на начало последнего бара
+            bar_minute = bar_seconds // 60 % 60  # Минуты начала бара
+            bar_seconds = np.where(tf.minutes > bar_minute, bar_seconds - bar_minute * 60, bar_seconds)  # Если временной интервал больше, чем минуты начала сессии, то считаем бар с начала часа
+            bar_days = days
+        else:  # Неизвестный временной интервал
+            raise NotImplementedError
+        return bar_days * 86400 + bar_seconds
+
+    @staticmethod
+    def _to_seconds(dt_market) -> Tuple[np.ndarray, bool]:
+        """Перевод массива дат и времени на бирже в кол-во секунд, прошедших с 01.01.1970 00:00 по времени биржи
+
+        :param np.ndarray dt_market: Массив дат и времени на бирже datetime64 или кол-ва секунд int64
+        :return: Массив кол-ва секунд int64, признак массива datetime64
+        """
+        values = np.asarray(dt_market)
+        if values.dtype.kind == 'M':  # Если массив дат и времени
+            return values.astype('datetime64[s]').astype(np.int64), True  # то переводим в секунды
+        return values.astype(np.int64), False  # Массив секунд
+
+    @staticmethod
+    def _from_seconds(seconds, is_datetime64) -> np.ndarray:
+        """Перевод массива кол-ва секунд, прошедших с 01.01.1970 00:00 по времени биржи, в исходный тип
+
+        :param np.ndarray seconds: Массив кол-ва секунд int64
+        :param bool is_datetime64: Переводить в массив дат и времени datetime64[s]
+        :return: Массив datetime64[s] или int64
+        """
+        return seconds.astype('datetime64[s]') if is_datetime64 else seconds
+
+    @classmethod
+    def _datetime_to_seconds(cls, dt) -> int:
+        """Перевод даты и времени на бирже в кол-во секунд, прошедших с 01.01.1970 00:00 по времени биржи. Микросекунды отбрасываются:
+        секунда 18:39:59 - это и 18:39:59.5. Поиск по индексу сессий с bisect_right дает для нее тот же результат, а trade_session проверяет микросекунды в последней секунде сессии сам
+
+        :param datetime dt: Дата и время на бирже
+        :return: Кол-во секунд
+        """
+        return (dt.toordinal() - cls.epoch_ordinal) * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second
+
+    @classmethod
+    def _seconds_to_datetime(cls, seconds) -> datetime:
+        """Перевод кол-ва секунд, прошедших с 01.01.1970 00:00 по времени биржи, в дату и время на бирже
+
+        :param int seconds: Кол-во секунд
+        :return: Дата и время на бирже
+        """
+        return cls.epoch + timedelta(seconds=seconds)
+
+    @staticmethod
+    def _weekday(days) -> np.ndarray:
+        """Дни недели по кол-ву дней, прошедших с 01.01.1970 (чт). 0 - пн, 6 - вс
+
+        :param np.ndarray days: Массив кол-ва дней int64
+        :return: Массив дней недели
+        """
+        return (days + 3) % 7
+
+    @staticmethod
+    def seconds_of_day(t) -> int:
+        """Кол-во секунд, прошедших с начала дня
+
+        :param time t: Время
+        :return: Кол-во секунд с начала дня
+        """
+        return t.hour * 3600 + t.minute * 60 + t.second
 
     @staticmethod
     def parse_tf(tf) -> Tuple[str, int, bool]:
         """Разбор временнОго интервала на период, размер, является ли внутридневным интервалом
 
-        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :param str|Timeframe tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
         :return: Период, размер и признак внутридневного временнОго интрервала
         """
-        if 'MN' in tf:  # Сначала разбираем месяц, т.к. если начать с минут M, то месяц MN также разберется как минуты
-            return tf[0:2], int(tf[2:]), False  # В периоде будет 2 символа. Интервал переводим в целое. Не внутридневной интервал
-        return tf[0], int(tf[1:]), tf[0] == 'M'  # В остальных случаях в периоде будет 1 символ. Интервал переводим в целое. Минутный интервал внутридневной. Остальные - нет
+        tf = Timeframe.parse(tf)  # Разобранный временной интервал из кэша
+        return tf.timeframe, tf.compression, tf.intraday
 
     @property
     def market_datetime_now(self) -> datetime:
         """Текущее время биржи"""
-        return self.utc_to_msk_datetime(datetime.utcnow()).replace(microsecond=0)  # Текущее время МСК с точностью до секунды (без микросекунд)
+        return self.utc_timestamp_to_msk_datetime(int(self.clock.time()))  # Текущее время МСК с точностью до секунды (без микросекунд)
+
+    @property
+    def market_converter(self) -> TimezoneConverter:
+        """Перевод времени между UTC и временнОй зоной биржи по таблице переходов"""
+        return TimezoneConverter.for_timezone(self.market_timezone)
 
     def utc_to_msk_datetime(self, dt, tzinfo=False) -> datetime:
         """Перевод времени из UTC в московское
@@ -177,9 +669,10 @@ class Schedule:
         :param bool tzinfo: Отображать временнУю зону
         :return: Московское время
         """
-        dt_utc = utc.localize(dt)  # Задаем временнУю зону UTC
-        dt_msk = dt_utc.astimezone(self.market_timezone)  # Переводим в МСК
-        return dt_msk if tzinfo else dt_msk.replace(tzinfo=None)
+        if tzinfo:  # Если нужно отображать временнУю зону
+            return utc.localize(dt).astimezone(self.market_timezone)  # то задаем временнУю зону UTC и переводим в МСК
+        seconds = self._datetime_to_seconds(dt)  # Секунды UTC
+        return dt + timedelta(seconds=self.market_converter.utc_to_local(seconds) - seconds)  # Добавляем смещение МСК от UTC
 
     def msk_to_utc_datetime(self, dt, tzinfo=False) -> datetime:
         """Перевод времени из московского в UTC
@@ -188,9 +681,9 @@ class Schedule:
         :param bool tzinfo: Отображать временнУю зону
         :return: Время UTC
         """
-        dt_msk = self.market_timezone.localize(dt)  # Задаем временнУю зону МСК
-        dt_utc = dt_msk.astimezone(utc)  # Переводим в UTC
-        return dt_utc if tzinfo else dt_utc.replace(tzinfo=None)
+        seconds = self._datetime_to_seconds(dt)  # Секунды МСК
+        dt_utc = dt - timedelta(seconds=seconds - self.market_converter.local_to_utc(seconds))  # Вычитаем смещение МСК от UTC
+        return dt_utc.replace(tzinfo=utc) if tzinfo else dt_utc
 
     def utc_timestamp_to_msk_datetime(self, seconds) -> datetime:
         """Перевод кол-ва секунд, прошедших с 01.01.1970 00:00 UTC в московское время
@@ -198,8 +691,9 @@ class Schedule:
         :param int seconds: Кол-во секунд, прошедших с 01.01.1970 00:00 UTC
         :return: Московское время без временнОй зоны
         """
-        dt_utc = datetime.utcfromtimestamp(seconds)  # Переводим кол-во секунд, прошедших с 01.01.1970 в UTC
-        return self.utc_to_msk_datetime(dt_utc)  # Переводим время из UTC в московское
+        whole_seconds = floor(seconds)  # Целые секунды
+        dt_msk = self.epoch + timedelta(seconds=self.market_converter.utc_to_local(whole_seconds))  # Переводим целые секунды в МСК
+        return dt_msk if whole_seconds == seconds else dt_msk + timedelta(seconds=seconds - whole_seconds)  # Добавляем доли секунды
 
     def msk_datetime_to_utc_timestamp(self, dt) -> int:
         """Перевод московского времени в кол-во секунд, прошедших с 01.01.1970 00:00 UTC
@@ -207,41 +701,71 @@ class Schedule:
         :param datetime dt: Московское время
         :return: Кол-во секунд, прошедших с 01.01.1970 00:00 UTC
         """
-        dt_msk = self.market_timezone.localize(dt)  # Заданное время ставим в зону МСК
-        return int(dt_msk.timestamp())  # Переводим в кол-во секунд, прошедших с 01.01.1970 в UTC
+        seconds = self.market_converter.local_to_utc(self._datetime_to_seconds(dt))  # Целые секунды UTC
+        return seconds + 1 if seconds < 0 and dt.microsecond else seconds  # До 1970 года доли секунды отбрасываем в сторону нуля, как int
+
+    def utc_timestamp_to_msk_datetime64(self, seconds) -> np.ndarray:
+        """Перевод массива кол-ва секунд, прошедших с 01.01.1970 00:00 UTC, в московское время. Векторный аналог utc_timestamp_to_msk_datetime
+
+        :param np.ndarray seconds: Массив кол-ва секунд int64, прошедших с 01.01.1970 00:00 UTC
+        :return: Массив московского времени datetime64[s] без временнОй зоны
+        """
+        return self.market_converter.utc_to_local_array(seconds).astype('datetime64[s]')
+
+    def msk_datetime64_to_utc_timestamp(self, dt) -> np.ndarray:
+        """Перевод массива московского времени в кол-во секунд, прошедших с 01.01.1970 00:00 UTC. Векторный аналог msk_datetime_to_utc_timestamp
+
+        :param np.ndarray dt: Массив московского времени datetime64 или кол-ва секунд int64, прошедших с 01.01.1970 00:00 МСК
+        :return: Массив кол-ва секунд int64, прошедших с 01.01.1970 00:00 UTC
+        """
+        seconds, _ = self._to_seconds(dt)  # Секунды МСК
+        return self.market_converter.local_to_utc_array(seconds)
 
 
 class MOEXStocks(Schedule):
     """Расписание торгов Московской Биржи: Фондовый рынок - Акции https://www.moex.com/s1167"""
-    def __init__(self):
+    def __init__(self, calendar=None, clock=None):
+        """
+        :param Calendar calendar: Календарь торгов
+        :param SystemClock clock: Часы
+        """
         super(MOEXStocks, self).__init__([
             Session(time(7, 0, 0), time(9, 49, 59)),  # Утренняя сессия
             Session(time(9, 50, 0), time(18, 39, 59)),  # Основная сессия
-            Session(time(19, 5, 0), time(23, 49, 59))])  # Вечерняя сессия
+            Session(time(19, 5, 0), time(23, 49, 59))], calendar=calendar, clock=clock)  # Вечерняя сессия
 
 
 class MOEXBonds(Schedule):
     """Расписание торгов Московской Биржи: Фондовый рынок - Облигации https://www.moex.com/s1167"""
-    def __init__(self):
+    def __init__(self, calendar=None, clock=None):
+        """
+        :param Calendar calendar: Календарь торгов
+        :param SystemClock clock: Часы
+        """
         super(MOEXBonds, self).__init__([
             Session(time(9, 0, 0), time(9, 49, 59)),  # Утренняя сессия
             Session(time(10, 0, 0), time(18, 39, 59)),  # Основная сессия
-            Session(time(19, 5, 0), time(23, 49, 59))])  # Вечерняя сессия
+            Session(time(19, 5, 0), time(23, 49, 59))], calendar=calendar, clock=clock)  # Вечерняя сессия
 
 
 class MOEXFutures(Schedule):
     """Расписание торгов Московской Биржи: Срочный рынок https://www.moex.com/ru/derivatives/"""
-    def __init__(self):
+    def __init__(self, calendar=None, clock=None):
+        """
+        :param Calendar calendar: Календарь торгов
+        :param SystemClock clock: Часы
+        """
         super(MOEXFutures, self).__init__([
             Session(time(9, 0, 0), time(9, 59, 59)),  # Утренняя дополнительная торговая сессия
             Session(time(10, 0, 0), time(13, 59, 59)),  # Основная торговая сессия (Дневной расчетный период)
             Session(time(14, 5, 0), time(18, 49, 59)),  # Основная торговая сессия (Вечерний расчетный период)
-            Session(time(19, 5, 0), time(23, 49, 59))])  # Вечерняя дополнительная торговая сессия
+            Session(time(19, 5, 0), time(23, 49, 59))], calendar=calendar, clock=clock)  # Вечерняя дополнительная торговая сессия
 
 
 if __name__ == '__main__':  # Точка входа при запуске этого скрипта
     schedule = MOEXStocks()  # Расписание торгов акций
     # schedule = MOEXFutures()  # Расписание торгов срочного рынка
+    # schedule.calendar = Calendar.load('MOEX.json')  # Календарь торгов с праздничными, рабочими выходными и сокращенными днями
 
     market_tf = 'D1'  # Временной интервал
     # market_tf = 'M60'  # Временной интервал
@@ -251,7 +775,7 @@ if __name__ == '__main__':  # Точка входа при запуске это
     # market_dt = datetime(2025, 3, 24, 6, 59, 59)  # Перерыв на бирже (утро пн)
     # market_dt = datetime(2025, 3, 24, 7, 0)  # Биржа работает (открытие пн)
     # market_dt = datetime(2025, 3, 24, 18, 40)  # Перерыв на бирже (аукцион закрытия)
-    market_dt = schedule.utc_to_msk_datetime(datetime.utcnow())
+    market_dt = schedule.market_datetime_now
 
     print(f'Дата и время на бирже : {market_dt:{schedule.dt_format}}')
     session = schedule.trade_session(market_dt)  # Торговая сессия
@@ -0,0 +1,390 @@
+import logging
+import os
+from datetime import timedelta
+from json import loads
+from hashlib import blake2b  # Хеш, одинаковый во всех процессах. Встроенный hash() у строк в каждом процессе свой
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from threading import Thread, Event
+from time import monotonic
+
+import numpy as np  # Записи бар в общей памяти
+
+from MarketPy.Schedule import Schedule
+from MarketPy.BarStore import BarStore
+from MarketPy.Bars import Bar, alor_bar_to_bar
+from MarketPy.Dispatcher import Dispatcher, Subscription
+
+
+logger = logging.getLogger('Schedule.Sharding')  # Будем вести лог
+
+
+def shard_of(key, shards) -> int:
+    """Номер процесса для подписки. Согласованное распределение (rendezvous hashing): одна и та же подписка всегда попадает в тот же процесс,
+    а при изменении кол-ва процессов переезжает только доля подписок 1 / кол-во процессов
+
+    :param tuple key: (код режима торгов, код тикера, временной интервал)
+    :param int shards: Кол-во процессов
+    :return: Номер процесса от 0 до shards - 1
+    """
+    name = '.'.join(str(part) for part in key).encode()
+    return max(range(shards), key=lambda shard: blake2b(name, digest_size=8, salt=shard.to_bytes(8, 'little')).digest())
+
+
+class BarRing:
+    """Кольцевой буфер бар в общей памяти. Пишет один процесс, читает другой без блокировок и сериализации.
+    Если читатель отстает больше, чем на емкость буфера, то самые старые бары теряются и учитываются в dropped"""
+    dtype = np.dtype([('subscription', '<i8')] + BarStore.dtype.descr)  # Запись бара с номером подписки
+    header_size = 64  # Заголовок: кол-во записанных бар и кол-во начатых записей int64. Выравниваем по строке кеша
+
+    def __init__(self, name=None, capacity=65536, create=True):
+        """
+        :param str name: Имя общей памяти. None - создать с новым именем
+        :param int capacity: Емкость буфера в барах
+        :param bool create: Создать общую память. False - подключиться к созданной другим процессом
+        """
+        self.capacity = capacity  # Емкость буфера
+        self.shm = SharedMemory(name, create, self.header_size + capacity * self.dtype.itemsize) if create else SharedMemory(name)
+        self.name = self.shm.name  # Имя общей памяти
+        self._head = np.ndarray((1,), np.int64, self.shm.buf)  # Кол-во записанных бар
+        self._started = np.ndarray((1,), np.int64, self.shm.buf, 8)  # Кол-во начатых записей. Больше кол-ва записанных бар, пока идет запись
+        self._records = np.ndarray((capacity,), self.dtype, self.shm.buf, self.header_size)  # Записи бар
+        if create:  # Если буфер новый
+            self._head[0] = self._started[0] = 0
+        self.dropped = 0  # Кол-во потерянных читателем бар
+
+    def write(self, subscription, seconds, open_, high, low, close, volume):
+        """Запись бара. Вызывается только одним процессом
+
+        :param int subscription: Номер подписки
+        :param int seconds: Кол-во секунд, прошедших с 01.01.1970 00:00 по времени биржи, до открытия бара
+        :param float open_: Цена открытия
+        :param float high: Максимальная цена
+        :param float low: Минимальная цена
+        :param float close: Цена закрытия
+        :param int volume: Объем в штуках
+        """
+        head = int(self._head[0])
+        self._started[0] = head + 1  # Сначала отметка начала записи. Читатель узнает, что бар head - capacity перезаписывается
+        self._records[head % self.capacity] = (subscription, seconds, open_, high, low, close, volume)  # Сначала запись бара
+        self._head[0] = head + 1  # Затем публикация. Читатель не увидит бар до его записи
+
+    def read(self, tail) -> tuple:
+        """Чтение записанных бар
+
+        :param int tail: Кол-во прочитанных бар
+        :return: Копия прочитанных записей dtype, новое кол-во прочитанных бар
+        """
+        head = int(self._head[0])
+        if head - tail > self.capacity:  # Если писатель обогнал читателя на целый круг
+            self.dropped += head - self.capacity - tail  # то самые старые бары потеряны
+            tail = head - self.capacity
+        first, last = tail % self.capacity, head % self.capacity  # Первая и следующая за последней записи в буфере
+        if tail == head:  # Если новых бар нет
+            return self._records[:0].copy(), tail
+        records = self._records[first:last].copy() if first < last else np.concatenate((self._records[first:], self._records[:last]))
+        overwritten = int(self._started[0]) - self.capacity - tail  # Сколько бар писатель начал перезаписывать, пока мы копировали. В том числе бар, запись поверх которого еще идет
+        if overwritten > 0:  # Если часть скопированных бар перезаписана или перезаписывается
+            self.dropped += overwritten  # то не выдаем их
+            records = records[overwritten:]
+        return records, head
+
+    @property
+    def head(self) -> int:
+        """Кол-во записанных бар"""
+        return int(self._head[0])
+
+    def last_seconds(self) -> dict:
+        """Открытие последнего бара каждой подписки из оставшихся в буфере. Вызывается, когда писатель остановлен. Например, при перезапуске упавшего процесса
+
+        :return: Номер подписки -> кол-во секунд, прошедших с 01.01.1970 00:00 по времени биржи, до открытия последнего бара
+        """
+        records = self._records[:min(self.head, self.capacity)]  # Записанные бары. Если буфер прошел круг, то все записи
+        last = {}
+        for number, seconds in zip(records['subscription'].tolist(), records['time'].tolist()):  # Пробегаемся по всем барам
+            if seconds > last.get(number, -1):  # Бары одной подписки идут по порядку, но после круга начало буфера новее конца
+                last[number] = seconds
+        return last
+
+    def close(self):
+        """Отключение от общей памяти"""
+        del self._head, self._started, self._records  # Представления numpy держат буфер общей памяти
+        self.shm.close()
+
+    def unlink(self):
+        """Удаление общей памяти. Вызывается создателем после отключения всех процессов"""
+        self.shm.unlink()
+
+
+def stream_worker(shard, subscriptions, schedule_factory, provider_factory, publish, stop_event):
+    """Работа процесса: получение новых бар своих подписок по расписанию биржи через диспетчер
+
+    :param int shard: Номер процесса
+    :param list subscriptions: Подписки процесса: (номер подписки, код режима торгов, код тикера, временной интервал, открытие последнего записанного бара в секундах по времени биржи или None)
+    :param schedule_factory: Функция создания расписания по коду режима торгов schedule_factory(class_code)
+    :param provider_factory: Функция создания подключения к провайдеру provider_factory(). У провайдера должна быть функция получения бара fetch(subscription)
+    :param publish: Функция публикации полученного бара publish(номер подписки, bar)
+    :param Event stop_event: Событие выхода
+    """
+    provider = provider_factory()  # Свое подключение к провайдеру в каждом процессе
+    schedules = {}  # Свои расписания в каждом процессе по коду режима торгов
+    resumed = 0  # Кол-во подписок, продолжающих получение после перезапуска процесса
+    with Dispatcher() as dispatcher:
+        for number, class_code, security_code, tf, last in subscriptions:  # Пробегаемся по всем подпискам процесса
+            if class_code not in schedules:  # Если расписания для режима торгов еще нет
+                schedules[class_code] = schedule_factory(class_code)  # то создаем его
+            after = None if last is None else Schedule._seconds_to_datetime(last)  # Последний записанный бар. Бары, закрывшиеся за время перезапуска, будут получены
+            resumed += after is not None
+            dispatcher.subscribe(class_code, security_code, schedules[class_code], tf, provider.fetch, lambda subscription, bar, number=number: publish(number, bar), after)
+        if resumed:  # Если процесс перезапущен
+            logger.info(f'Процесс {shard}: {resumed} подписок продолжают получение с последних записанных бар')
+        stop_event.wait()  # Ждем выхода
+    if hasattr(provider, 'close'):  # Если у провайдера есть закрытие подключения
+        provider.close()
+
+
+def _run_worker(shard, ring_name, ring_capacity, worker, subscriptions, schedule_factory, provider_factory, stop_event):
+    """Точка входа процесса: подключение к кольцевому буферу и запуск работы процесса"""
+    ring = BarRing(ring_name, ring_capacity, create=False)
+    datetime_to_seconds = Schedule._datetime_to_seconds
+
+    def publish(number, bar):
+        dt, open_, high, low, close, volume = bar
+        ring.write(number, datetime_to_seconds(dt), open_, high, low, close, volume)
+
+    try:
+        worker(shard, subscriptions, schedule_factory, provider_factory, publish, stop_event)
+    finally:
+        ring.close()
+
+
+class ShardedEngine:
+    """Получение новых бар тысяч подписок в нескольких процессах. Подписки распределяются по процессам согласованно по (код режима торгов, код тикера, временной интервал).
+    Каждый процесс создает свои расписания и подключение к провайдеру, а полученные бары пишет в свой кольцевой буфер в общей памяти.
+    Упавший процесс перезапускается с теми же подписками"""
+    def __init__(self, schedule_factory, provider_factory, shards=None, ring_capacity=65536, worker=stream_worker, restart_delay=1.0):
+        """
+        :param schedule_factory: Функция создания расписания по коду режима торгов schedule_factory(class_code). Вызывается в процессах
+        :param provider_factory: Функция создания подключения к провайдеру provider_factory(). Вызывается в процессах
+        :param int shards: Кол-во процессов. По умолчанию, кол-во ядер процессора
+        :param int ring_capacity: Емкость кольцевого буфера каждого процесса в барах
+        :param worker: Работа процесса worker(shard, subscriptions, schedule_factory, provider_factory, publish, stop_event). По умолчанию, получение бар по расписанию
+        :param float restart_delay: Период проверки процессов в секундах
+        """
+        self.schedule_factory = schedule_factory  # Функция создания расписания
+        self.provider_factory = provider_factory  # Функция создания подключения к провайдеру
+        self.shards = shards or os.cpu_count() or 1  # Кол-во процессов
+        self.ring_capacity = ring_capacity  # Емкость кольцевого буфера
+        self.worker = worker  # Работа процесса
+        self.restart_delay = restart_delay  # Период проверки процессов
+        self.subscriptions = []  # Подписки: (код режима торгов, код тикера, временной интервал). Номер подписки - индекс в списке
+        self.restarts = 0  # Кол-во перезапусков процессов
+        self.gaps = 0  # Кол-во подписок, начавших получение с текущего бара после перезапуска процесса, т.к. их последнего бара не было в буфере
+        self._context = get_context()  # Контекст процессов
+        self._stop_event = self._context.Event()  # Событие выхода для процессов
+        self._rings = []  # Кольцевые буферы процессов
+        self._tails = []  # Кол-во прочитанных бар из каждого буфера
+        self._processes = []  # Процессы
+        self._supervisor = Thread(name='sharding_supervisor', target=self._supervise, daemon=True)  # Поток перезапуска процессов
+        self._closed = Event()  # Движок закрыт
+
+    def subscribe(self, class_code, security_code, tf) -> int:
+        """Подписка на новые бары тикера. До запуска
+
+        :param str class_code: Код режима торгов
+        :param str security_code: Код тикера
+        :param str tf: Временной интервал https://ru.wikipedia.org/wiki/Таймфрейм
+        :return: Номер подписки
+        """
+        if self._processes:  # Если процессы уже запущены
+            raise RuntimeError('Подписки задаются до запуска')
+        self.subscriptions.append((class_code, security_code, tf))
+        return len(self.subscriptions) - 1
+
+    def shard_subscriptions(self, shard, last=None) -> list:
+        """Подписки процесса
+
+        :param int shard: Номер процесса
+        :param dict last: Открытие последнего записанного бара по номеру подписки. При перезапуске процесса. По умолчанию, процесс запускается впервые
+        :return: (номер подписки, код режима торгов, код тикера, временной интервал, открытие последнего записанного бара или None)
+        """
+        last = last or {}
+        return [(number, *key, last.get(number)) for number, key in enumerate(self.subscriptions) if shard_of(key, self.shards) == shard]
+
+    def start(self):
+        """Запуск процессов и потока их перезапуска"""
+        for shard in range(self.shards):  # Пробегаемся по всем процессам
+            self._rings.append(BarRing(capacity=self.ring_capacity))
+            self._tails.append(0)
+            self._processes.append(self._start_process(shard))
+        self._supervisor.start()
+
+    def read_array(self) -> np.ndarray:
+        """Чтение полученных бар из всех процессов без перевода в объекты
+
+        :return: Записи BarRing.dtype. Бары одной подписки идут по порядку получения
+        """
+        parts = []
+        for shard, ring in enumerate(self._rings):  # Пробегаемся по всем буферам
+            records, self._tails[shard] = ring.read(self._tails[shard])
+            if records.size:
+                parts.append(records)
+        return np.concatenate(parts) if parts else np.empty(0, BarRing.dtype)
+
+    def poll(self) -> list:
+        """Чтение полученных бар из всех процессов
+
+        :return: Список (код режима торгов, код тикера, временной интервал, бар)
+        """
+        epoch = Schedule.epoch  # Секунды отсчитываются с 01.01.1970 00:00 по времени биржи
+        return [(*self.subscriptions[number], Bar(epoch + timedelta(seconds=seconds), open_, high, low, close, volume))
+                for number, seconds, open_, high, low, close, volume in self.read_array().tolist()]
+
+    @property
+    def dropped(self) -> int:
+        """Кол-во бар, потерянных из-за отставания чтения"""
+        return sum(ring.dropped for ring in self._rings)
+
+    @property
+    def pids(self) -> list:
+        """Идентификаторы процессов"""
+        return [process.pid for process in self._processes]
+
+    def close(self):
+        """Остановка процессов и удаление кольцевых буферов"""
+        self._closed.set()
+        if self._supervisor.is_alive():  # Если поток перезапуска запускался
+            self._supervisor.join()
+        self._stop_event.set()  # Просим процессы выйти
+        for process in self._processes:  # Пробегаемся по всем процессам
+            process.join(5)  # Ждем выхода
+            if process.is_alive():  # Если процесс не вышел
+                process.kill()  # то завершаем его
+                process.join()
+        for ring in self._rings:  # Пробегаемся по всем буферам
+            ring.close()
+            ring.unlink()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _start_process(self, shard, last=None):
+        """Запуск процесса
+
+        :param int shard: Номер процесса
+        :param dict last: Открытие последнего записанного бара по номеру подписки. При перезапуске процесса
+        :return: Процесс
+        """
+        process = self._context.Process(name=f'sharding_{shard}', daemon=True, target=_run_worker,
+                                        args=(shard, self._rings[shard].name, self.ring_capacity, self.worker, self.shard_subscriptions(shard, last),
+                                              self.schedule_factory, self.provider_factory, self._stop_event))
+        process.start()
+        return process
+
+    def _supervise(self):
+        """Поток перезапуска упавших процессов"""
+        while not self._closed.wait(self.restart_delay):  # Пока движок не закрыт, проверяем процессы
+            for shard, process in enumerate(self._processes):  # Пробегаемся по всем процессам
+                if not process.is_alive():  # Если процесс упал
+                    logger.error(f'Процесс {shard} завершился с кодом {process.exitcode}. Перезапуск')
+                    process.join()
+                    last = self._rings[shard].last_seconds()  # Последние бары подписок, записанные до падения. Буфер в общей памяти пережил процесс
+                    for number, *key, seconds in self.shard_subscriptions(shard, last):  # Пробегаемся по всем подпискам процесса
+                        if seconds is None:  # Если бар подписки в буфере нет
+                            self.gaps += 1
+                            logger.warning(f'{".".join(key[:2])} ({key[2]}): последний бар не найден. Бары, закрывшиеся до перезапуска, не будут получены')
+                    self._processes[shard] = self._start_process(shard, last)  # то запускаем его с теми же подписками и буфером. Подписки продолжают с последних бар
+                    self.restarts += 1
+
+
+def burst_worker(shard, subscriptions, schedule_factory, provider_factory, publish, stop_event):
+    """Работа процесса для замера пропускной способности: бары всех подписок получаются и публикуются по кругу без ожидания расписания
+
+    :param int shard: Номер процесса
+    :param list subscriptions: Подписки процесса: (номер подписки, код режима торгов, код тикера, временной интервал, открытие последнего записанного бара или None)
+    :param schedule_factory: Функция создания расписания по коду режима торгов schedule_factory(class_code)
+    :param provider_factory: Функция создания подключения к провайдеру provider_factory()
+    :param publish: Функция публикации полученного бара publish(номер подписки, bar)
+    :param Event stop_event: Событие выхода
+    """
+    provider = provider_factory()
+    schedules = {}
+    items = []  # (номер подписки, подписка)
+    for number, class_code, security_code, tf, _ in subscriptions:
+        if class_code not in schedules:
+            schedules[class_code] = schedule_factory(class_code)
+        subscription = Subscription(class_code, security_code, schedules[class_code], tf, provider.fetch)
+        subscription.trade_bar_open_datetime = schedules[class_code].trade_bar_open_datetime(schedules[class_code].market_datetime_now, tf)
+        items.append((number, subscription))
+    while not stop_event.is_set():  # Пока нет события выхода
+        for number, subscription in items:  # Пробегаемся по всем подпискам
+            publish(number, provider.fetch(subscription))
+
+
+class FakeShardProvider:
+    """Провайдер без обращения к серверу. Разбирает ответ Alor в формате JSON, как настоящий провайдер. Для проверки процессов"""
+    def fetch(self, subscription) -> Bar:
+        """Получение бара
+
+        :param Subscription subscription: Подписка
+        :return: Бар
+        """
+        schedule = subscription.schedule
+        timestamp = schedule.msk_datetime_to_utc_timestamp(subscription.trade_bar_open_datetime)  # Ответ сервера
+        response = loads(f'{{"history": [{{"time": {timestamp}, "open": 300.12, "high": 300.5, "low": 299.9, "close": 300.25, "volume": 1000}}], "next": null, "prev": null}}')
+        return alor_bar_to_bar(response['history'][0], schedule, 10)
+
+
+def moex_schedule(class_code) -> Schedule:
+    """Расписание Московской Биржи по коду режима торгов
+
+    :param str class_code: Код режима торгов
+    :return: Расписание торгов
+    """
+    from MarketPy.Schedule import MOEXStocks, MOEXFutures
+    return MOEXFutures() if class_code == 'SPBFUT' else MOEXStocks()
+
+
+if __name__ == '__main__':  # Точка входа при запуске этого скрипта
+    import signal
+    from collections import Counter
+
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', datefmt='%d.%m.%Y %H:%M:%S', level=logging.INFO)
+    keys = [('TQBR', f'SEC{i:04}', 'M1') for i in range(2000)]  # 2000 подписок
+    moved = sum(shard_of(key, 4) != shard_of(key, 5) for key in keys)  # Согласованное распределение: при добавлении процесса переезжает ~1/5 подписок
+    print(f'Распределение по 4 процессам: {sorted(Counter(shard_of(key, 4) for key in keys).values())}, при 5 процессах переехало {moved / len(keys):.0%}')
+
+    seconds = 3  # Время замера
+    for shards in sorted({1, 2, os.cpu_count() or 1}):  # Пропускная способность растет с кол-вом процессов до кол-ва ядер процессора
+        engine = ShardedEngine(moex_schedule, FakeShardProvider, shards=shards, worker=burst_worker)
+        for key in keys:
+            engine.subscribe(*key)
+        with engine:
+            received, started = 0, None
+            while True:
+                received += engine.read_array().size
+                if started is None and received:  # Начинаем замер с первого бара, когда процессы запустились
+                    received, started = 0, monotonic()
+                if started and monotonic() - started >= seconds:
+                    break
+            print(f'Процессов: {shards}, ядер: {os.cpu_count()}. {received / seconds:,.0f} бар в секунду, потеряно при чтении: {engine.dropped}')
+
+    engine = ShardedEngine(moex_schedule, FakeShardProvider, shards=2, worker=burst_worker, restart_delay=0.2)  # Перезапуск упавшего процесса
+    for key in keys:
+        engine.subscribe(*key)
+    with engine:
+        received = 0
+        while received < 2 * len(keys):  # Ждем, пока процессы получат бары всех подписок
+            received += engine.read_array().size
+        os.kill(engine.pids[0], signal.SIGKILL)  # Роняем процесс
+        started = monotonic()
+        while not engine.restarts and monotonic() - started < 5:  # Ждем перезапуска
+            engine.read_array()
+        bars = []
+        while not bars and monotonic() - started < 10:  # Ждем бар от перезапущенного процесса
+            bars = [bar for bar in engine.poll() if shard_of(bar[:3], engine.shards) == 0]
+        print(f'Перезапусков: {engine.restarts}, подписок без последнего бара: {engine.gaps}. Последний бар: {bars[-1] if bars else None}')
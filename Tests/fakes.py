@@ -0,0 +1,151 @@
+from random import Random  # Случайные задержки ответов сервера
+from threading import Condition, get_ident
+from time import monotonic, sleep
+
+from MarketPy.Clock import SystemClock
+from MarketPy.Bars import Bar
+
+
+class ManualClock(SystemClock):
+    """Часы, которые переводит тест. Потоки, ждущие в wait, просыпаются, когда часы дойдут до окончания ожидания или произойдет событие.
+    settle ждет, пока все потоки не заснут до будущего времени, поэтому шаги теста не зависят от скорости потоков"""
+    def __init__(self, start=0.0):
+        """
+        :param float start: Начальное время в кол-ве секунд, прошедших с 01.01.1970 00:00 UTC
+        """
+        self._now = float(start)  # Текущее время
+        self._condition = Condition()
+        self._waiters = {}  # Ждущие потоки: поток -> (окончание ожидания, событие). Окончание None, если поток работает
+
+    def time(self) -> float:
+        return self._now
+
+    def wait(self, event, timeout) -> bool:
+        me = get_ident()
+        with self._condition:
+            deadline = self._now + max(timeout, 0)
+            self._waiters[me] = (deadline, event)
+            self._condition.notify_all()
+            while not event.is_set() and self._now < deadline:
+                self._condition.wait(0.001)  # Событие не будит условие, поэтому проверяем его часто
+            self._waiters[me] = (None, event)  # Поток проснулся и работает
+            self._condition.notify_all()
+            return event.is_set()
+
+    def advance(self, seconds):
+        """Перевод часов вперед
+
+        :param float seconds: Кол-во секунд
+        """
+        with self._condition:
+            self._now += max(seconds, 0)
+            self._condition.notify_all()
+
+    def settle(self, timeout=5.0):
+        """Ожидание, пока все потоки не заснут до будущего времени
+
+        :param float timeout: Время ожидания в секундах
+        """
+        with self._condition:
+            assert self._condition.wait_for(lambda: all(deadline is not None and deadline > self._now and not event.is_set()
+                                                        for deadline, event in self._waiters.values()), timeout)
+
+    def run_until(self, timestamp, step=1.0):
+        """Перевод часов по шагам до заданного времени. После каждого шага ждем, пока все потоки не заснут
+
+        :param float timestamp: Время в кол-ве секунд, прошедших с 01.01.1970 00:00 UTC
+        :param float step: Шаг в секундах
+        """
+        while self._now < timestamp:
+            self.advance(min(step, timestamp - self._now))
+            self.settle()
+
+
+def wait_until(predicate, timeout=5.0) -> bool:
+    """Ожидание условия, которое выполняется в других потоках
+
+    :param predicate: Условие predicate()
+    :param float timeout: Время ожидания в секундах
+    :return: Условие выполнено
+    """
+    started = monotonic()
+    while not predicate():
+        if monotonic() - started > timeout:
+            return False
+        sleep(0.001)
+    return True
+
+
+class FakeBarStream:
+    """Поток обновлений бар без обращения к серверу. Присылает обновления несформированных бар подписок по команде теста, может останавливаться.
+    Сформированные бары можно запросить, как историю у провайдера"""
+    def __init__(self, push_bars, clock):
+        """
+        :param PushBars push_bars: Получатель обновлений
+        :param SystemClock clock: Часы
+        """
+        self.push_bars = push_bars  # Получатель обновлений
+        self.clock = clock  # Часы
+        self.subscriptions = []  # Подписки
+        self.stalled = False  # Поток обновлений остановлен
+        self.history = {}  # Последние обновления бар: (код режима торгов, код тикера, временной интервал, дата и время открытия) -> бар
+        self.price = 100.0  # Цена
+
+    def fetch(self, subscription):
+        """Запрос сформированного бара, как истории у провайдера
+
+        :param Subscription subscription: Подписка
+        :return: Бар
+        """
+        return self.history.get((subscription.class_code, subscription.security_code, str(subscription.tf), subscription.trade_bar_open_datetime))
+
+    def tick(self):
+        """Обновление несформированных бар всех подписок по текущему времени"""
+        now = self.clock.time()
+        for subscription in self.subscriptions:  # Пробегаемся по всем подпискам
+            schedule = subscription.schedule
+            dt_market = schedule.utc_timestamp_to_msk_datetime(now)
+            if schedule.trade_session(dt_market) is None:  # Вне торговой сессии обновлений нет
+                continue
+            dt = schedule.trade_bar_open_datetime(dt_market, subscription.tf)  # Несформированный бар
+            key = (subscription.class_code, subscription.security_code, str(subscription.tf), dt)  # Бар на сервере
+            previous = self.history.get(key)
+            self.price = round(self.price + 0.01, 2)
+            price = self.price
+            bar = Bar(dt, price, price, price, price, 10) if previous is None else Bar(dt, previous.open, max(previous.high, price), min(previous.low, price), price, previous.volume + 10)
+            self.history[key] = bar  # Сервер всегда знает бар
+            if not self.stalled:  # Если поток обновлений работает
+                self.push_bars.on_update(subscription, bar)  # то присылаем обновление
+
+
+class SkewedServer:
+    """Сервер со сдвинутыми и уходящими часами и случайной задержкой ответов. Для проверки оценки разницы часов"""
+    def __init__(self, offset=2.5, drift_ppm=50.0, latency=(0.002, 0.03), resolution=0.001, seed=0):
+        """
+        :param float offset: Начальный сдвиг часов сервера в секундах
+        :param float drift_ppm: Уход часов сервера в миллионных долях
+        :param tuple latency: Наименьшая и наибольшая задержка в одну сторону в секундах
+        :param float resolution: Точность времени в ответе в секундах
+        :param int seed: Начальное значение случайных задержек
+        """
+        self.offset = offset  # Начальный сдвиг часов
+        self.drift = drift_ppm / 1_000_000  # Уход часов
+        self.latency = latency  # Задержка в одну сторону
+        self.resolution = resolution  # Точность времени
+        self.started = monotonic()  # Начало работы
+        self._random = Random(seed)
+
+    def true_offset(self) -> float:
+        """Настоящая разница часов сервера и локальных часов в секундах"""
+        return self.offset + (monotonic() - self.started) * self.drift
+
+    def server_time(self, clock) -> float:
+        """Запрос времени сервера с задержками в обе стороны
+
+        :param BrokerClock clock: Локальные часы
+        :return: Время сервера, обрезанное до точности
+        """
+        sleep(self._random.uniform(*self.latency))  # Запрос идет до сервера
+        now = clock.local_time() + self.true_offset()
+        sleep(self._random.uniform(*self.latency))  # Ответ идет обратно
+        return now // self.resolution * self.resolution
@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime
+
+from MarketPy.Schedule import MOEXStocks
+from MarketPy.Clock import VirtualClock
+from MarketPy.AsyncSchedule import bar_times, stream_bars
+from MarketPy.Readiness import AdaptiveDelay
+
+
+class FakeProvider:
+    """Провайдер с задержкой ответа по часам расписания. Первый запрос каждого бара возвращает None"""
+    def __init__(self, clock, latency=0.1, empty_first=False):
+        self.clock = clock
+        self.latency = latency  # Задержка ответа в секундах
+        self.empty_first = empty_first  # Бар готов только со второго запроса
+        self.requests = 0
+
+    async def fetch(self, subscription):
+        self.requests += 1
+        await self.clock.sleep(self.latency)
+        if self.empty_first and subscription.attempt == 0:
+            return None
+        return {'time': subscription.trade_bar_open_datetime, 'security_code': subscription.security_code}
+
+
+def make_schedule(dt):
+    clock = VirtualClock()
+    schedule = MOEXStocks(clock=clock)  # Расписание фондового рынка Московской Биржи по виртуальным часам
+    clock.advance(schedule.msk_datetime_to_utc_timestamp(dt))
+    return clock, schedule
+
+
+def test_bar_times():
+    """Бары выдаются по сетке расписания во время их запроса, через перерыв между сессиями"""
+    clock, schedule = make_schedule(datetime(2025, 3, 12, 18, 37, 30))
+
+    async def main():
+        times = []
+        async for trade_bar_open_datetime, trade_bar_request_datetime in bar_times(schedule, 'M1'):
+            assert schedule.market_datetime_now == trade_bar_request_datetime  # Проснулись точно во время запроса
+            times.append(trade_bar_open_datetime)
+            if len(times) == 4:
+                return times
+
+    assert asyncio.run(main()) == [datetime(2025, 3, 12, 18, 37), datetime(2025, 3, 12, 18, 38), datetime(2025, 3, 12, 18, 39), datetime(2025, 3, 12, 19, 5)]
+
+
+def test_bar_times_slow_consumer():
+    """Обработка бара длится дольше интервала. Бары не пропускаются: просроченные выдаются сразу"""
+    clock, schedule = make_schedule(datetime(2025, 3, 12, 14, 0, 30))
+
+    async def main():
+        times = []
+        async for trade_bar_open_datetime, trade_bar_request_datetime in bar_times(schedule, 'M1'):
+            times.append(trade_bar_open_datetime)
+            if len(times) == 4:
+                return times
+            if len(times) == 1:  # Первый бар обрабатываем 2.5 минуты
+                await clock.sleep(150)
+
+    assert asyncio.run(main()) == [datetime(2025, 3, 12, 14, minute) for minute in range(4)]
+
+
+def test_stream_bars_many_tasks():
+    """Много подписок в одном цикле событий получают каждый бар ровно один раз"""
+    clock, schedule = make_schedule(datetime(2025, 3, 12, 14, 0, 30))
+    provider = FakeProvider(clock)
+    received = {}
+
+    def on_bar(subscription, bar):
+        received.setdefault(subscription.security_code, []).append(bar['time'])
+
+    async def main():
+        tasks = [asyncio.create_task(stream_bars('TQBR', f'SEC{i}', schedule, 'M1', provider.fetch, on_bar)) for i in range(200)]
+        await clock.sleep(5 * 60)  # 5 минут по виртуальным часам
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+    expected = [datetime(2025, 3, 12, 14, minute) for minute in range(5)]  # Бары 14:00 - 14:04 запрошены до 14:05:30
+    assert len(received) == 200
+    assert all(times == expected for times in received.values())
+    assert provider.requests == 200 * len(expected)
+    assert clock.time() - schedule.msk_datetime_to_utc_timestamp(datetime(2025, 3, 12, 14, 0, 30)) < 5 * 60 + 1  # Часы ушли на наибольшее, а не на сумму ожиданий
+
+
+def test_stream_bars_retry():
+    """Бар, не полученный с первого запроса, запрашивается повторно по политике"""
+    clock, schedule = make_schedule(datetime(2025, 3, 12, 14, 0, 30))
+    provider = FakeProvider(clock, empty_first=True)
+    received = []
+
+    async def main():
+        task = asyncio.create_task(stream_bars('TQBR', 'SBER', schedule, 'M1', provider.fetch, lambda subscription, bar: received.append(bar['time']), AdaptiveDelay()))
+        await clock.sleep(3 * 60)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
+    assert received == [datetime(2025, 3, 12, 14, minute) for minute in range(3)]
+    assert provider.requests == 2 * len(received)
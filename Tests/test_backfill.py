@@ -0,0 +1,61 @@
+from datetime import datetime
+from threading import Lock, Thread
+from time import monotonic
+
+import numpy as np
+
+from MarketPy.Schedule import MOEXStocks
+from MarketPy.Backfill import Backfill, RateLimiter, FakeHistoryProvider
+
+
+schedule = MOEXStocks()  # Расписание фондового рынка Московской Биржи
+
+
+def test_rate_limiter_spacing():
+    """Запросы из нескольких потоков идут не чаще rate в секунду после первых burst"""
+    rate, burst = 100, 5
+    limiter = RateLimiter(rate, burst)
+    times, lock = [], Lock()
+
+    def worker():
+        for _ in range(15):
+            limiter.acquire()
+            with lock:
+                times.append(monotonic())
+
+    threads = [Thread(target=worker) for _ in range(4)]
+    started = monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    times.sort()
+    assert len(times) == 60
+    for i in range(len(times)):  # В любом окне запросов их не больше burst + rate * длительность окна
+        for j in range(i + burst, len(times)):
+            assert j - i + 1 <= burst + (times[j] - times[i]) * rate + 1
+    assert times[-1] - started >= (60 - burst) / rate * 0.95  # Все запросы заняли не меньше времени по ограничению
+
+
+def test_pages_ordered_per_symbol():
+    """Страницы каждого тикера выдаются по порядку дат, все пропущенные бары получены"""
+    start, end = datetime(2025, 3, 3), datetime(2025, 3, 8)
+    grid = schedule.bars_array(start, end, 'M1')
+    provider = FakeHistoryProvider(latency=0.005, error_every=7)  # Каждый 7-й запрос с ошибкой и повторным запросом
+    backfill = Backfill(provider.fetch, page_limit=200, max_workers=8, rate=2000, burst=8, retries=3, max_pending=16)
+    rng = np.random.default_rng(0)
+    present = {}
+    for i in range(12):
+        present[f'SEC{i}'] = grid[:rng.integers(0, grid.size // 2)]  # История загружена до случайного бара
+        backfill.add('TQBR', f'SEC{i}', schedule, 'M1', present[f'SEC{i}'], start, end)
+    received = {}
+    for page, bars in backfill.run():
+        numbers = received.setdefault(page.security_code, [])
+        assert page.number == len(numbers)  # Следующая по порядку страница тикера
+        assert bars is not None
+        numbers.append(bars)
+        assert provider.max_concurrent <= 8
+    for security_code, pages in received.items():
+        bars = np.concatenate(pages)
+        assert np.all(np.diff(bars.astype(np.int64)) > 0)  # Бары тикера по возрастанию
+        np.testing.assert_array_equal(bars, grid[present[security_code].size:])  # Получены ровно пропущенные бары
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from MarketPy.Schedule import Schedule
+from MarketPy.BarStore import BarStore
+
+
+def make_bars(start, count) -> np.ndarray:
+    bars = np.zeros(count, dtype=BarStore.dtype)
+    bars['time'] = Schedule._datetime_to_seconds(start) + np.arange(count) * 60
+    bars['open'] = bars['high'] = bars['low'] = bars['close'] = 100.0 + np.arange(count)
+    bars['volume'] = np.arange(count)
+    return bars
+
+
+def test_single_writer(tmp_path):
+    """В файл пишет один писатель. Второй получает ошибку, пока первый не закрыт"""
+    first = BarStore(str(tmp_path))
+    first.append('TQBR', 'SBER', 'M1', datetime(2025, 3, 12, 10), 1.0, 1.0, 1.0, 1.0, 1)
+    second = BarStore(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        second.append('TQBR', 'SBER', 'M1', datetime(2025, 3, 12, 10, 1), 1.0, 1.0, 1.0, 1.0, 1)
+    assert second.append('TQBR', 'SBER', 'M5', datetime(2025, 3, 12, 10), 1.0, 1.0, 1.0, 1.0, 1)  # Другой файл пишется
+    first.close()
+    assert second.append('TQBR', 'SBER', 'M1', datetime(2025, 3, 12, 10, 1), 1.0, 1.0, 1.0, 1.0, 1)
+    second.close()
+    assert len(BarStore(str(tmp_path)).read('TQBR', 'SBER', 'M1')) == 2
+
+
+def test_partial_record_truncated(tmp_path):
+    """Бар, записанный не полностью при падении процесса, удаляется при открытии на запись"""
+    with BarStore(str(tmp_path)) as store:
+        store.append_array('TQBR', 'SBER', 'M1', make_bars(datetime(2025, 3, 12, 10), 3))
+        filename = store.filename('TQBR', 'SBER', 'M1')
+    with open(filename, 'ab') as f:
+        f.write(make_bars(datetime(2025, 3, 12, 10, 3), 1).tobytes()[:20])  # Часть четвертого бара
+    with BarStore(str(tmp_path)) as store:
+        assert len(store.read('TQBR', 'SBER', 'M1')) == 3  # Читатель видит только целые бары
+        assert store.append('TQBR', 'SBER', 'M1', datetime(2025, 3, 12, 10, 3), 5.0, 5.0, 5.0, 5.0, 5)
+        bars = store.read('TQBR', 'SBER', 'M1')
+        assert len(bars) == 4 and bars['close'][-1] == 5.0
+        assert store.last_datetime('TQBR', 'SBER', 'M1') == datetime(2025, 3, 12, 10, 3)
+    assert (tmp_path / 'TQBR.SBER_M1.bars').stat().st_size == 4 * BarStore.dtype.itemsize
+
+
+def test_out_of_order_append(tmp_path):
+    """Бары с той же или более ранней датой и временем не записываются. Неупорядоченный массив - ошибка"""
+    with BarStore(str(tmp_path)) as store:
+        assert store.append('TQBR', 'SBER', 'M1', datetime(2025, 3, 12, 10, 5), 1.0, 1.0, 1.0, 1.0, 1)
+        assert not store.append('TQBR', 'SBER', 'M1', datetime(2025, 3, 12, 10, 5), 2.0, 2.0, 2.0, 2.0, 2)
+        assert not store.append('TQBR', 'SBER', 'M1', datetime(2025, 3, 12, 10, 4), 2.0, 2.0, 2.0, 2.0, 2)
+        assert store.append_array('TQBR', 'SBER', 'M1', make_bars(datetime(2025, 3, 12, 10), 8)) == 2  # Записаны только 10:06 и 10:07
+        with pytest.raises(ValueError):
+            store.append_array('TQBR', 'SBER', 'M1', make_bars(datetime(2025, 3, 12, 11), 3)[::-1])
+        assert store.read('TQBR', 'SBER', 'M1')['volume'].tolist() == [1, 6, 7]
+
+
+def test_read_bounds(tmp_path):
+    """Чтение по диапазону: начало включительно, конец не включительно, границы между барами и за пределами"""
+    start = datetime(2025, 3, 12, 10)
+    with BarStore(str(tmp_path)) as store:
+        assert len(store.read('TQBR', 'SBER', 'M1')) == 0 and store.last_datetime('TQBR', 'SBER', 'M1') is None  # Файла нет
+        store.append_array('TQBR', 'SBER', 'M1', make_bars(start, 10))
+
+        def volumes(dt_from, dt_to):
+            return store.read('TQBR', 'SBER', 'M1', dt_from, dt_to)['volume'].tolist()
+
+        assert volumes(None, None) == list(range(10))
+        assert volumes(start + timedelta(minutes=2), start + timedelta(minutes=5)) == [2, 3, 4]
+        assert volumes(start + timedelta(minutes=2, seconds=30), start + timedelta(minutes=5, seconds=30)) == [3, 4, 5]  # Границы между барами
+        assert volumes(start - timedelta(hours=1), start + timedelta(minutes=1)) == [0]
+        assert volumes(start + timedelta(minutes=9), None) == [9]
+        assert volumes(start + timedelta(hours=1), None) == []
+        assert volumes(start + timedelta(minutes=5), start + timedelta(minutes=5)) == []
@@ -0,0 +1,75 @@
+import os
+from datetime import datetime, timedelta
+from threading import Thread
+from types import SimpleNamespace
+
+from MarketPy.Schedule import MOEXStocks
+from MarketPy.Checkpoint import Checkpoint
+
+
+schedule = MOEXStocks()  # Расписание фондового рынка Московской Биржи
+start = datetime(2025, 3, 12, 10, 0)  # Первый бар
+
+
+def test_concurrent_delivery(tmp_path):
+    """Много потоков выдают бары и записывают файл после каждого бара. Ни один бар не теряется, файл всегда целый"""
+    filename = str(tmp_path / 'Checkpoint.json')
+    checkpoint = Checkpoint(filename, interval=0)
+    received, errors = [], []
+    callback = checkpoint.wrap(lambda subscription, bar: received.append(bar))
+
+    def worker(number):
+        subscription = SimpleNamespace(class_code='TQBR', security_code=f'SEC{number}', schedule=schedule, tf='M1', attempt=0, trade_bar_open_datetime=None)
+        try:
+            for i in range(200):  # Бары тикера по порядку
+                callback(subscription, SimpleNamespace(dt=start + timedelta(minutes=i)))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [Thread(target=worker, args=(number,)) for number in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(received) == 8 * 200  # Все бары выданы
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []  # Временных файлов не осталось
+    restored = Checkpoint(filename)
+    assert restored.load()
+    for number in range(8):  # Последний бар каждого тикера в файле
+        assert restored.last_delivered('TQBR', f'SEC{number}', schedule, 'M1') == start + timedelta(minutes=199)
+
+
+def test_save_error_does_not_stop_delivery(tmp_path):
+    """Ошибка записи файла не мешает выдаче бар"""
+    checkpoint = Checkpoint(str(tmp_path / 'missing' / 'Checkpoint.json'), interval=0)  # Папки нет. Запись не удается
+    received = []
+    subscription = SimpleNamespace(class_code='TQBR', security_code='SBER', schedule=schedule, tf='M1', attempt=0, trade_bar_open_datetime=None)
+    checkpoint.wrap(lambda s, bar: received.append(bar))(subscription, SimpleNamespace(dt=start))
+    assert len(received) == 1
+    assert checkpoint.last_delivered('TQBR', 'SBER', schedule, 'M1') == start
+
+
+def test_missed(tmp_path):
+    """Пропущенные за время простоя бары по сетке расписания"""
+    checkpoint = Checkpoint(str(tmp_path / 'Checkpoint.json'))
+    checkpoint.update('TQBR', 'SBER', schedule, 'M1', datetime(2025, 3, 12, 14, 2))
+    missed = checkpoint.missed('TQBR', 'SBER', schedule, 'M1', datetime(2025, 3, 12, 14, 7, 10))
+    assert [dt.astype(datetime) for dt in missed] == [datetime(2025, 3, 12, 14, minute) for minute in range(3, 7)]
+    assert checkpoint.missed('TQBR', 'SBER', schedule, 'M1', datetime(2025, 3, 12, 14, 3, 1)).size == 0  # Следующий бар еще не запрошен
+
+
+def test_missed_before_request_time(tmp_path):
+    """Перезапуск между закрытием бара и временем его запроса. Бар считается пропущенным"""
+    checkpoint = Checkpoint(str(tmp_path / 'Checkpoint.json'))
+    checkpoint.update('TQBR', 'SBER', schedule, 'M1', datetime(2025, 3, 12, 14, 2))
+    missed = checkpoint.missed('TQBR', 'SBER', schedule, 'M1', datetime(2025, 3, 12, 14, 4, 2))  # Бар 14:03 закрылся, но еще не запрошен
+    assert [dt.astype(datetime) for dt in missed] == [datetime(2025, 3, 12, 14, 3)]
+
+
+def test_missed_after_session_end(tmp_path):
+    """В перерыве пропущен и последний бар сессии"""
+    checkpoint = Checkpoint(str(tmp_path / 'Checkpoint.json'))
+    checkpoint.update('TQBR', 'SBER', schedule, 'M1', datetime(2025, 3, 12, 18, 37))
+    missed = checkpoint.missed('TQBR', 'SBER', schedule, 'M1', datetime(2025, 3, 12, 18, 50))
+    assert [dt.astype(datetime) for dt in missed] == [datetime(2025, 3, 12, 18, 38), datetime(2025, 3, 12, 18, 39)]
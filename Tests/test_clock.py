@@ -0,0 +1,42 @@
+import asyncio
+
+from MarketPy.Clock import VirtualClock
+
+
+def test_concurrent_sleepers():
+    """Одновременные ожидания переводят часы на наибольшее ожидание, а не на их сумму. Задачи просыпаются по порядку окончания"""
+    clock = VirtualClock(1000.0)
+    woken = []
+
+    async def sleeper(seconds):
+        await clock.sleep(seconds)
+        woken.append((seconds, clock.time()))
+
+    async def main():
+        await asyncio.gather(*(sleeper(seconds) for seconds in (30, 10, 20, 10)))
+
+    asyncio.run(main())
+    assert clock.time() == 1030.0
+    assert woken == [(10, 1010.0), (10, 1010.0), (20, 1020.0), (30, 1030.0)]
+
+
+def test_sleep_chain_and_cancel():
+    """Задача ждет несколько раз подряд, пока другая ждет долго. Отмененное ожидание не переводит часы"""
+    clock = VirtualClock()
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            await clock.sleep(60)
+            ticks.append(clock.time())
+
+    async def main():
+        long_sleep = asyncio.create_task(clock.sleep(10_000))
+        await ticker()
+        long_sleep.cancel()
+        await asyncio.gather(long_sleep, return_exceptions=True)
+        await clock.sleep(1)
+
+    asyncio.run(main())
+    assert ticks == [60.0, 120.0, 180.0, 240.0, 300.0]
+    assert clock.time() == 301.0
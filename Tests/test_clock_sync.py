@@ -0,0 +1,59 @@
+from datetime import timedelta
+
+from MarketPy.Schedule import MOEXStocks
+from MarketPy.Dispatcher import Subscription
+from MarketPy.ClockSync import OffsetEstimator, BrokerClock, MarginDelay
+
+from fakes import SkewedServer
+
+
+def test_offset_from_shortest_round_trip():
+    """Разница часов берется из замера с наименьшим временем ответа, ошибка - половина его времени ответа"""
+    estimator = OffsetEstimator(window=4)
+    estimator.observe(100.0, 102.6, 100.2)  # Долгий ответ: сервер поставил время не посередине
+    estimator.observe(200.0, 202.505, 200.01)  # Быстрый ответ
+    estimator.observe(300.0, 302.45, 300.1)
+    assert abs(estimator.offset - 2.5) < 1e-9
+    assert abs(estimator.error - 0.005) < 1e-9
+    for i in range(4):  # Быстрый замер уходит из окна
+        estimator.observe(400.0 + i, 402.6 + i, 400.2 + i)
+    assert abs(estimator.offset - 2.5) < 1e-9 and abs(estimator.error - 0.1) < 1e-9
+
+
+def test_offset_follows_drift():
+    """Часы сервера уходят. Оценка по окну последних замеров следует за уходом, а не остается на начальной разнице"""
+    drift, window, period = 1e-3, 8, 10.0  # Уход 1 мс в секунду, замер раз в 10 секунд
+    estimator = OffsetEstimator(window=window)
+    for i in range(100):
+        local = i * period
+        estimator.observe(local, local + 2.5 + drift * local + 0.001, local + 0.002)  # Ответ за 2 мс, сервер ставит время посередине
+        true_offset = 2.5 + drift * local
+    assert abs(estimator.offset - true_offset) <= drift * window * period  # Не дальше ухода за окно
+    assert estimator.offset - 2.5 > drift * 900  # Далеко от начальной разницы
+
+
+def test_broker_clock_with_skewed_server():
+    """Часы сервера по замерам до сервера со сдвигом часов и случайной задержкой. Перевод системных часов не сдвигает часы сервера"""
+    server = SkewedServer(offset=2.5, drift_ppm=0, latency=(0.0005, 0.003), resolution=0.001)
+    step = [0.0]  # Перевод системных часов
+    clock = BrokerClock(OffsetEstimator(window=32, resolution=server.resolution), wall=lambda: 1_700_000_000.0 + step[0])
+    for _ in range(16):
+        clock.measure(lambda: server.server_time(clock))
+    assert clock.estimator.samples == 16
+    assert abs(clock.estimator.offset - server.true_offset()) <= clock.estimator.error
+    assert clock.estimator.error < 0.01
+    before = clock.time()
+    step[0] = 3600.0  # Системные часы перевели на час
+    assert abs(clock.time() - before) < 1.0
+
+
+def test_margin_delay():
+    """Задержка запроса - запас на ошибку оценки, но не больше Schedule.delta. Без замеров - Schedule.delta"""
+    schedule = MOEXStocks()
+    subscription = Subscription('TQBR', 'SBER', schedule, 'M1', None)
+    clock = BrokerClock()
+    policy = MarginDelay(clock)
+    assert clock.margin == timedelta.max
+    assert policy.delay(subscription) == schedule.delta
+    clock.observe(100.0, 100.5, 100.02)
+    assert policy.delay(subscription) == clock.margin == timedelta(seconds=0.01)
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+from threading import Event, Lock
+from time import sleep
+
+import pytest
+
+from MarketPy.Schedule import MOEXStocks
+from MarketPy.Dispatcher import Dispatcher
+from MarketPy.Readiness import AdaptiveDelay
+from MarketPy.Metrics import Metrics
+from MarketPy.Bars import Bar
+
+from fakes import ManualClock, wait_until
+
+
+def make(dt, max_workers=8, readiness=None):
+    clock = ManualClock(MOEXStocks().msk_datetime_to_utc_timestamp(dt))
+    schedule = MOEXStocks(clock=clock)  # Расписание фондового рынка Московской Биржи по часам теста
+    metrics = Metrics('test')
+    dispatcher = Dispatcher(max_workers=max_workers, readiness=readiness, metrics=metrics, clock=clock)
+    return clock, schedule, metrics, dispatcher
+
+
+class Requests:
+    """Запросы бар: запоминает запрошенные бары и кол-во одновременных запросов. Запрос может ждать разрешения теста"""
+    def __init__(self, release=None):
+        """
+        :param Event release: Разрешение завершить запрос. По умолчанию запросы завершаются сразу
+        """
+        self.release = release  # Разрешение завершить запрос
+        self.requested = []  # Запрошенные бары: (код тикера, дата и время открытия)
+        self.running = 0  # Кол-во выполняемых запросов
+        self.max_running = 0  # Наибольшее кол-во одновременных запросов
+        self._lock = Lock()
+
+    def fetch(self, subscription):
+        with self._lock:
+            self.requested.append((subscription.security_code, subscription.trade_bar_open_datetime))
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        if self.release is not None:  # Если запрос ждет разрешения
+            self.release.wait(5)
+        with self._lock:
+            self.running -= 1
+        return Bar(subscription.trade_bar_open_datetime, 1.0, 1.0, 1.0, 1.0, 1)
+
+
+def test_equal_deadlines_requested_together():
+    """Подписки с одинаковыми датой и временем запроса запрашиваются вместе, когда наступает это время, и не раньше"""
+    clock, schedule, metrics, dispatcher = make(datetime(2025, 3, 12, 14, 0, 30))
+    requests = Requests()
+    for security_code in ('SBER', 'GAZP', 'LKOH'):
+        dispatcher.subscribe('TQBR', security_code, schedule, 'M1', requests.fetch)
+    dispatcher.subscribe('TQBR', 'VTBR', schedule, 'M5', requests.fetch)  # Бар закрывается позже
+    dispatcher.start()
+    deadline = schedule.msk_datetime_to_utc_timestamp(datetime(2025, 3, 12, 14, 1)) + schedule.delta.total_seconds()  # Дата и время запроса бара 14:00
+    clock.run_until(deadline - 0.5)
+    assert requests.requested == []  # Время запроса еще не наступило
+    clock.advance(0.5)
+    assert wait_until(lambda: len(requests.requested) == 3)
+    clock.settle()
+    dispatcher.close()
+    assert sorted(requests.requested) == [(security_code, datetime(2025, 3, 12, 14, 0)) for security_code in ('GAZP', 'LKOH', 'SBER')]
+    snapshot = metrics.snapshot()
+    assert len({snapshot[('TQBR', security_code, 'M1')]['wake_lag']['sum'] for security_code in ('SBER', 'GAZP', 'LKOH')}) == 1  # Все подписки запущены вместе, с одним опозданием
+    assert ('TQBR', 'VTBR', 'M5') not in snapshot
+
+
+def test_pool_bound():
+    """Одновременно выполняется не больше max_workers запросов. Остальные ждут свободного потока"""
+    clock, schedule, metrics, dispatcher = make(datetime(2025, 3, 12, 14, 0, 30), max_workers=2)
+    release = Event()
+    requests = Requests(release)
+    for security_code in ('SBER', 'GAZP', 'LKOH', 'VTBR', 'ROSN'):
+        dispatcher.subscribe('TQBR', security_code, schedule, 'M1', requests.fetch)
+    dispatcher.start()
+    clock.run_until(schedule.msk_datetime_to_utc_timestamp(datetime(2025, 3, 12, 14, 1)) + schedule.delta.total_seconds())
+    assert wait_until(lambda: requests.running == 2)
+    sleep(0.05)  # Остальные запросы не начинаются, пока заняты оба потока
+    assert len(requests.requested) == 2
+    release.set()
+    assert wait_until(lambda: len(requests.requested) == 5)
+    dispatcher.close()
+    assert requests.max_running == 2
+
+
+def test_close_cancels_pending():
+    """Закрытие отменяет запросы, ждущие свободного потока. Выполняемый запрос завершается, но подписка больше не ставится в очередь"""
+    clock, schedule, metrics, dispatcher = make(datetime(2025, 3, 12, 14, 0, 30), max_workers=1)
+    release = Event()
+    requests = Requests(release)
+    for security_code in ('SBER', 'GAZP', 'LKOH'):
+        dispatcher.subscribe('TQBR', security_code, schedule, 'M1', requests.fetch)
+    dispatcher.start()
+    clock.run_until(schedule.msk_datetime_to_utc_timestamp(datetime(2025, 3, 12, 14, 1)) + schedule.delta.total_seconds())
+    assert wait_until(lambda: requests.running == 1)
+    dispatcher.close(wait=False)  # Запросы в очереди пула отменяются
+    release.set()
+    assert wait_until(lambda: requests.running == 0)
+    clock.advance(120)  # Следующие бары уже закрылись
+    sleep(0.05)
+    assert len(requests.requested) == 1
+    with pytest.raises(RuntimeError):
+        dispatcher.subscribe('TQBR', 'SBER', schedule, 'M1', requests.fetch)
+
+
+def test_slow_retry_does_not_skip_next_bar():
+    """Последний повторный запрос бара вернулся после закрытия следующего бара. Следующий бар запрашивается, а не пропускается"""
+    clock, schedule, metrics, dispatcher = make(datetime(2025, 3, 12, 14, 0, 30), readiness=AdaptiveDelay())  # Идет бар 14:00
+    requested = []
+
+    def fetch(subscription):
+        requested.append(subscription.trade_bar_open_datetime)
+        clock.advance(40)  # Получение бара с повторным запросом занимает больше минуты
+        return None
+
+    dispatcher.subscribe('TQBR', 'SBER', schedule, 'M1', fetch)
+    dispatcher.start()
+    for _ in range(10_000):  # Переводим часы, пока не будет 8 запросов
+        if len(requested) >= 8:
+            break
+        clock.advance(0.5)
+        clock.settle()
+    dispatcher.close()
+    bars = sorted(set(requested))  # Запрошенные бары. Бар мог запрашиваться повторно
+    assert len(bars) < len(requested)  # Были повторные запросы дольше интервала
+    assert bars == list(schedule.iter_bars(bars[0], bars[-1] + timedelta(minutes=1), 'M1'))  # Ни один бар не пропущен
+
+
+def test_next_bar_after_break():
+    """После последнего бара перед перерывом запрашивается первый бар следующей сессии"""
+    clock, schedule, metrics, dispatcher = make(datetime(2025, 3, 12, 18, 49, 30))  # Вечерняя сессия еще не началась
+    requests = Requests()
+    dispatcher.subscribe('TQBR', 'SBER', schedule, 'M1', requests.fetch)
+    dispatcher.start()
+    clock.run_until(schedule.msk_datetime_to_utc_timestamp(datetime(2025, 3, 12, 19, 7)), step=5)
+    assert wait_until(lambda: len(requests.requested) >= 2)
+    dispatcher.close()
+    assert requests.requested[:2] == [('SBER', datetime(2025, 3, 12, 18, 39)),  # Последний бар основной сессии
+                                      ('SBER', datetime(2025, 3, 12, 19, 5))]  # Первый бар вечерней сессии
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+from datetime import datetime
+from threading import Thread
+
+import pytest
+
+from MarketPy.Schedule import MOEXStocks, MOEXFutures
+from MarketPy.Dispatcher import Subscription
+from MarketPy.EventBus import BarBus, Listener
+from MarketPy.Bars import Bar
+
+
+def test_listener_is_abstract():
+    """Подписчик без put создать нельзя"""
+    with pytest.raises(TypeError):
+        Listener(('TQBR', 'SBER', 'M1'))
+
+
+def test_publish_shared_bar():
+    """Все подписчики тикера получают один и тот же объект бара"""
+    schedule = MOEXStocks()
+    bus = BarBus()
+    received = []
+    bus.subscribe('TQBR', 'SBER', schedule, 'M1', None, lambda subscription, bar: received.append(bar))
+    queue = bus.subscribe('TQBR', 'SBER', schedule, 'M1', None)
+    bar = Bar(datetime(2025, 3, 12, 14, 0), 1.0, 1.0, 1.0, 1.0, 1)
+    bus.publish(Subscription('TQBR', 'SBER', schedule, 'M1', None), bar)
+    assert received == [bar] and received[0] is bar
+    assert queue.get(0)[1] is bar  # Очередь выдает (подписка, бар)
+
+
+def test_different_schedule_logged(caplog):
+    """Подписчик с другим расписанием тикера пишется в лог"""
+    bus = BarBus()
+    bus.subscribe('TQBR', 'SBER', MOEXStocks(), 'M1', None)
+    with caplog.at_level(logging.WARNING, logger='Schedule.EventBus'):
+        bus.subscribe('TQBR', 'SBER', MOEXFutures(), 'M1', None)
+    assert 'MOEXFutures' in caplog.text
+
+
+class FakeSource:
+    """Источник бар: запоминает подписки и их отмену"""
+    def __init__(self):
+        self.subscriptions = []
+        self.unsubscribed = []
+
+    def subscribe(self, class_code, security_code, schedule, tf, fetch, callback):
+        subscription = Subscription(class_code, security_code, schedule, tf, fetch, callback)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.unsubscribed.append(subscription)
+
+
+def make_bar(minute):
+    return Bar(datetime(2025, 3, 12, 14, minute), 1.0, 1.0, 1.0, 1.0, 1)
+
+
+def test_one_source_subscription_per_key():
+    """Подписчики одного тикера делят одну подписку источника. Последний подписчик отменяет ее"""
+    schedule = MOEXStocks()
+    source = FakeSource()
+    bus = BarBus(source)
+    first = bus.subscribe('TQBR', 'SBER', schedule, 'M1', None, lambda subscription, bar: None)
+    second = bus.subscribe('TQBR', 'SBER', schedule, 'M1', None)
+    other = bus.subscribe('TQBR', 'SBER', schedule, 'M5', None)
+    assert [str(subscription.tf) for subscription in source.subscriptions] == ['M1', 'M5']
+    assert bus.subscription('TQBR', 'SBER', 'M1') is source.subscriptions[0]
+    bus.unsubscribe(first)
+    assert source.unsubscribed == []  # Подписчик тикера остался
+    bus.unsubscribe(second)
+    assert source.unsubscribed == [source.subscriptions[0]]
+    assert bus.subscription('TQBR', 'SBER', 'M1') is None and bus.listeners('TQBR', 'SBER', 'M1') == ()
+    assert second.closed
+    assert bus.listeners('TQBR', 'SBER', 'M5') == (other,)
+
+
+def test_drop_oldest():
+    """Переполненная очередь отбрасывает самый старый бар"""
+    schedule = MOEXStocks()
+    bus = BarBus()
+    queue = bus.subscribe('TQBR', 'SBER', schedule, 'M1', None, listener=bus.listen('TQBR', 'SBER', 'M1', maxsize=2, policy='drop_oldest'))
+    subscription = Subscription('TQBR', 'SBER', schedule, 'M1', None)
+    for minute in range(5):
+        bus.publish(subscription, make_bar(minute))
+    assert (queue.received, queue.dropped, len(queue)) == (5, 3, 2)
+    assert [queue.get(0)[1].dt.minute for _ in range(2)] == [3, 4]
+    assert queue.get(0) is None
+
+
+def test_block():
+    """Переполненная очередь ждет, пока подписчик заберет бар. Отмена подписки освобождает ждущую публикацию"""
+    schedule = MOEXStocks()
+    bus = BarBus()
+    queue = bus.subscribe('TQBR', 'SBER', schedule, 'M1', None, listener=bus.listen('TQBR', 'SBER', 'M1', maxsize=1, policy='block'))
+    subscription = Subscription('TQBR', 'SBER', schedule, 'M1', None)
+    bus.publish(subscription, make_bar(0))
+    publisher = Thread(target=bus.publish, args=(subscription, make_bar(1)))
+    publisher.start()
+    publisher.join(0.1)
+    assert publisher.is_alive()  # Публикация ждет места в очереди
+    assert queue.get(1)[1].dt.minute == 0
+    publisher.join(1)
+    assert not publisher.is_alive() and queue.get(1)[1].dt.minute == 1
+    bus.publish(subscription, make_bar(2))
+    publisher = Thread(target=bus.publish, args=(subscription, make_bar(3)))
+    publisher.start()
+    publisher.join(0.1)
+    bus.unsubscribe(queue)  # Отмена подписки
+    publisher.join(1)
+    assert not publisher.is_alive()
+    assert queue.dropped == 0 and queue.received == 3
+
+
+def test_async_listener():
+    """Асинхронный итератор получает бары из другого потока по порядку и завершается при отмене подписки"""
+    schedule = MOEXStocks()
+    bus = BarBus()
+    subscription = Subscription('TQBR', 'SBER', schedule, 'M1', None)
+
+    async def main():
+        listener = bus.subscribe('TQBR', 'SBER', schedule, 'M1', None, listener=bus.listen('TQBR', 'SBER', 'M1', loop=asyncio.get_running_loop()))
+
+        def produce():
+            for minute in range(3):
+                bus.publish(subscription, make_bar(minute))
+            bus.unsubscribe(listener)
+
+        producer = Thread(target=produce)
+        producer.start()
+        minutes = [bar.dt.minute async for _, bar in listener]
+        producer.join()
+        return minutes
+
+    assert asyncio.run(asyncio.wait_for(main(), 5)) == [0, 1, 2]
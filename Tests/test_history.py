@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import numpy as np
+
+from MarketPy.Schedule import MOEXStocks
+from MarketPy.History import HistoryChecker
+
+
+def test_check():
+    """Пропуски, бары вне сетки внутри диапазона и бары вне диапазона считаются отдельно"""
+    schedule = MOEXStocks()
+    start, end = datetime(2025, 3, 12, 6, 0), datetime(2025, 3, 12, 8, 0)
+    grid = schedule.bars_array(start, end, 'M1')  # 07:00 - 07:59
+    assert grid.size == 60
+    present = np.delete(grid, [0, 10, 11, 12, 59])  # Пропущены 07:00, 07:10 - 07:12, 07:59
+    present = np.append(present, np.array(['2025-03-12T06:30', '2025-03-11T23:00', '2025-03-12T08:00'], dtype='datetime64[s]'))  # Вне сетки в диапазоне, до и после диапазона
+    checker = HistoryChecker(page_limit=20)
+    gaps = checker.check('TQBR', 'SBER', schedule, 'M1', present, start, end)
+    assert (gaps.expected, gaps.present, gaps.unexpected, gaps.outside) == (60, 55, 1, 2)
+    assert gaps.missing.astype(datetime).tolist() == [datetime(2025, 3, 12, 7, minute) for minute in (0, 10, 11, 12, 59)]
+    assert (gaps.gaps, gaps.longest_gap) == (3, 3)
+    assert [(window.first, window.last, window.bars, window.missing) for window in gaps.windows] == [
+        (datetime(2025, 3, 12, 7, 0), datetime(2025, 3, 12, 7, 12), 13, 4),  # 07:00 - 07:12 в одном запросе до 20 бар
+        (datetime(2025, 3, 12, 7, 59), datetime(2025, 3, 12, 7, 59), 1, 1)]
+    assert checker.stats()[('TQBR', 'SBER', 'M1')]['outside'] == 2
+
+
+def test_check_complete():
+    """Полная история без пропусков"""
+    schedule = MOEXStocks()
+    start, end = datetime(2025, 3, 12), datetime(2025, 3, 13)
+    gaps = HistoryChecker().check('TQBR', 'SBER', schedule, 'M15', schedule.bars_array(start, end, 'M15'), start, end)
+    assert gaps.missing.size == 0 and gaps.windows == [] and gaps.completeness == 1.0
+
+
+def test_windows_greedy():
+    """Окна покрывают все пропуски наименьшим кол-вом запросов и не превышают ограничение"""
+    assert HistoryChecker.windows(np.array([0, 1, 2, 5, 9, 10, 20]), 5) == [(0, 2, 3), (5, 9, 2), (10, 10, 1), (20, 20, 1)]
+    assert HistoryChecker.windows(np.array([], dtype=np.int64), 5) == []
+    rng = np.random.default_rng(0)
+    for _ in range(50):
+        missing = np.sort(rng.choice(200, rng.integers(1, 60), replace=False))
+        limit = int(rng.integers(1, 40))
+        windows = HistoryChecker.windows(missing, limit)
+        assert all(last - first + 1 <= limit for first, last, _ in windows)
+        assert sum(count for _, _, count in windows) == missing.size
+        least, covered = 0, -1  # Наименьшее кол-во окон: каждое окно начинается с первого непокрытого пропуска
+        for index in missing.tolist():
+            if index > covered:
+                least += 1
+                covered = index + limit - 1
+        assert len(windows) == least
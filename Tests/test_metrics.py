@@ -0,0 +1,68 @@
+from gc import collect
+from weakref import ref
+
+from MarketPy.Schedule import MOEXStocks
+from MarketPy.Dispatcher import Subscription
+from MarketPy.Metrics import Metrics, prometheus_text
+
+
+def make_subscription(security_code='SBER'):
+    return Subscription('TQBR', security_code, MOEXStocks(), 'M1', None)
+
+
+def test_snapshot():
+    """Счетчики складываются, корзины гистограммы накопительные, последняя корзина +Inf"""
+    metrics = Metrics('test', buckets=(0.1, 1.0))
+    subscription = make_subscription()
+    metrics.increment(subscription, 'requests')
+    metrics.increment(subscription, 'requests', 2)
+    for seconds in (0.05, 0.1, 0.5, 5.0):
+        metrics.observe(subscription, 'round_trip', seconds)
+    values = metrics.snapshot()[('TQBR', 'SBER', 'M1')]
+    assert values['requests'] == 3 and values['bars'] == 0
+    assert values['round_trip'] == {'count': 4, 'sum': 5.65, 'buckets': [(0.1, 2), (1.0, 3), (float('inf'), 4)]}
+    assert values['wake_lag'] == {'count': 0, 'sum': 0.0, 'buckets': [(0.1, 0), (1.0, 0), (float('inf'), 0)]}
+
+
+def test_disabled():
+    """Выключенные метрики ничего не учитывают"""
+    metrics = Metrics('test', enabled=False)
+    subscription = make_subscription()
+    metrics.increment(subscription, 'requests')
+    metrics.observe(subscription, 'round_trip', 0.1)
+    assert metrics.snapshot() == {}
+
+
+def test_series_per_key():
+    """Копии подписок одного тикера учитываются в одних метриках и не накапливаются"""
+    metrics = Metrics('test')
+    for _ in range(1000):
+        metrics.increment(make_subscription(), 'requests')
+    snapshot = metrics.snapshot()
+    assert list(snapshot) == [('TQBR', 'SBER', 'M1')]
+    assert snapshot[('TQBR', 'SBER', 'M1')]['requests'] == 1000
+    subscription = make_subscription()
+    metrics.increment(subscription, 'requests')
+    reference = ref(subscription)
+    del subscription
+    collect()
+    assert reference() is None  # Метрики не держат подписку
+
+
+def test_prometheus_text():
+    """Текст Prometheus: счетчики, корзины с +Inf, сумма и кол-во. Значения меток экранируются"""
+    metrics = Metrics('al"or\\', buckets=(0.5,))
+    subscription = make_subscription('SB\nER')
+    metrics.increment(subscription, 'bars')
+    metrics.observe(subscription, 'bar_latency', 0.25)
+    lines = prometheus_text([metrics]).splitlines()
+    labels = 'provider="al\\"or\\\\",class_code="TQBR",security_code="SB\\nER",tf="M1"'
+    assert '# TYPE marketpy_bars_total counter' in lines
+    assert f'marketpy_bars_total{{{labels}}} 1' in lines
+    assert f'marketpy_requests_total{{{labels}}} 0' in lines
+    assert '# TYPE marketpy_bar_latency_seconds histogram' in lines
+    assert f'marketpy_bar_latency_seconds_bucket{{{labels},le="0.5"}} 1' in lines
+    assert f'marketpy_bar_latency_seconds_bucket{{{labels},le="+Inf"}} 1' in lines
+    assert f'marketpy_bar_latency_seconds_sum{{{labels}}} 0.25' in lines
+    assert f'marketpy_bar_latency_seconds_count{{{labels}}} 1' in lines
+    assert metrics.to_prometheus() == prometheus_text([metrics])
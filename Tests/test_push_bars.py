@@ -0,0 +1,139 @@
+from datetime import datetime
+from threading import Event, Lock
+from time import sleep
+
+from MarketPy.Schedule import MOEXStocks
+from MarketPy.Clock import VirtualClock
+from MarketPy.PushBars import PushBars
+from MarketPy.Bars import Bar
+
+from fakes import ManualClock, FakeBarStream
+
+
+def make(dt, fetch=None):
+    clock = VirtualClock()
+    schedule = MOEXStocks(clock=clock)  # Расписание фондового рынка Московской Биржи по виртуальным часам
+    clock.advance(schedule.msk_datetime_to_utc_timestamp(dt))
+    received, requested, lock = [], [], Lock()
+
+    def fetch_bar(request):
+        with lock:
+            requested.append(request.trade_bar_open_datetime)
+        return Bar(request.trade_bar_open_datetime, 1.0, 1.0, 1.0, 1.0, 1)
+
+    def on_bar(subscription, bar):
+        with lock:
+            received.append(bar.dt)
+
+    push_bars = PushBars(clock=clock)  # Поток проверок не запускаем: сторож не успевает сработать
+    subscription = push_bars.subscribe('TQBR', 'SBER', schedule, 'M1', fetch or fetch_bar, on_bar)
+    return clock, schedule, push_bars, subscription, received, requested
+
+
+def test_next_bar_update_before_watchdog():
+    """Обновлений бара не было, а обновление следующего бара пришло раньше сторожа. Бар запрашивается сразу, а не теряется"""
+    clock, schedule, push_bars, subscription, received, requested = make(datetime(2025, 3, 12, 14, 0, 30))
+    clock.advance(35)  # 14:01:05. Обновлений бара 14:00 не было
+    push_bars.on_update(subscription, Bar(datetime(2025, 3, 12, 14, 1), 1.0, 1.0, 1.0, 1.0, 1))
+    push_bars._executor.shutdown(wait=True)  # Ждем запросов. close() отменяет еще не начатые
+    push_bars.close()
+    assert requested == [datetime(2025, 3, 12, 14, 0)]
+    assert received == [datetime(2025, 3, 12, 14, 0)]
+    assert subscription.trade_bar_open_datetime == datetime(2025, 3, 12, 14, 1)
+
+
+def test_bars_without_updates_between():
+    """Обновление пришло через несколько бар без обновлений. Запрашиваются все бары между ними"""
+    clock, schedule, push_bars, subscription, received, requested = make(datetime(2025, 3, 12, 14, 0, 30))
+    push_bars.on_update(subscription, Bar(datetime(2025, 3, 12, 14, 0), 1.0, 1.0, 1.0, 1.0, 1))
+    clock.advance(185)  # 14:03:35
+    push_bars.on_update(subscription, Bar(datetime(2025, 3, 12, 14, 3), 1.0, 1.0, 1.0, 1.0, 1))
+    push_bars._executor.shutdown(wait=True)
+    push_bars.close()
+    assert sorted(requested) == [datetime(2025, 3, 12, 14, 1), datetime(2025, 3, 12, 14, 2)]
+    assert received == [datetime(2025, 3, 12, 14, minute) for minute in range(3)]  # Бар 14:00 сформирован обновлением
+
+
+def test_polls_delivered_in_order():
+    """Запрос раннего бара завершается позже запроса следующего. Бары все равно выдаются по порядку"""
+    later_done = Event()  # Запрос бара 14:02 завершен
+
+    def fetch(request):
+        if request.trade_bar_open_datetime == datetime(2025, 3, 12, 14, 1):  # Запрос бара 14:01 завершается последним
+            later_done.wait(5)
+            sleep(0.05)  # Бар 14:02 уже в очереди выдачи
+        else:
+            later_done.set()
+        return Bar(request.trade_bar_open_datetime, 1.0, 1.0, 1.0, 1.0, 1)
+
+    clock, schedule, push_bars, subscription, received, requested = make(datetime(2025, 3, 12, 14, 0, 30), fetch)
+    push_bars.on_update(subscription, Bar(datetime(2025, 3, 12, 14, 0), 1.0, 1.0, 1.0, 1.0, 1))
+    clock.advance(185)  # 14:03:35
+    push_bars.on_update(subscription, Bar(datetime(2025, 3, 12, 14, 3), 1.0, 1.0, 1.0, 1.0, 1))
+    push_bars._executor.shutdown(wait=True)
+    push_bars.close()
+    assert received == [datetime(2025, 3, 12, 14, minute) for minute in range(3)]
+
+
+def test_stream_stall_and_resume():
+    """Поток обновлений работает, останавливается и восстанавливается. Проверки идут в потоке сторожа по часам теста.
+    Каждый бар выдается ровно один раз, по порядку и совпадает с баром на сервере. Позднее обновление бара, запрошенного сторожем, пропускается"""
+    start = datetime(2025, 3, 12, 14, 0, 30)
+    clock = ManualClock(MOEXStocks().msk_datetime_to_utc_timestamp(start))
+    schedule = MOEXStocks(clock=clock)
+    received, lock = [], Lock()
+
+    def on_bar(subscription, bar):
+        with lock:
+            received.append(bar)
+
+    push_bars = PushBars(clock=clock)
+    stream = FakeBarStream(push_bars, clock)
+    subscription = push_bars.subscribe('TQBR', 'SBER', schedule, 'M1', stream.fetch, on_bar)
+    stream.subscriptions.append(subscription)
+    push_bars.start()
+    for second in range(1, 15 * 60 + 1):  # 15 минут по секунде
+        stream.stalled = 5 * 60 <= second < 10 * 60  # С 14:05:30 до 14:10:30 поток обновлений остановлен
+        clock.advance(1)
+        stream.tick()
+        if second == 10 * 60:  # Поток восстановился и прислал последнее обновление бара, который уже запросил сторож
+            late = stream.history[('TQBR', 'SBER', 'M1', datetime(2025, 3, 12, 14, 9))]
+            push_bars.on_update(subscription, late)
+        clock.settle()
+    expected = [stream.history[('TQBR', 'SBER', 'M1', start.replace(minute=minute, second=0))] for minute in range(15)]  # Бары 14:00 - 14:14
+    for _ in range(500):  # Ждем запросов сторожа
+        with lock:
+            if len(received) >= len(expected):
+                break
+        sleep(0.01)
+    push_bars.close()
+    assert received == expected
+    assert subscription.trade_bar_open_datetime == datetime(2025, 3, 12, 14, 15)
+
+
+def test_late_update_of_polled_bar():
+    """Сторож запросил бар, а обновление этого бара пришло, пока запрос не завершен. Бар выдается один раз: его формирует сторож"""
+    polled, release = Event(), Event()
+
+    def fetch(request):
+        polled.set()
+        release.wait(5)  # Запрос еще не завершен
+        return Bar(request.trade_bar_open_datetime, 2.0, 2.0, 2.0, 2.0, 2)
+
+    start = datetime(2025, 3, 12, 14, 0, 30)
+    clock = ManualClock(MOEXStocks().msk_datetime_to_utc_timestamp(start))
+    schedule = MOEXStocks(clock=clock)
+    received = []
+    push_bars = PushBars(clock=clock)
+    subscription = push_bars.subscribe('TQBR', 'SBER', schedule, 'M1', fetch, lambda subscription, bar: received.append(bar))
+    push_bars.start()
+    clock.advance(30 + schedule.delta.total_seconds() + 1)  # 14:01:04. Обновлений не было, сторож запрашивает бар 14:00
+    assert polled.wait(5)
+    clock.settle()
+    push_bars.on_update(subscription, Bar(datetime(2025, 3, 12, 14, 0), 1.0, 1.0, 1.0, 1.0, 1))  # Позднее обновление запрашиваемого бара
+    push_bars.on_update(subscription, Bar(datetime(2025, 3, 12, 14, 1), 1.0, 1.0, 1.0, 1.0, 1))  # Обновление следующего бара
+    release.set()
+    push_bars._executor.shutdown(wait=True)
+    push_bars.close()
+    assert received == [Bar(datetime(2025, 3, 12, 14, 0), 2.0, 2.0, 2.0, 2.0, 2)]
+    assert subscription.trade_bar_open_datetime == datetime(2025, 3, 12, 14, 1)
@@ -0,0 +1,32 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+from MarketPy.Schedule import MOEXStocks, Timeframe
+from MarketPy.Readiness import AdaptiveDelay
+
+
+schedule = MOEXStocks()  # Расписание фондового рынка Московской Биржи
+
+
+def subscription(tf):
+    return SimpleNamespace(schedule=schedule, tf=tf, attempt=1)
+
+
+def test_timeframe_and_string_share_delays():
+    """Подписки с временнЫм интервалом строкой и Timeframe ведут общие задержки"""
+    readiness = AdaptiveDelay(min_delay=timedelta(0))
+    readiness.observe(subscription('M1'), timedelta(seconds=1))
+    readiness.observe(subscription(Timeframe.parse('M1')), timedelta(seconds=1))
+    assert readiness.state() == {'M1': [1.0, 1.0]}
+    assert readiness.delay(subscription(Timeframe.parse('M1'))) == timedelta(seconds=1)
+
+
+def test_load_state():
+    """Задержки, восстановленные из state(), находятся для подписок с Timeframe"""
+    readiness = AdaptiveDelay(min_delay=timedelta(0))
+    readiness.observe(subscription(Timeframe.parse('M5')), timedelta(seconds=2))
+    restored = AdaptiveDelay(min_delay=timedelta(0))
+    restored.load_state(readiness.state())
+    assert restored.delay(subscription(Timeframe.parse('M5'))) == timedelta(seconds=2)
+    assert restored.delay(subscription('M5')) == timedelta(seconds=2)
+    assert restored.delay(subscription('M15')) == schedule.delta  # Задержек нет
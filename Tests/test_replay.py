@@ -0,0 +1,23 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from MarketPy.Schedule import MOEXStocks, Calendar
+from MarketPy.Clock import VirtualClock
+from MarketPy.Replay import replay, FakeProvider
+
+
+@pytest.mark.parametrize('tf', ['M1', 'M15', 'H1', 'D1'])
+def test_replay_month(tf):
+    """Месяц расписания с праздниками и переходом на летнее время по виртуальным часам: все бары запрошены, опоздание не больше задержки ответа"""
+    calendar = Calendar(holidays=[date(2011, 3, 7), date(2011, 3, 8)])  # Праздничные дни марта 2011 года. 27.03.2011 переход на летнее время
+    start, end = datetime(2011, 3, 1), datetime(2011, 4, 1)
+    clock = VirtualClock()
+    schedule = MOEXStocks(calendar, clock)
+    clock.advance(schedule.msk_datetime_to_utc_timestamp(start))
+    provider = FakeProvider(clock, latency=0.05)  # Ответ за 50 мс
+    report = replay(schedule, tf, end, provider.fetch)
+    assert report.missed(schedule, start, end) == []
+    assert len(report.requests) == provider.requests
+    assert report.max_lag <= timedelta(seconds=1)  # Время на бирже с точностью до секунды
+    assert all(request.bar is not None for request in report.requests)
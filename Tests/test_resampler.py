@@ -0,0 +1,103 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from MarketPy.Schedule import Schedule, MOEXStocks, MOEXBonds, MOEXFutures
+from MarketPy.BarStore import BarStore
+from MarketPy.Resampler import Resampler, resample
+
+
+TFS = ('M2', 'M5', 'M10', 'M15', 'M30', 'M60', 'H1', 'D1', 'W1')  # Старшие временнЫе интервалы
+
+
+def minute_bars(schedule, dt_from, dt_to, gaps=0.02, seed=0) -> np.ndarray:
+    """Минутные бары по расписанию со случайными пропусками
+
+    :param Schedule schedule: Расписание торгов
+    :param datetime dt_from: Дата и время открытия первого бара
+    :param datetime dt_to: Дата и время окончания. Не включительно
+    :param float gaps: Доля пропущенных минутных бар
+    :param int seed: Начальное значение случайных цен и пропусков
+    :return: Минутные бары BarStore.dtype
+    """
+    rng = np.random.default_rng(seed)
+    times = schedule.bars_array(dt_from, dt_to, 'M1').astype(np.int64)
+    times = times[rng.random(times.size) >= gaps]  # Пропущенные минутные бары
+    bars = np.zeros(times.size, dtype=BarStore.dtype)
+    bars['time'] = times
+    bars['close'] = 100 + np.cumsum(rng.normal(0, 0.1, times.size))
+    bars['open'] = np.r_[100, bars['close'][:-1]]
+    bars['high'] = np.maximum(bars['open'], bars['close']) + 0.05
+    bars['low'] = np.minimum(bars['open'], bars['close']) - 0.05
+    bars['volume'] = rng.integers(1, 1000, times.size)
+    return bars
+
+
+def to_array(bars) -> np.ndarray:
+    """Бары Resampler в массив BarStore.dtype"""
+    return np.array([(Schedule._datetime_to_seconds(dt), *values) for dt, *values in bars], dtype=BarStore.dtype)
+
+
+def incremental(schedule, bars, tfs) -> tuple:
+    """Построение по мере получения минутных бар
+
+    :return: Сформированные бары по интервалам, несформированные бары по интервалам
+    """
+    resampler = Resampler(schedule, tfs)
+    completed = {tf: [] for tf in tfs}
+    for bar in bars.tolist():  # Минутные бары по одному
+        for tf, result in resampler.add(Schedule._seconds_to_datetime(bar[0]), *bar[1:]):
+            completed[tf].append(result)
+    partial = dict(resampler.flush())
+    return {tf: to_array(completed[tf]) for tf in tfs}, partial
+
+
+@pytest.mark.parametrize('schedule', [MOEXStocks(), MOEXBonds(), MOEXFutures()], ids=lambda schedule: type(schedule).__name__)
+def test_batch_incremental_parity(schedule):
+    """Построение по мере получения совпадает с пакетным на всех интервалах, в том числе с пропусками минутных бар и целого часа"""
+    bars = minute_bars(schedule, datetime(2025, 3, 3), datetime(2025, 3, 14, 12, 31))  # Почти две недели. Последние бары не сформированы
+    hour = (bars['time'] >= Schedule._datetime_to_seconds(datetime(2025, 3, 5, 12))) & (bars['time'] < Schedule._datetime_to_seconds(datetime(2025, 3, 5, 13)))
+    bars = bars[~hour]  # Пропущен целый час
+    completed, partial = incremental(schedule, bars, TFS)
+    for tf in TFS:
+        assert np.array_equal(completed[tf], resample(schedule, bars, tf)), tf
+        full = resample(schedule, bars, tf, include_partial=True)
+        assert np.array_equal(np.concatenate((completed[tf], to_array([partial[tf]]) if tf in partial else completed[tf][:0])), full), tf
+
+
+def test_evening_session_hh05():
+    """Вечерняя сессия начинается в 19:05. Бары интервалов более 5-и минут открываются в 19:00, 5-и минутные - в 19:05"""
+    schedule = MOEXStocks()
+    bars = minute_bars(schedule, datetime(2025, 3, 12, 19, 5), datetime(2025, 3, 12, 19, 20), gaps=0)
+    assert [Schedule._seconds_to_datetime(seconds).minute for seconds in resample(schedule, bars, 'M5')['time'].tolist()] == [5, 10, 15]
+    assert [Schedule._seconds_to_datetime(seconds).minute for seconds in resample(schedule, bars, 'M15')['time'].tolist()] == [0]
+    m15 = resample(schedule, bars, 'M15')[0]
+    assert m15['open'] == bars['open'][0] and m15['close'] == bars['close'][9] and m15['volume'] == bars['volume'][:10].sum()  # Бар 19:00 - 19:14 из 10-и минутных бар
+
+
+def test_clearing_break():
+    """Бар, прерванный клирингом, формируется последним минутным баром перед клирингом, а не первым после него"""
+    schedule = MOEXFutures()
+    bars = minute_bars(schedule, datetime(2025, 3, 12, 13, 0), datetime(2025, 3, 12, 14, 10), gaps=0)
+    resampler = Resampler(schedule, ('M60', 'M10'))
+    completed = []
+    for bar in bars.tolist():
+        dt = Schedule._seconds_to_datetime(bar[0])
+        for tf, result in resampler.add(dt, *bar[1:]):
+            completed.append((dt, tf, result[0]))
+    assert (datetime(2025, 3, 12, 13, 59), 'M60', datetime(2025, 3, 12, 13)) in completed  # Часовой бар 13:00 сформирован на 13:59
+    assert (datetime(2025, 3, 12, 13, 59), 'M10', datetime(2025, 3, 12, 13, 50)) in completed
+    assert (datetime(2025, 3, 12, 14, 9), 'M10', datetime(2025, 3, 12, 14, 0)) in completed  # Бар 14:00 - 14:09 из минутных бар 14:05 - 14:09
+
+
+def test_missing_last_minute():
+    """Последний минутный бар не получен. Бар формируется первым минутным баром следующего бара"""
+    schedule = MOEXStocks()
+    bars = minute_bars(schedule, datetime(2025, 3, 12, 14, 0), datetime(2025, 3, 12, 14, 6), gaps=0)
+    bars = np.delete(bars, 4)  # Минутный бар 14:04
+    resampler = Resampler(schedule, ('M5',))
+    results = [resampler.add(Schedule._seconds_to_datetime(bar[0]), *bar[1:]) for bar in bars.tolist()]
+    assert results[:4] == [[], [], [], []]  # 14:04 не получен: бар 14:00 ждет
+    assert [(tf, bar[0]) for tf, bar in results[4]] == [('M5', datetime(2025, 3, 12, 14))]  # Сформирован минутным баром 14:05
+    assert resampler.flush() == [('M5', (datetime(2025, 3, 12, 14, 5), *bars.tolist()[4][1:]))]
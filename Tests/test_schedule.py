@@ -0,0 +1,92 @@
+from datetime import datetime, date, time, timedelta
+
+import numpy as np
+import pytest
+from pytz import utc
+
+from MarketPy.Schedule import Schedule, Session, Calendar, MOEXStocks, MOEXBonds, MOEXFutures
+
+
+def test_microseconds_at_session_end():
+    """Доли секунды после последней секунды сессии - уже вне сессии, как при сравнении времени с окончанием сессии"""
+    schedule = MOEXStocks()
+    end = datetime(2025, 3, 12, 18, 39, 59)  # Последняя секунда основной сессии
+    assert schedule.trade_session(end) is not None
+    assert schedule.trade_session(end.replace(microsecond=500000)) is None
+    assert schedule.time_until_trade(end.replace(microsecond=500000)) == datetime(2025, 3, 12, 19, 5) - end.replace(microsecond=500000)
+    assert schedule.trade_session(datetime(2025, 3, 12, 18, 39, 58, 999999)) is not None  # Внутри сессии микросекунды не важны
+    assert schedule.time_until_trade(datetime(2025, 3, 12, 9, 49, 59, 250000)) == timedelta(seconds=0.75)  # Между сессиями без перерыва
+    assert schedule.last_session_time_end(end.replace(microsecond=500000)) == end
+    assert schedule.trade_session(datetime(2025, 3, 12, 19, 5, 0, 1)) is not None
+
+
+def calendar_schedule():
+    """Расписание с календарем: праздник, рабочая суббота и сокращенный день"""
+    calendar = Calendar(holidays={date(2025, 3, 10)}, workdays={date(2025, 3, 15)},
+                        day_sessions={date(2025, 3, 7): [Session(time(9, 50), time(14, 59, 59)), Session(time(15, 30), time(16, 59, 59))]})
+    return MOEXStocks(calendar=calendar)
+
+
+def random_datetimes(count, seed=0, start=datetime(2025, 3, 3), days=21) -> list:
+    """Случайные даты и время с точностью до секунды"""
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(0, days * 86400, count).tolist()
+    return [start + timedelta(seconds=value) for value in seconds]
+
+
+@pytest.mark.parametrize('schedule', [MOEXStocks(), calendar_schedule(), MOEXFutures()], ids=('stocks', 'calendar', 'futures'))
+def test_array_scalar_parity(schedule):
+    """Векторные функции совпадают со скалярными, в том числе в дни календаря с другими сессиями и на часовых интервалах"""
+    dts = random_datetimes(3000) + [datetime(2025, 3, 7, 14, 59, 59), datetime(2025, 3, 7, 15, 0), datetime(2025, 3, 7, 15, 30), datetime(2025, 3, 15, 10, 0), datetime(2025, 3, 10, 12, 0)]
+    values = np.array(dts, dtype='datetime64[s]')
+    numbers = schedule.trade_session_array(values).tolist()
+    for dt, number in zip(dts, numbers):
+        session = schedule.trade_session(dt)
+        assert number == (-1 if session is None else schedule.day_sessions(dt.date()).index(session)), dt
+    for tf in ('M1', 'M5', 'M15', 'M60', 'H1', 'H2', 'D1', 'W1', 'MN1'):
+        opens = schedule.trade_bar_open_datetime_array(values, tf).astype(datetime).tolist()
+        closes = schedule.trade_bar_close_datetime_array(values, tf).astype(datetime).tolist()
+        assert opens == [schedule.trade_bar_open_datetime(dt, tf) for dt in dts], tf
+        assert closes == [schedule.trade_bar_close_datetime(dt, tf) for dt in dts], tf
+
+
+def test_hour_timeframe():
+    """Часовые интервалы совпадают с минутными той же длины"""
+    schedule = MOEXStocks()
+    dts = random_datetimes(500, seed=1)
+    for hours in (1, 2, 4):
+        for dt in dts:
+            assert schedule.trade_bar_open_datetime(dt, f'H{hours}') == schedule.trade_bar_open_datetime(dt, f'M{hours * 60}')
+            assert schedule.trade_bar_close_datetime(dt, f'H{hours}') == schedule.trade_bar_close_datetime(dt, f'M{hours * 60}')
+        assert np.array_equal(schedule.bars_array(datetime(2025, 3, 3), datetime(2025, 3, 8), f'H{hours}'), schedule.bars_array(datetime(2025, 3, 3), datetime(2025, 3, 8), f'M{hours * 60}'))
+
+
+@pytest.mark.parametrize('schedule', [MOEXStocks(), calendar_schedule(), MOEXBonds()], ids=('stocks', 'calendar', 'bonds'))
+def test_iter_bars_parity(schedule):
+    """iter_bars совпадает с bars_array. Сетка бар - это бары, в которые попадают все минуты торговых сессий"""
+    start, end = datetime(2025, 3, 3, 12, 0, 30), datetime(2025, 3, 18, 15, 0)
+    for tf in ('M1', 'M10', 'H1', 'D1', 'W1', 'MN1'):
+        bars = schedule.bars_array(start, end, tf)
+        assert list(schedule.iter_bars(start, end, tf)) == bars.astype(datetime).tolist(), tf
+    minutes = schedule.bars_array(datetime(2025, 3, 3), datetime(2025, 3, 18), 'M1')  # Все минуты торговых сессий
+    for tf in ('M10', 'M15', 'H1', 'D1'):
+        assert np.array_equal(np.unique(schedule.trade_bar_open_datetime_array(minutes, tf)), schedule.bars_array(datetime(2025, 3, 3), datetime(2025, 3, 18), tf)), tf
+    days = schedule.bars_array(start, end, 'D1').astype(datetime).tolist()
+    if schedule.calendar is not None:  # Праздник пропущен, рабочая суббота есть
+        assert datetime(2025, 3, 10) not in days and datetime(2025, 3, 15) in days
+
+
+def test_timezone_parity():
+    """Перевод времени по таблице переходов совпадает с pytz, в том числе в годы летнего времени и UTC+4"""
+    schedule = MOEXStocks()
+    rng = np.random.default_rng(2)
+    seconds = rng.integers(int(datetime(2000, 1, 1).timestamp()), int(datetime(2030, 1, 1).timestamp()), 3000)
+    seconds = np.append(seconds, [1301180400 - 1, 1301180400, 1414274400 - 1, 1414274400])  # Переходы 27.03.2011 и 26.10.2014
+    for value in seconds.tolist():
+        dt_utc = datetime(1970, 1, 1) + timedelta(seconds=value)
+        dt_msk = utc.localize(dt_utc).astimezone(Schedule.market_timezone).replace(tzinfo=None)
+        assert schedule.utc_to_msk_datetime(dt_utc) == dt_msk
+        assert schedule.utc_timestamp_to_msk_datetime(value) == dt_msk
+        assert schedule.msk_to_utc_datetime(dt_msk) == Schedule.market_timezone.localize(dt_msk).astimezone(utc).replace(tzinfo=None)
+        assert schedule.msk_datetime_to_utc_timestamp(dt_msk) == int(Schedule.market_timezone.localize(dt_msk).timestamp())
+    assert np.array_equal(schedule.utc_timestamp_to_msk_datetime64(seconds), np.array([schedule.utc_timestamp_to_msk_datetime(value) for value in seconds.tolist()], dtype='datetime64[s]'))
@@ -0,0 +1,117 @@
+from collections import Counter
+from datetime import datetime
+from multiprocessing import get_context
+
+from MarketPy.Schedule import MOEXStocks
+from MarketPy.Dispatcher import Dispatcher
+from MarketPy.Sharding import BarRing, shard_of
+
+from fakes import ManualClock, wait_until
+
+
+def write(ring, count, start=0, subscription=0):
+    for i in range(start, start + count):
+        ring.write(subscription, i, 1.0, 1.0, 1.0, 1.0, i)
+
+
+def test_ring_read_wrap_around():
+    """Чтение по кругу буфера без потерь, если читатель не отстает больше, чем на емкость"""
+    ring = BarRing(capacity=8)
+    try:
+        tail, seen = 0, []
+        for chunk in (5, 6, 8, 3):  # Записи переходят через конец буфера
+            write(ring, chunk, len(seen))
+            records, tail = ring.read(tail)
+            seen.extend(records['time'].tolist())
+        assert seen == list(range(22))
+        assert ring.dropped == 0
+        records, tail = ring.read(tail)
+        assert records.size == 0 and tail == 22
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_ring_overwrite_accounting():
+    """Если писатель обогнал читателя, то выдаются последние capacity бар, а перезаписанные учитываются в dropped"""
+    ring = BarRing(capacity=8)
+    try:
+        write(ring, 3)
+        records, tail = ring.read(0)
+        assert tail == 3
+        write(ring, 20, 3)  # Отставание 20 бар при емкости 8
+        records, tail = ring.read(tail)
+        assert records['time'].tolist() == list(range(15, 23))
+        assert ring.dropped == 12
+        assert tail == ring.head == 23
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_ring_read_capacity_behind():
+    """Читатель отстает ровно на емкость буфера. Без записи выдаются все бары, а бар, поверх которого идет запись, не выдается"""
+    ring = BarRing(capacity=8)
+    try:
+        write(ring, 8)
+        records, tail = ring.read(0)  # Писатель не пишет
+        assert records['time'].tolist() == list(range(8)) and ring.dropped == 0
+        write(ring, 8, 8)
+        ring._started[0] = ring.head + 1  # Писатель начал запись бара 16 поверх бара 8
+        ring._records[0]['time'] = -1  # и успел записать только часть полей
+        records, tail = ring.read(tail)
+        assert records['time'].tolist() == list(range(9, 16))
+        assert ring.dropped == 1
+        assert tail == 16
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def test_ring_last_seconds():
+    """Последний бар каждой подписки, в том числе после круга буфера"""
+    ring = BarRing(capacity=8)
+    try:
+        write(ring, 5, 0, subscription=1)
+        write(ring, 6, 100, subscription=2)  # Бары подписки 1 частично перезаписаны
+        assert ring.last_seconds() == {1: 4, 2: 105}
+    finally:
+        ring.close()
+        ring.unlink()
+
+
+def _shards_in_process(keys, queue):
+    queue.put([shard_of(key, 7) for key in keys])
+
+
+def test_shard_of_stable():
+    """Подписка всегда попадает в тот же процесс, в том числе в другом процессе. При добавлении процесса переезжает около 1/n подписок"""
+    keys = [('TQBR', f'SEC{i:04}', 'M1') for i in range(2000)]
+    shards = [shard_of(key, 7) for key in keys]
+    assert shards == [shard_of(key, 7) for key in keys]
+    assert set(shards) == set(range(7))
+    assert min(Counter(shards).values()) > 2000 / 7 * 0.7  # Распределение равномерное
+    context = get_context('spawn')  # Новый интерпретатор со своим hash() строк
+    queue = context.Queue()
+    process = context.Process(target=_shards_in_process, args=(keys, queue))
+    process.start()
+    assert queue.get(timeout=60) == shards
+    process.join()
+    moved = sum(shard_of(key, 7) != shard_of(key, 8) for key in keys)
+    assert 2000 / 8 * 0.7 < moved < 2000 / 8 * 1.3
+    assert all(shard_of(key, 8) == 7 for key in keys if shard_of(key, 7) != shard_of(key, 8))  # Переезжают только в новый процесс
+
+
+def test_subscribe_after_last_bar():
+    """Подписка, продолжающая с последнего записанного бара, запрашивает бары, закрывшиеся за время перезапуска"""
+    clock = ManualClock(MOEXStocks().msk_datetime_to_utc_timestamp(datetime(2025, 3, 12, 14, 5, 30)))  # Процесс перезапущен в 14:05:30
+    schedule = MOEXStocks(clock=clock)
+    requested = []
+    dispatcher = Dispatcher(clock=clock)
+    dispatcher.subscribe('TQBR', 'SBER', schedule, 'M1', lambda subscription: requested.append(subscription.trade_bar_open_datetime), after=datetime(2025, 3, 12, 14, 1))
+    dispatcher.start()
+    assert wait_until(lambda: len(requested) == 3)  # Бары 14:02 - 14:04 закрылись за время перезапуска и запрашиваются сразу
+    clock.run_until(schedule.msk_datetime_to_utc_timestamp(datetime(2025, 3, 12, 14, 7)) + schedule.delta.total_seconds())
+    assert wait_until(lambda: len(requested) == 5)
+    dispatcher.close()
+    assert requested == [datetime(2025, 3, 12, 14, minute) for minute in range(2, 7)]
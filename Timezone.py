@@ -0,0 +1,105 @@
+from bisect import bisect_right  # Двоичный поиск в таблице переходов
+from datetime import datetime
+
+import numpy as np  # Векторные вычисления над массивами дат и времени
+
+
+class TimezoneConverter:
+    """Перевод времени между UTC и временнОй зоной по таблице переходов pytz без localize/astimezone.
+    Время отсчитывается в секундах с 01.01.1970 00:00: по UTC для UTC, по местному времени для местного времени.
+    Неоднозначное и несуществующее местное время переводится так же, как localize(dt, is_dst=False) pytz"""
+    _converters = {}  # Построенные таблицы переходов по временнЫм зонам
+
+    def __init__(self, tz):
+        """
+        :param tz: ВременнАя зона pytz
+        """
+        epoch = datetime(1970, 1, 1)  # Начало отсчета секунд
+        transition_times = getattr(tz, '_utc_transition_times', None)  # Даты и время переходов в UTC. Есть только у зон с переходами
+        if transition_times:  # Если у временнОй зоны есть переходы
+            self.utc_transitions = [int((dt - epoch).total_seconds()) for dt in transition_times]  # Секунды переходов по UTC
+            self.utc_offsets = [int(offset.total_seconds()) for offset, _, _ in tz._transition_info]  # Смещение от UTC после перехода в секундах
+            dsts = [bool(dst) for _, dst, _ in tz._transition_info]  # Признак летнего времени после перехода
+        else:  # Если у временнОй зоны постоянное смещение (UTC)
+            self.utc_transitions = [-2 ** 62]  # Один переход в самом начале времен
+            self.utc_offsets = [int(tz.utcoffset(epoch).total_seconds())]
+            dsts = [False]
+        offsets = sorted(set(self.utc_offsets))  # Все различные смещения от UTC
+        breaks = {self.utc_transitions[0] + offset for offset in offsets}  # Местное время, после которого может измениться перевод в UTC
+        for transition in self.utc_transitions[1:]:  # Пробегаемся по всем переходам
+            for offset in offsets:  # и всем смещениям
+                breaks.add(transition + offset)  # Местное время перехода
+                breaks.add(transition + offset + 6 * 3600)  # Несуществующее время переводится по времени на 6 часов раньше
+        self.local_transitions = sorted(breaks)  # Секунды изменения перевода по местному времени
+        self.local_offsets = [self._local_offset(local_seconds, offsets, dsts) for local_seconds in self.local_transitions]  # Смещение от UTC после изменения
+        self._utc_transitions_array = np.array(self.utc_transitions, dtype=np.int64)  # Таблицы для векторных расчетов
+        self._utc_offsets_array = np.array(self.utc_offsets, dtype=np.int64)
+        self._local_transitions_array = np.array(self.local_transitions, dtype=np.int64)
+        self._local_offsets_array = np.array(self.local_offsets, dtype=np.int64)
+
+    @classmethod
+    def for_timezone(cls, tz):
+        """Таблица переходов временнОй зоны. Строится один раз на временнУю зону
+
+        :param tz: ВременнАя зона pytz
+        :return: Перевод времени по таблице переходов
+        :rtype: TimezoneConverter
+        """
+        converter = cls._converters.get(tz.zone)
+        if converter is None:  # Если таблицы переходов еще нет
+            converter = cls._converters[tz.zone] = cls(tz)  # то строим ее
+        return converter
+
+    def _local_offset(self, local_seconds, offsets, dsts) -> int:
+        """Смещение от UTC для местного времени по правилам localize(dt, is_dst=False) pytz. Используется при построении таблицы
+
+        :param int local_seconds: Секунды по местному времени
+        :param list[int] offsets: Все различные смещения от UTC
+        :param list[bool] dsts: Признак летнего времени после каждого перехода
+        :return: Смещение от UTC в секундах
+        """
+        candidates = []  # Возможные (секунды UTC, признак летнего времени)
+        for offset in offsets:  # Пробегаемся по всем смещениям
+            utc_seconds = local_seconds - offset  # Время UTC при этом смещении
+            i = max(bisect_right(self.utc_transitions, utc_seconds) - 1, 0)  # Последний переход до этого времени UTC
+            if self.utc_offsets[i] == offset:  # Если во время UTC действует это смещение
+                candidates.append((utc_seconds, dsts[i]))  # то местное время с ним существует
+        if not candidates:  # Если местного времени нет (перевод часов вперед)
+            return self._local_offset(local_seconds - 6 * 3600, offsets, dsts)  # то берем смещение за 6 часов до него
+        if len(candidates) > 1:  # Если местное время неоднозначно (перевод часов назад)
+            candidates = [candidate for candidate in candidates if not candidate[1]] or candidates  # то берем зимнее время
+        return local_seconds - max(candidates)[0]  # Из оставшихся берем самое позднее по UTC
+
+    def utc_to_local(self, utc_seconds) -> int:
+        """Перевод секунд по UTC в секунды по местному времени
+
+        :param int utc_seconds: Секунды с 01.01.1970 00:00 UTC
+        :return: Секунды с 01.01.1970 00:00 по местному времени
+        """
+        return utc_seconds + self.utc_offsets[bisect_right(self.utc_transitions, utc_seconds) - 1]
+
+    def local_to_utc(self, local_seconds) -> int:
+        """Перевод секунд по местному времени в секунды по UTC
+
+        :param int local_seconds: Секунды с 01.01.1970 00:00 по местному времени
+        :return: Секунды с 01.01.1970 00:00 UTC
+        """
+        return local_seconds - self.local_offsets[bisect_right(self.local_transitions, local_seconds) - 1]
+
+    def utc_to_local_array(self, utc_seconds) -> np.ndarray:
+        """Перевод массива секунд по UTC в секунды по местному времени
+
+        :param np.ndarray utc_seconds: Массив секунд int64 с 01.01.1970 00:00 UTC
+        :return: Массив секунд int64 с 01.01.1970 00:00 по местному времени
+        """
+        utc_seconds = np.asarray(utc_seconds, dtype=np.int64)
+        return utc_seconds + self._utc_offsets_array[np.searchsorted(self._utc_transitions_array, utc_seconds, 'right') - 1]
+
+    def local_to_utc_array(self, local_seconds) -> np.ndarray:
+        """Перевод массива секунд по местному времени в секунды по UTC
+
+        :param np.ndarray local_seconds: Массив секунд int64 с 01.01.1970 00:00 по местному времени
+        :return: Массив секунд int64 с 01.01.1970 00:00 UTC
+        """
+        local_seconds = np.asarray(local_seconds, dtype=np.int64)
+        return local_seconds - self._local_offsets_array[np.searchsorted(self._local_transitions_array, local_seconds, 'right') - 1]